@@ -2,6 +2,8 @@ FROM python:3.9-slim
 
 WORKDIR /app
 
-COPY src/ml_stress.py .
+COPY src/workload.py .
+COPY examples/workloads/ml_training.json .
 
-CMD ["python", "ml_stress.py"]
+# The profile's seed makes every run deliver the same load; --hold keeps the container up afterwards
+CMD ["python", "workload.py", "ml_training.json", "--hold", "--log", "/app/delivered.jsonl"]
@@ -0,0 +1,238 @@
+"""Hot-path benchmarks for the agent control loop and the dashboard ingest endpoint.
+
+Builds a fake cgroup v2 tree (`src.fakefs.FakeCgroupFS`) with N containers and measures,
+for each N:
+
+- `monitor_sample`   one `CgroupMonitor.sample()` call
+- `run_iteration`    one full agent tick over all N containers (dry-run controller)
+- `controller_write` one real `CgroupController.set_cpu_max()` write into the fake tree
+- `update_stats`     one batched `POST /api/update_stats` with N containers
+- `policy_eval`      one `PolicyEngine.evaluate()` of 100 rules over N containers
+
+Each result records latency percentiles (microseconds), the peak transient memory of one
+operation and the memory blocks it leaves allocated. With `--compare` (default: the stored
+baseline, if present) the run fails when a median latency or peak allocation regresses by more
+than `--tolerance`.
+
+Usage:
+    python -m scripts.benchmark                       # N = 10, 100, 1000; compare to baseline
+    python -m scripts.benchmark --sizes 10 100 --out run.json
+    python -m scripts.benchmark --save-baseline       # record this machine's numbers
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from src.agent import run_iteration
+from src.controller import CgroupController
+from src.fakefs import FakeCgroupFS
+from src.governance import GovernanceEngine
+from src.monitor import CgroupMonitor
+from src.policy import PolicyEngine
+from src.predictor import MovingAveragePredictor
+from src.trace import ReplayScanner
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+SIZES = (10, 100, 1000)
+# Latencies below this are dominated by timer noise; they never count as regressions
+NOISE_FLOOR_US = 20.0
+
+
+def _percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def measure(op: Callable[[int], None], repeat: int, warmup: int = 3) -> Dict:
+    """Latency distribution of `op(i)` over `repeat` calls, then its allocation profile."""
+    for i in range(warmup):
+        op(i)
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        op(i)
+        times.append((time.perf_counter() - start) * 1e6)
+
+    # Allocation profile (separate pass: tracing slows every allocation down)
+    tracemalloc.start()
+    try:
+        peaks = []
+        for i in range(min(repeat, 20)):
+            base = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            op(i)
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        blocks = sys.getallocatedblocks()
+        rounds = min(repeat, 20)
+        for i in range(rounds):
+            op(i)
+        retained = (sys.getallocatedblocks() - blocks) / rounds
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "calls": repeat,
+        "mean_us": round(statistics.fmean(times), 2),
+        "p50_us": round(_percentile(times, 0.50), 2),
+        "p95_us": round(_percentile(times, 0.95), 2),
+        "p99_us": round(_percentile(times, 0.99), 2),
+        "max_us": round(max(times), 2),
+        "peak_alloc_kib": round(statistics.median(peaks) / 1024, 2),
+        "retained_blocks_per_call": round(retained, 2),
+    }
+
+
+def bench_monitor_sample(fs: FakeCgroupFS, repeat: int) -> Dict:
+    monitor = CgroupMonitor(root=fs.root)
+    paths = fs.paths
+    return measure(lambda i: monitor.sample(paths[i % len(paths)]), repeat)
+
+
+def bench_run_iteration(fs: FakeCgroupFS, repeat: int) -> Dict:
+    paths = fs.paths
+    monitor = CgroupMonitor(root=fs.root)
+    controller = CgroupController(dry_run=True, quiet=True, root=fs.root)
+    predictors = {p: MovingAveragePredictor(window=5) for p in paths}
+    histories = {p: [] for p in paths}
+    governance = GovernanceEngine(controller)
+    scanner = ReplayScanner()
+
+    def op(i):
+        run_iteration(paths, monitor, controller, predictors, histories, scanner, governance, i,
+                      node_id="bench", threshold=0, reporter=None)
+
+    return measure(op, repeat)
+
+
+def bench_controller_write(fs: FakeCgroupFS, repeat: int) -> Dict:
+    controller = CgroupController(dry_run=False, root=fs.root)
+    paths = fs.paths
+    return measure(lambda i: controller.set_cpu_max(paths[i % len(paths)], 50000 + i % 7 * 1000), repeat)
+
+
+def bench_update_stats(n: int, repeat: int) -> Dict:
+    from fastapi.testclient import TestClient
+    from src import dashboard_app
+    from src.state_backend import DashboardState, LocalStateBackend
+
+    # A fresh in-process state (through the backend layer ingest uses) so earlier sizes do not skew this one
+    saved = dashboard_app.STATE
+    dashboard_app.STATE = LocalStateBackend(DashboardState)
+    try:
+        client = TestClient(dashboard_app.app)
+        payloads = [{"node_id": "bench-node", "containers": [
+            {"id": f"c{j}", "cpu_usage": 100000 + (i * 7919 + j) % 50000, "memory_bytes": 64 << 20,
+             "prediction": 110000, "quarantined": False} for j in range(n)]} for i in range(8)]
+
+        def op(i):
+            r = client.post("/api/update_stats", json=payloads[i % len(payloads)])
+            assert r.status_code == 200
+
+        return measure(op, repeat)
+    finally:
+        dashboard_app.STATE = saved
+
+
+def bench_policy_eval(n: int, repeat: int, workdir: str) -> Dict:
+    # 100 rules over a handful of metrics and labels, most never matching, then a catch-all
+    rules = [{"name": f"r{i}", "action": "cpu_max", "params": {"quota": 10000 + i},
+              "when": {"all": [{"metric": "pred_cpu", "op": ">", "value": 4000000 + i * 1000},
+                               {"any": [{"metric": "security_score", "op": "<", "value": 10 + i % 5},
+                                        {"label": "tier", "op": "in", "value": ["batch", f"t{i % 3}"]}]}]}}
+             for i in range(99)]
+    rules.append({"name": "default", "action": "scale"})
+    path = os.path.join(workdir, f"policies-{n}.json")
+    with open(path, "w") as f:
+        json.dump({"labels": {"*0": {"tier": "batch"}}, "rules": rules}, f)
+    engine = PolicyEngine(path)
+    paths = [f"c{j}" for j in range(n)]
+    metrics = [{"pred_cpu": [(i * 7919 + j * 104729) % 5000000 for j in range(n)],
+                "security_score": [(i + j) % 100 for j in range(n)]} for i in range(8)]
+    return measure(lambda i: engine.evaluate(paths, metrics[i % len(metrics)]), repeat)
+
+
+def run(sizes=SIZES, workdir: Optional[str] = None) -> Dict:
+    logging.disable(logging.INFO)
+    results: Dict[str, Dict[str, Dict]] = {}
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        for n in sizes:
+            fs = FakeCgroupFS(os.path.join(tmp, f"cgroup-{n}"), containers=n)
+            fs.tick(5)
+            ticks = max(5, min(200, 2000 // n))
+            calls = max(200, min(2000, 4 * n))
+            for name, fn in (("monitor_sample", lambda: bench_monitor_sample(fs, calls)),
+                             ("run_iteration", lambda: bench_run_iteration(fs, ticks)),
+                             ("controller_write", lambda: bench_controller_write(fs, calls)),
+                             ("update_stats", lambda: bench_update_stats(n, ticks)),
+                             ("policy_eval", lambda: bench_policy_eval(n, calls, tmp))):
+                results.setdefault(name, {})[str(n)] = fn()
+    logging.disable(logging.NOTSET)
+    return {"python": sys.version.split()[0], "platform": sys.platform, "results": results}
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float = 0.5) -> List[str]:
+    """Regressions of `current` against `baseline`: slower median or larger peak allocation."""
+    problems = []
+    for name, by_size in current["results"].items():
+        for n, cur in by_size.items():
+            base = baseline.get("results", {}).get(name, {}).get(n)
+            if not base:
+                continue
+            if cur["p50_us"] > max(NOISE_FLOOR_US, base["p50_us"]) * (1 + tolerance):
+                problems.append(f"{name}[N={n}] p50 {cur['p50_us']}us vs baseline {base['p50_us']}us")
+            if cur["peak_alloc_kib"] > max(1.0, base["peak_alloc_kib"]) * (1 + tolerance):
+                problems.append(f"{name}[N={n}] peak alloc {cur['peak_alloc_kib']}KiB "
+                                f"vs baseline {base['peak_alloc_kib']}KiB")
+    return problems
+
+
+def print_table(report: Dict):
+    print(f"{'benchmark':<18}{'N':>6}{'p50 us':>12}{'p95 us':>12}{'p99 us':>12}{'peak KiB':>11}{'retained':>10}")
+    for name, by_size in report["results"].items():
+        for n, r in by_size.items():
+            print(f"{name:<18}{n:>6}{r['p50_us']:>12.1f}{r['p95_us']:>12.1f}{r['p99_us']:>12.1f}"
+                  f"{r['peak_alloc_kib']:>11.1f}{r['retained_blocks_per_call']:>10.1f}")
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description='Control-loop and ingest benchmarks on a fake cgroupfs')
+    p.add_argument('--sizes', type=int, nargs='+', default=list(SIZES), help='Container counts')
+    p.add_argument('--out', help='Write this run as JSON')
+    p.add_argument('--compare', default=BASELINE, help='Baseline JSON to compare against')
+    p.add_argument('--tolerance', type=float, default=0.5, help='Allowed fractional slowdown (0.5 = +50%%)')
+    p.add_argument('--save-baseline', action='store_true', help='Overwrite the stored baseline with this run')
+    return p.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    report = run(args.sizes)
+    print_table(report)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(BASELINE, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved baseline to {BASELINE}")
+        return 0
+    if args.compare and os.path.exists(args.compare):
+        with open(args.compare) as f:
+            problems = compare(report, json.load(f), args.tolerance)
+        for msg in problems:
+            print(f"REGRESSION: {msg}")
+        if problems:
+            return 1
+        print(f"No regressions against {args.compare}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
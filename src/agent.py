@@ -1,18 +1,33 @@
 import time
 import logging
 import argparse
+import itertools
 import os
-from src.monitor import CgroupMonitor
+from src.monitor import CGROUP_ROOT, CgroupMonitor
 from src.controller import CgroupController
-from src.predictor import MovingAveragePredictor
+from src.predictor import MovingAveragePredictor, QuantilePredictor
 from src.governance import GovernanceEngine
+from src.memory_policy import MemoryPolicy
+from src.io_policy import IoPolicy
+from src.network import NetworkPolicy
+from src.allocator import PRIORITY_CLASSES, USEC_PER_SEC, CpuAllocator
+from src.reconciler import DesiredState, Reconciler
+from src.placement import PlacementPlanner, Topology
+from src.throttle import GAIN_CLASSES, ThrottleFeedback
+from src.policy import PolicyEngine
 from src.security import SecurityScanner
+from src.events import CPU_MAX, EventEmitter
+from src.trace import ReplayMonitor, ReplayScanner, TraceWriter
+from src.spool import Spool, SpoolingReporter
 import requests
 import json
 
 DASHBOARD_URL = "http://localhost:8000/api/update_stats"
+DASHBOARD_EVENTS_URL = "http://localhost:8000/api/events"
+DASHBOARD_INGEST_URL = "http://localhost:8000/api/ingest_batch"
+CPU_PERIOD = 100000  # cpu.max period written by CgroupController.set_cpu_max
 
-def report_stats(container_id, cpu, mem, prediction, node_id="local"):
+def report_stats(container_id, cpu, mem, prediction, node_id="local", quarantined=False):
     """Best-effort reporting to the dashboard."""
     try:
         data = {
@@ -20,7 +35,8 @@ def report_stats(container_id, cpu, mem, prediction, node_id="local"):
             "id": container_id,
             "cpu_usage": cpu,
             "memory_bytes": mem,
-            "prediction": prediction
+            "prediction": prediction,
+            "quarantined": quarantined
         }
         # Timeout is short to not block the control loop
         requests.post(DASHBOARD_URL, json=data, timeout=0.1)
@@ -77,83 +93,262 @@ def find_cgroup_path_for_container(container_id: str):
     return None
 
 
-def run_iteration(cgroup_paths, monitor, controller, predictors, histories, scanner, governance, iteration_count, node_id="local", threshold=2000000):
-    """Run a single sampling/predict/apply iteration for the given cgroup paths."""
-    for p in cgroup_paths:
-        sample = monitor.sample(p)
-        cpu = sample['cpu_stat'].get('usage_usec', 0) if sample['cpu_stat'] else 0
-        mem = sample['memory_bytes'] or 0
-        histories[p].append(cpu)
-        if len(histories[p]) > 1000:
-            histories[p].pop(0)
-
-        predictors[p].fit(histories[p])
-        pred_cpu = predictors[p].predict()
-
-        # Security Scan (every 10 iterations roughly, to avoid spamming Docker socket)
-        # We need the container ID. 'p' is often the container ID or ends with it.
-        # Simple heuristic: last part of path
-        container_id = os.path.basename(p) 
-        if container_id.startswith('docker-'):
-            container_id = container_id[7:-6] # cleaning partial systemd names if necessary
-        
-        # For this prototype, if it's a long ID, treat as container ID
-        if len(container_id) < 12 and p != '.':
-             # Fallback
-             container_id = p
-
-        security_data = {"score": 100, "risks": []}
-        if iteration_count % 10 == 0:
-             security_data = scanner.scan_container(container_id)
-
-        # Governance Check
-        # We pass the 'pred_cpu' as the load metric
-        action_taken = governance.evaluate(p, pred_cpu, security_data['score'], security_data['risks'])
+def cpu_quota_for(pred_cpu, threshold=2000000, headroom=1.2, upper=None):
+    """Predictive scaling policy: quota with headroom above `threshold`, otherwise unlimited (None).
+
+    `upper` is a quota (usec per period) from a forecast quantile, e.g. p95 of the usage rate for a 5% throttling
+    target; when known it replaces the flat headroom.
+    """
+    if pred_cpu > threshold:
+        return int(upper if upper is not None else pred_cpu * headroom)
+    return None
+
+
+def run_iteration(cgroup_paths, monitor, controller, predictors, histories, scanner, governance, iteration_count, node_id="local", threshold=2000000, events=None, reporter=report_stats, memory_policy=None, io_policy=None, allocator=None, placement=None, network_policy=None, policy_engine=None, throttle_target=None, feedback=None):
+    """Run a single sampling/predict/apply iteration for the given cgroup paths.
+
+    `events` is an optional EventEmitter; limit changes are emitted as typed events.
+    `reporter` sends each sample to the dashboard (None to skip, e.g. during replay).
+    `memory_policy` (a MemoryPolicy) manages memory.high/memory.max from the sampled memory.current.
+    `io_policy` (an IoPolicy) throttles per-device disk bandwidth/IOPS from the sampled io.stat.
+    `network_policy` (a NetworkPolicy) shapes containers' veths; its tc commands go out in one batch per tick.
+    `allocator` (a CpuAllocator) replaces per-container CPU scaling: demands of the whole tick are
+    collected and node capacity is divided among them once all containers have been sampled.
+    `placement` (a PlacementPlanner) assigns cpuset.cpus/cpuset.mems from load history after the loop.
+    `policy_engine` (a PolicyEngine) replaces the built-in governance thresholds and scaling defaults: all
+    containers are sampled first, then the rules pick each one's CPU action in one pass.
+    `throttle_target` (a probability, overridable per rule) sizes quotas at the 1 - target quantile of the usage
+    rate for predictors that provide one (`predict_quantile`, see QuantilePredictor) instead of a flat headroom.
+    `feedback` (a ThrottleFeedback) closes the scaling loop: each container's headroom over its usage rate
+    is steered by the throttling observed in cpu.stat, with per-container gains.
+    """
+    demands = {}
+
+    def observe():
+        # One container at a time, so without a policy engine no tick-wide buffer of samples is kept
+        for p in cgroup_paths:
+            sample = monitor.sample(p)
+            if allocator:
+                allocator.observe(p, sample)
+            if placement:
+                placement.observe(p, sample)
+            if feedback:
+                feedback.observe(p, sample)
+            cpu = sample['cpu_stat'].get('usage_usec', 0) if sample['cpu_stat'] else 0
+            histories[p].append(cpu)
+            if len(histories[p]) > 1000:
+                histories[p].pop(0)
+
+            predictors[p].fit(histories[p])
+            if isinstance(predictors[p], QuantilePredictor):
+                predictors[p].observe(sample)
+            pred_cpu = predictors[p].predict()
+
+            # Security Scan (every 10 iterations roughly, to avoid spamming Docker socket)
+            # We need the container ID. 'p' is often the container ID or ends with it.
+            # Simple heuristic: last part of path
+            container_id = os.path.basename(p) 
+            if container_id.startswith('docker-'):
+                container_id = container_id[7:-6] # cleaning partial systemd names if necessary
         
-        if not action_taken:
-            # Normal Predictive Scaling (CPU)
-            if pred_cpu > threshold:
-                new_quota = int(pred_cpu * 1.2)
-                logging.info("Predicted cpu for %s: %s -> set cpu.max %s", p, pred_cpu, new_quota)
-                controller.set_cpu_max(p, new_quota)
+            # For this prototype, if it's a long ID, treat as container ID
+            if len(container_id) < 12 and p != '.':
+                 # Fallback
+                 container_id = p
+
+            # Between scans the last result stands, so a quarantine is not released on an unscanned tick
+            if iteration_count % 10 == 0:
+                 governance.last_scan[p] = scanner.scan_container(container_id)
+            security_data = governance.last_scan.get(p, {"score": 100, "risks": []})
+            yield p, sample, cpu, pred_cpu, security_data
+
+    # Declarative policies decide every container's CPU action in one vectorized pass
+    observed = observe()
+    rules = itertools.repeat(None)
+    if policy_engine:
+        observed = list(observed)
+        rules = policy_engine.evaluate(cgroup_paths, {
+            "cpu_usage": [o[2] for o in observed],
+            "pred_cpu": [o[3] for o in observed],
+            "memory_bytes": [o[1]['memory_bytes'] for o in observed],
+            "io_bytes": [o[1].get('io_read_bytes') for o in observed],
+            "net_rx_bytes": [o[1].get('net_rx_bytes') for o in observed],
+            "security_score": [o[4]['score'] for o in observed],
+            "risks": [len(o[4]['risks']) for o in observed],
+            "quarantined": [p in governance.quarantined_containers for p in cgroup_paths],
+        })
+
+    for (p, sample, cpu, pred_cpu, security_data), rule in zip(observed, rules):
+        mem = sample['memory_bytes'] or 0
+        action, params, source = "scale", {}, "AutoScaler"
+        if policy_engine:
+            action, params, source = (rule.action, rule.params, rule.name) if rule else ("none", {}, None)
+            action_taken = governance.apply(p, action, quota=params.get("quota"), rule=source,
+                                            score=security_data['score'], cpu=pred_cpu, risks=security_data['risks'])
+        else:
+            # Governance Check
+            # We pass the 'pred_cpu' as the load metric
+            action_taken = governance.evaluate(p, pred_cpu, security_data['score'], security_data['risks'])
+
+        if action_taken or action == "none":
+            pass
+        elif action == "scale" and allocator:
+            # Node-wide allocation after the loop; quarantined containers keep their clamp
+            demand = allocator.demand(p)
+            if demand is not None and p not in governance.quarantined_containers:
+                demands[p] = demand
+        elif action in ("scale", "cpu_max"):
+            # Normal Predictive Scaling (CPU), or a fixed quota from a policy rule
+            cpu_before = controller.last_value(p, 'cpu.max')
+            if action == "scale" and feedback:
+                new_quota = feedback.quota(p)
+            elif action == "scale":
+                target = params.get("throttle_target", throttle_target)
+                upper = None
+                if target and hasattr(predictors[p], "predict_quantile"):
+                    rate = predictors[p].predict_quantile(1 - target)
+                    if rate is not None:
+                        upper = rate * CPU_PERIOD / USEC_PER_SEC
+                new_quota = cpu_quota_for(pred_cpu, params.get("threshold", threshold), params.get("headroom", 1.2), upper)
             else:
-                controller.set_cpu_max(p, None)
-            
-            # Disk IO Throttling (Prototype Policy: if IO > 10MB/s, cap at 5MB/s)
-            disk_usage = sample.get('io_read_bytes', 0)
-            # In a real agent, we'd need differential (rate), but here we just check raw value for prototype or mock rate
-            # Let's assume 'disk_usage' is the RATE (bytes/sec) coming from monitor (in reality monitor returns total)
-            # Todo: Monitor should return rate. For now, we mock the trigger.
-            if disk_usage > 100 * 1024 * 1024: 
-                controller.set_io_max(p, 50) # 50 MBps
-            
-            # Network Throttling (Policy: if "bad" behavior detected or simple quota)
-            # For Phase 6 demo: we just log enabling it if a flag is present or random mock
-            # controller.set_network_limit(container_id, 1000) # 1Mbps
+                new_quota = params.get("quota")
+            if new_quota is not None:
+                logging.info("Predicted cpu for %s: %s -> set cpu.max %s", p, pred_cpu, new_quota)
+            controller.set_cpu_max(p, new_quota)
+            cpu_after = controller.last_value(p, 'cpu.max')
+            if events and cpu_after != cpu_before:
+                events.emit(CPU_MAX, f"cpu.max for {p}: {cpu_before or 'unset'} -> {cpu_after}",
+                            source=source, container=p, prediction=pred_cpu, value=cpu_after)
+
+        # Memory and disk are managed independently of CPU governance: a quarantined container can still OOM
+        if memory_policy:
+            memory_policy.evaluate(p, sample['memory_bytes'])
+        # Disk IO: per-device rates from io.stat; sustained hogs get capped on the device they hit
+        if io_policy:
+            io_policy.evaluate(p, sample)
+        if network_policy:
+            network_policy.evaluate(p, sample)
         
         # Report to dashboard
-        report_stats(p, cpu, mem, pred_cpu, node_id=node_id)
+        if reporter:
+            reporter(p, cpu, mem, pred_cpu, node_id=node_id, quarantined=p in governance.quarantined_containers)
 
+    if allocator and demands:
+        # Quarantined containers keep their clamps (a rule may set its own quota) outside the allocation
+        quotas = sum(governance.quarantine_quotas.get(p, governance.QUARANTINE_QUOTA)
+                     for p in governance.quarantined_containers)
+        allocations = allocator.allocate(demands, reserved=quotas * USEC_PER_SEC / CPU_PERIOD)
+        allocator.apply(controller, allocations, events=events)
+    if placement:
+        placement.rebalance(controller, events=events)
+    if network_policy:
+        network_policy.flush()
 
-def main_loop(cgroup_paths, interval=5, dry_run=True, log_level=logging.INFO, node_id="local"):
+
+def main_loop(cgroup_paths, interval=5, dry_run=True, log_level=logging.INFO, node_id="local", record=None, root=CGROUP_ROOT, allocator=None, reconcile=False, placement=None, policy=None, spool=None, throttle_target=None, feedback=None, memory=False, network=False):
     logging.basicConfig(level=log_level, format='[%(levelname)s] %(message)s')
-    monitor = CgroupMonitor()
-    controller = CgroupController(dry_run=dry_run)
-    predictors = {p: MovingAveragePredictor(window=5) for p in cgroup_paths}
+    # Optionally keep a binary trace of every sample for later replay (see replay_trace)
+    recorder = TraceWriter(record) if record else None
+    monitor = CgroupMonitor(recorder=recorder, root=root)
+    controller = CgroupController(dry_run=dry_run, root=root)
+    # Residual quantiles let quotas target a throttling probability (--throttle-target or a rule's param)
+    predictors = {p: QuantilePredictor(MovingAveragePredictor(window=5)) for p in cgroup_paths}
     histories = {p: [] for p in cgroup_paths}
     
     scanner = SecurityScanner()
-    governance = GovernanceEngine(controller)
+    # Governance and scaling actions go to the dashboard's event stream in batches
+    events = EventEmitter(DASHBOARD_EVENTS_URL, node_id=node_id)
+    events.start()
+    # With a spool directory, samples survive dashboard outages and are backfilled in compressed batches
+    reporter = report_stats
+    if spool:
+        reporter = SpoolingReporter(DASHBOARD_INGEST_URL, Spool(spool), node_id=node_id)
+        reporter.start()
+
+    # With reconcile, policies only declare limits; the reconciler diffs them against the files and writes once
+    desired = reconciler = None
+    policy_controller = governance_controller = controller
+    if reconcile:
+        desired = DesiredState(root=root)
+        policy_controller = desired.owner("policy", priority=10)
+        governance_controller = desired.owner("governance", priority=100)
+        reconciler = Reconciler(controller, monitor, events=events)
+    governance = GovernanceEngine(governance_controller, events=events)
+    # Rules are re-read whenever the file changes, without restarting the agent
+    policy_engine = PolicyEngine(policy) if policy else None
+    # memory.high/memory.max management is opt-in (--memory); limits are lifted again on exit
+    memory_policy = MemoryPolicy(policy_controller, monitor, events=events) if memory else None
+    io_policy = IoPolicy(policy_controller, events=events)
+    # tc shaping is opt-in (--network, needs NET_ADMIN); it is not a cgroup file, so it bypasses
+    # the reconciler and batches on the real controller
+    network_policy = NetworkPolicy(controller, events=events) if network else None
     
     iteration = 0
 
     try:
         while True:
-            run_iteration(cgroup_paths, monitor, controller, predictors, histories, scanner, governance, iteration, node_id=node_id)
+            run_iteration(cgroup_paths, monitor, policy_controller, predictors, histories, scanner, governance, iteration, node_id=node_id, events=events, memory_policy=memory_policy, io_policy=io_policy, allocator=allocator, placement=placement, network_policy=network_policy, policy_engine=policy_engine, reporter=reporter, throttle_target=throttle_target, feedback=feedback)
+            if reconciler:
+                report = reconciler.reconcile(desired)
+                desired.clear()
+                logging.debug("Reconcile: %d claims, %d written, %d deferred, %d drifted", report["claims"], report["applied"], report["deferred"], len(report["drift"]))
+            if recorder:
+                recorder.flush()
             iteration += 1
             time.sleep(interval)
     except KeyboardInterrupt:
         logging.info('Exiting agent loop')
+    finally:
+        if memory_policy:
+            # Straight to the cgroup files: with --reconcile nothing reconciles after the loop
+            memory_policy.release(controller)
+        events.close()
+        if spool:
+            reporter.close()
+        if recorder:
+            recorder.close()
+
+
+def replay_trace(trace_file, node_id="replay", threshold=2000000, report=False, log_level=logging.WARNING):
+    """Run the agent loop over a recorded trace as fast as possible.
+
+    Samples come from the trace, limits go to a quiet dry-run controller, nothing sleeps and
+    security scans are neutral (they are not recorded). Returns a summary of the run.
+    """
+    logging.basicConfig(level=log_level, format='[%(levelname)s] %(message)s')
+    monitor = ReplayMonitor(trace_file)
+    paths = monitor.paths
+    controller = CgroupController(dry_run=True, quiet=True)
+    predictors = {p: MovingAveragePredictor(window=5) for p in paths}
+    histories = {p: [] for p in paths}
+    governance = GovernanceEngine(controller)
+    scanner = ReplayScanner()
+    samples = len(monitor)
+
+    iteration = 0
+    limit_changes = 0
+    start = time.time()
+    while not monitor.exhausted:
+        before = [controller.last_value(p, 'cpu.max') for p in paths]
+        run_iteration(paths, monitor, controller, predictors, histories, scanner, governance, iteration,
+                      node_id=node_id, threshold=threshold, reporter=report_stats if report else None)
+        limit_changes += sum(1 for p, b in zip(paths, before) if controller.last_value(p, 'cpu.max') != b)
+        iteration += 1
+    wall = time.time() - start
+
+    span = monitor.end - monitor.start
+    return {
+        "trace": trace_file,
+        "paths": len(paths),
+        "samples": samples,
+        "iterations": iteration,
+        "trace_seconds": round(span, 3),
+        "wall_seconds": round(wall, 3),
+        "speedup": round(span / wall, 1) if wall > 0 else None,
+        "cpu_max_changes": limit_changes,
+        "quarantined": sorted(governance.quarantined_containers),
+        "final_cpu_max": {p: controller.last_value(p, 'cpu.max') for p in paths},
+    }
 
 
 def parse_args(argv=None):
@@ -164,11 +359,34 @@ def parse_args(argv=None):
     p.add_argument('--docker-ids', action='store_true', help='Treat provided paths as Docker container IDs and try mapping')
     p.add_argument('--log-level', default='INFO', help='Logging level')
     p.add_argument('--node-id', default='local', help='Unique identifier for this agent node')
+    p.add_argument('--cgroup-root', default=CGROUP_ROOT, help='cgroup v2 mount point')
+    p.add_argument('--allocator', action='store_true', help='Divide node CPU capacity among containers instead of sizing each alone')
+    p.add_argument('--cpu-capacity', type=float, default=None, help='Cores the allocator may hand out (default: all but 5%%)')
+    p.add_argument('--priority', action='append', default=[], metavar='PATH=CLASS',
+                   help=f"Allocator priority class per cgroup path ({', '.join(PRIORITY_CLASSES)})")
+    p.add_argument('--placement', action='store_true', help='Pin hot containers to dedicated cores/NUMA nodes and pack idle ones (cpuset)')
+    p.add_argument('--sysfs', default='/sys', help='sysfs mount point to read CPU/NUMA topology from')
+    p.add_argument('--policy', metavar='FILE', help='Declarative CPU governance rules (JSON, hot-reloaded); see examples/policies.json')
+    p.add_argument('--throttle-target', type=float, default=None, metavar='P',
+                   help='Size cpu.max at the forecast quantile that leaves a P chance of throttling, instead of a flat 1.2x headroom')
+    p.add_argument('--feedback', action='store_true', help='Steer each cpu.max from the throttling observed in cpu.stat (closed loop)')
+    p.add_argument('--feedback-class', action='append', default=[], metavar='PATH=CLASS',
+                   help=f"Feedback gains per cgroup path ({', '.join(GAIN_CLASSES)})")
+    p.add_argument('--memory', action='store_true', help='Manage memory.high/memory.max from a memory.current trend (restored on exit)')
+    p.add_argument('--network', action='store_true', help='Shape network-hungry containers with tc on their host veth (needs NET_ADMIN)')
+    p.add_argument('--reconcile', action='store_true', help='Diff desired limits against the cgroup files and only write changes (reports drift)')
+    p.add_argument('--record', metavar='FILE', help='Record every sample to a binary trace (gzip if FILE ends in .gz)')
+    p.add_argument('--spool', metavar='DIR', help='Spool samples on disk and backfill the dashboard in batches after outages')
+    p.add_argument('--replay', metavar='FILE', help='Replay a recorded trace through the agent loop as fast as possible and exit')
     return p.parse_args(argv)
 
 
 def run_from_cli(argv=None):
     args = parse_args(argv)
+    if args.replay:
+        summary = replay_trace(args.replay, node_id=args.node_id)
+        print(json.dumps(summary, indent=2))
+        return summary
     # Default path if none provided
     if not args.paths:
         cgroup_paths = ['.']
@@ -185,7 +403,24 @@ def run_from_cli(argv=None):
             else:
                 cgroup_paths.append(p)
 
-    main_loop(cgroup_paths, interval=args.interval, dry_run=args.dry_run, log_level=getattr(logging, args.log_level.upper(), logging.INFO), node_id=args.node_id)
+    allocator = None
+    if args.allocator:
+        capacity = args.cpu_capacity * USEC_PER_SEC if args.cpu_capacity else None
+        allocator = CpuAllocator(capacity=capacity)
+        for item in args.priority:
+            path, _, cls = item.rpartition('=')
+            allocator.configure(path, priority=cls)
+
+    feedback = None
+    if args.feedback:
+        feedback = ThrottleFeedback()
+        for item in args.feedback_class:
+            path, _, cls = item.rpartition('=')
+            feedback.configure(path, cls)
+
+    placement = PlacementPlanner(Topology.from_sysfs(args.sysfs)) if args.placement else None
+
+    main_loop(cgroup_paths, interval=args.interval, dry_run=args.dry_run, log_level=getattr(logging, args.log_level.upper(), logging.INFO), node_id=args.node_id, record=args.record, root=args.cgroup_root, allocator=allocator, reconcile=args.reconcile, placement=placement, policy=args.policy, spool=args.spool, throttle_target=args.throttle_target, feedback=feedback, memory=args.memory, network=args.network)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,170 @@
+"""Fleet aggregates maintained incrementally on ingest.
+
+Keeps per-node and fleet-wide totals for CPU, memory and prediction, the
+number of quarantined containers, and sorted indexes for top-K queries by
+CPU, memory, prediction or prediction error. Every update subtracts the
+container's previous contribution and adds the new one, so reads never walk
+the fleet: totals are O(1) and top-K is O(K).
+"""
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
+
+TOTAL_METRICS = ("cpu_usage", "memory_bytes", "prediction")
+RANKED_METRICS = ("cpu_usage", "memory_bytes", "prediction", "prediction_error")
+
+Key = Tuple[str, str]
+
+
+class SortedIndex:
+    """Order-statistics index: a sorted list of (value, key) maintained with bisect."""
+
+    def __init__(self):
+        self._entries: List[Tuple[float, Hashable]] = []
+        self._values: Dict[Hashable, float] = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def update(self, key: Hashable, value: float):
+        self.remove(key)
+        self._values[key] = value
+        insort(self._entries, (value, key))
+
+    def remove(self, key: Hashable):
+        old = self._values.pop(key, None)
+        if old is None:
+            return
+        i = bisect_left(self._entries, (old, key))
+        if i < len(self._entries) and self._entries[i] == (old, key):
+            del self._entries[i]
+
+    def top(self, k: int) -> List[Tuple[float, Hashable]]:
+        """The k largest entries, largest first."""
+        if k <= 0:
+            return []
+        return self._entries[:-k - 1:-1]
+
+    def bottom(self, k: int) -> List[Tuple[float, Hashable]]:
+        return self._entries[:max(0, k)]
+
+    def above(self, threshold: float) -> List[Tuple[float, Hashable]]:
+        """Entries with value > threshold, ascending."""
+        return self._entries[bisect_right(self._entries, (threshold, _MAX_KEY)):]
+
+    def value(self, key: Hashable) -> Optional[float]:
+        return self._values.get(key)
+
+    def iter_from(self, after: Optional[Tuple] = None, descending: bool = False,
+                  start: Optional[Tuple] = None) -> Iterator[Tuple]:
+        """Walk entries in order, strictly after the `after` entry (a pagination cursor).
+
+        `start` positions the walk without a cursor: ascending walks begin at the
+        first entry >= start, descending walks at the last entry < start.
+        """
+        entries = self._entries
+        if descending:
+            i = len(entries) - 1
+            if start is not None:
+                i = min(i, bisect_left(entries, start) - 1)
+            if after is not None:
+                i = min(i, bisect_left(entries, after) - 1)
+            while i >= 0:
+                yield entries[i]
+                i -= 1
+        else:
+            i = 0
+            if start is not None:
+                i = bisect_left(entries, start)
+            if after is not None:
+                i = max(i, bisect_right(entries, after))
+            while i < len(entries):
+                yield entries[i]
+                i += 1
+
+
+class _MaxKey:
+    """Sorts after every key so bisect can skip all entries with an equal value."""
+
+    def __lt__(self, other):
+        return False
+
+    def __gt__(self, other):
+        return True
+
+    def __eq__(self, other):
+        return isinstance(other, _MaxKey)
+
+
+_MAX_KEY = _MaxKey()
+
+
+def _num(v) -> float:
+    try:
+        return float(v or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class FleetAggregates:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last: Dict[Key, Dict] = {}
+        self.nodes: Dict[str, Dict] = {}
+        self.fleet = self._empty()
+        self.indexes = {m: SortedIndex() for m in RANKED_METRICS}
+
+    @staticmethod
+    def _empty() -> Dict:
+        out = {m: 0.0 for m in TOTAL_METRICS}
+        out.update(containers=0, quarantined=0)
+        return out
+
+    def _apply(self, node_id: str, contrib: Dict, sign: int):
+        node = self.nodes.get(node_id)
+        if node is None:
+            node = self.nodes[node_id] = self._empty()
+        for totals in (node, self.fleet):
+            for m in TOTAL_METRICS:
+                totals[m] += sign * contrib[m]
+            totals["containers"] += sign
+            totals["quarantined"] += sign * contrib["quarantined"]
+        if node["containers"] <= 0:
+            del self.nodes[node_id]
+
+    def update(self, node_id: str, container_id: str, sample: Dict):
+        key = (node_id, container_id)
+        with self._lock:
+            prev = self._last.get(key)
+            contrib = {m: _num(sample.get(m)) for m in TOTAL_METRICS}
+            contrib["quarantined"] = 1 if sample.get("quarantined") else 0
+            # Error of the forecast made on the previous tick against what actually happened
+            contrib["prediction_error"] = abs(prev["prediction"] - contrib["cpu_usage"]) if prev else 0.0
+            if prev:
+                self._apply(node_id, prev, -1)
+            self._apply(node_id, contrib, +1)
+            self._last[key] = contrib
+            for m in RANKED_METRICS:
+                self.indexes[m].update(key, contrib[m])
+
+    def remove(self, node_id: str, container_id: str):
+        key = (node_id, container_id)
+        with self._lock:
+            prev = self._last.pop(key, None)
+            if prev is None:
+                return
+            self._apply(node_id, prev, -1)
+            for index in self.indexes.values():
+                index.remove(key)
+
+    def top(self, metric: str = "cpu_usage", k: int = 10) -> List[Dict]:
+        if metric not in self.indexes:
+            raise KeyError(f"unknown metric {metric!r}; expected one of {RANKED_METRICS}")
+        with self._lock:
+            return [{"node_id": n, "id": c, metric: v} for v, (n, c) in self.indexes[metric].top(k)]
+
+    def totals(self, node_id: Optional[str] = None) -> Dict:
+        with self._lock:
+            if node_id is not None:
+                return dict(self.nodes.get(node_id) or self._empty())
+            return {"fleet": dict(self.fleet), "nodes": {n: dict(t) for n, t in self.nodes.items()}}
@@ -0,0 +1,169 @@
+"""Node-wide CPU allocation: divide the host's real capacity among its containers.
+
+Each tick the agent hands the allocator every container's predicted demand
+(usage rate in usec of CPU per second, measured from `cpu.stat` deltas). The
+allocator sizes each container's want (demand plus headroom, clamped to its
+min/max) and fills capacity in three passes:
+
+1. guarantees: every container gets its `min_cpu` (scaled down only if the
+   guarantees alone exceed capacity), and never less than the smallest quota
+   the kernel accepts (`MIN_CPU_QUOTA` per period);
+2. demand, by priority class: `critical` wants are filled first, then
+   `standard`, then `batch`, using weighted water-filling inside each class;
+3. slack: whatever is left is spread over everyone (up to `max_cpu`) by
+   effective weight, so an idle host still lets containers burst.
+
+The result is written as `cpu.max` (the share, which never oversubscribes the
+node in total) together with `cpu.weight` (the class weight, which decides who
+wins when the kernel has to arbitrate inside those limits).
+"""
+import logging
+import os
+from collections import deque
+from typing import Dict, List, Optional
+
+from src.controller import MIN_CPU_QUOTA
+from src.events import CPU_MAX
+
+USEC_PER_SEC = 1000000
+# cpu.weight per priority class (cgroup v2 range 1..10000, default 100), highest priority first
+PRIORITY_CLASSES = {"critical": 1000, "standard": 100, "batch": 10}
+
+
+def water_fill(capacity: float, wants: List[float], weights: List[float]) -> List[float]:
+    """Weighted max-min fair split of `capacity`: nobody gets more than it wants,
+    and unsatisfied claimants end at the same allocation per unit of weight."""
+    alloc = [0.0] * len(wants)
+    order = sorted((i for i in range(len(wants)) if wants[i] > 0 and weights[i] > 0),
+                   key=lambda i: wants[i] / weights[i])
+    remaining = capacity
+    total_weight = sum(weights[i] for i in order)
+    for pos, i in enumerate(order):
+        if remaining <= 0:
+            break
+        level = remaining / total_weight  # capacity per unit weight if everyone left shared equally
+        if wants[i] <= level * weights[i]:
+            alloc[i] = wants[i]
+            remaining -= wants[i]
+            total_weight -= weights[i]
+        else:
+            # Everyone from here on wants more than the level: they all get exactly the level
+            for j in order[pos:]:
+                alloc[j] = level * weights[j]
+            break
+    return alloc
+
+
+class CpuSpec:
+    """Allocation constraints of one container: priority class, relative weight, min/max in usec/s."""
+
+    def __init__(self, priority: str = "standard", weight: float = 1.0, min_cpu: float = 0,
+                 max_cpu: Optional[float] = None):
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"unknown priority class {priority!r}; expected one of {list(PRIORITY_CLASSES)}")
+        self.priority = priority
+        self.weight = weight
+        self.min_cpu = min_cpu
+        self.max_cpu = max_cpu
+
+    @property
+    def cpu_weight(self) -> int:
+        return max(1, min(10000, int(PRIORITY_CLASSES[self.priority] * self.weight)))
+
+
+class CpuAllocator:
+    """Collects per-container demand each tick and divides `capacity` (usec/s) among them."""
+
+    def __init__(self, capacity: Optional[float] = None, headroom: float = 1.2, window: int = 5,
+                 reserve: float = 0.05, period: int = 100000):
+        cores = os.cpu_count() or 1
+        # Keep a slice of the host for the system itself and the agent
+        self.capacity = capacity if capacity is not None else cores * USEC_PER_SEC * (1 - reserve)
+        self.headroom = headroom
+        self.window = window
+        self.period = period
+        self.specs: Dict[str, CpuSpec] = {}
+        self._rates: Dict[str, deque] = {}
+        self._last: Dict[str, tuple] = {}
+
+    def configure(self, cgroup_path: str, **spec):
+        self.specs[cgroup_path] = CpuSpec(**spec)
+
+    def spec(self, cgroup_path: str) -> CpuSpec:
+        s = self.specs.get(cgroup_path)
+        if s is None:
+            s = self.specs[cgroup_path] = CpuSpec()
+        return s
+
+    def observe(self, cgroup_path: str, sample: Dict) -> Optional[float]:
+        """Record a monitor sample; returns the usage rate (usec/s) since the previous one."""
+        usage = (sample.get('cpu_stat') or {}).get('usage_usec')
+        now = sample.get('timestamp')
+        if usage is None or now is None:
+            return None
+        last = self._last.get(cgroup_path)
+        self._last[cgroup_path] = (usage, now)
+        if last is None or now <= last[1] or usage < last[0]:
+            return None
+        rate = (usage - last[0]) / (now - last[1])
+        self._rates.setdefault(cgroup_path, deque(maxlen=self.window)).append(rate)
+        return rate
+
+    def demand(self, cgroup_path: str) -> Optional[float]:
+        """Predicted demand: moving average of the observed usage rates."""
+        rates = self._rates.get(cgroup_path)
+        if not rates:
+            return None
+        return sum(rates) / len(rates)
+
+    def allocate(self, demands: Dict[str, float], reserved: float = 0) -> Dict[str, Dict]:
+        """Split `capacity - reserved` among `demands` (path -> usec/s); returns per-path allocations."""
+        paths = list(demands)
+        specs = [self.spec(p) for p in paths]
+        capacity = max(0.0, self.capacity - reserved)
+        wants = []
+        for p, s in zip(paths, specs):
+            want = max(s.min_cpu, demands[p] * self.headroom)
+            wants.append(min(want, s.max_cpu) if s.max_cpu is not None else want)
+
+        # cpu.max cannot go below MIN_CPU_QUOTA per period, so that much is taken whatever the guarantee
+        floor = MIN_CPU_QUOTA * USEC_PER_SEC / self.period
+        mins = [max(floor, min(s.min_cpu, w)) for s, w in zip(specs, wants)]
+        total_min = sum(mins)
+        if total_min > capacity:
+            logging.warning("CPU guarantees (%d usec/s) exceed node capacity (%d); scaling them down",
+                            total_min, capacity)
+            above = total_min - floor * len(mins)
+            share = max(0.0, capacity - floor * len(mins)) / above if above else 0.0
+            mins = [floor + (m - floor) * share for m in mins]
+        alloc = list(mins)
+        remaining = capacity - sum(alloc)
+
+        for cls in PRIORITY_CLASSES:
+            idx = [i for i, s in enumerate(specs) if s.priority == cls]
+            extra = water_fill(remaining, [wants[i] - alloc[i] for i in idx], [specs[i].weight for i in idx])
+            for i, e in zip(idx, extra):
+                alloc[i] += e
+            remaining -= sum(extra)
+
+        if remaining > 0:
+            ceilings = [(s.max_cpu if s.max_cpu is not None else capacity) - a for s, a in zip(specs, alloc)]
+            extra = water_fill(remaining, ceilings, [s.cpu_weight for s in specs])
+            alloc = [a + e for a, e in zip(alloc, extra)]
+
+        contended = sum(wants) > capacity
+        return {p: {"demand": demands[p], "want": w, "cpu": a, "weight": s.cpu_weight, "priority": s.priority,
+                    "contended": contended}
+                for p, s, w, a in zip(paths, specs, wants, alloc)}
+
+    def apply(self, controller, allocations: Dict[str, Dict], events=None):
+        """Write cpu.max (share of the period) and cpu.weight for every allocation."""
+        for p, a in allocations.items():
+            before = controller.last_value(p, 'cpu.max')
+            controller.set_cpu_max(p, a["cpu"] * self.period / USEC_PER_SEC, period=self.period)
+            controller.set_cpu_weight(p, a["weight"])
+            after = controller.last_value(p, 'cpu.max')
+            if events and after != before:
+                events.emit(CPU_MAX, f"cpu.max for {p}: {before or 'unset'} -> {after}", source="NodeAllocator",
+                            container=p, demand=int(a["demand"]), allocated=int(a["cpu"]),
+                            priority=a["priority"], contended=a["contended"], value=after)
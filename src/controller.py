@@ -1,23 +1,53 @@
+import logging
 import os
-from typing import Optional
+import re
+import subprocess
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.monitor import CGROUP_ROOT
+
+# Smallest cpu.max quota the kernel accepts (usec per period)
+MIN_CPU_QUOTA = 1000
+
+# `tc -force -batch -` reports each failing line as "Command failed -:<line>" after its error
+_TC_FAILED_LINE = re.compile(r"^Command failed -:(\d+)")
+# deleting a root qdisc that is already gone: the release is in effect
+_TC_ALREADY_GONE = ("No such file or directory", "Cannot delete qdisc with handle of zero", "Cannot find device")
 
 class CgroupController:
     """Safe writer for cgroup v2 limits. Provides dry-run mode.
 
     Important: Must run as root to actually write to `/sys/fs/cgroup`.
+    `quiet` silences the dry-run messages (e.g. for trace replay at full speed).
+    `root` is the cgroup v2 mount (a fake tree in tests and benchmarks).
     """
-    def __init__(self, dry_run: bool = True):
+    def __init__(self, dry_run: bool = True, quiet: bool = False, root: str = CGROUP_ROOT):
         self.dry_run = dry_run
+        self.quiet = quiet
+        self.root = root
+        self.applied: Dict[str, str] = {}  # target path -> last value written (or that would be, in dry-run)
+        self.network_limits: Dict[str, int] = {}  # host interface -> kbit/s shaping in force
+        self._tc_batch: List[str] = []
+        self._tc_targets: List[Tuple[str, Optional[int]]] = []  # per batch line: (interface, limit it sets)
+        self._tc_before: Dict[str, Optional[int]] = {}  # interface -> limit before the queued batch
+        self.last_tc_batch: List[str] = []  # tc commands of the latest flush_network()
+
+    def last_value(self, cgroup_path: str, filename: str) -> Optional[str]:
+        """Last value this controller wrote to `filename` of a cgroup, if any."""
+        return self.applied.get(os.path.join(self.root, cgroup_path, filename))
 
     def _write_atomic(self, target_path: str, value: str) -> bool:
         if self.dry_run:
-            print(f"[dry-run] would write to {target_path}: {value}")
+            if not self.quiet:
+                print(f"[dry-run] would write to {target_path}: {value}")
+            self.applied[target_path] = value
             return True
         temp = target_path + '.tmp'
         try:
             with open(temp, 'w') as f:
                 f.write(value)
             os.replace(temp, target_path)
+            self.applied[target_path] = value
             return True
         except Exception as e:
             print(f"Error writing {target_path}: {e}")
@@ -28,57 +58,161 @@ class CgroupController:
                 pass
             return False
 
+    def write(self, cgroup_path: str, filename: str, value: str) -> bool:
+        """Write a raw value to any interface file of a cgroup (used by the reconciler)."""
+        return self._write_atomic(os.path.join(self.root, cgroup_path, filename), value)
+
     def set_cpu_max(self, cgroup_path: str, quota: Optional[int], period: int = 100000) -> bool:
         """Set `cpu.max`. If quota is None, writes `max` to remove limit.
 
         `quota` is in microseconds. `period` defaults to 100000us (100ms) commonly used.
         """
-        target = os.path.join('/sys/fs/cgroup', cgroup_path, 'cpu.max')
+        target = os.path.join(self.root, cgroup_path, 'cpu.max')
         if quota is None:
             value = 'max'
         else:
-            # avoid setting to zero
-            quota = max(1, int(quota))
+            # the kernel rejects quotas below 1ms (and zero would stop the cgroup)
+            quota = max(MIN_CPU_QUOTA, int(quota))
             value = f"{quota} {period}"
         return self._write_atomic(target, value)
 
-    def set_io_max(self, cgroup_path: str, limit_mbps: Optional[int]) -> bool:
+    def set_cpu_weight(self, cgroup_path: str, weight: int) -> bool:
+        """Set `cpu.weight` (1..10000, default 100): the cgroup's share when CPU is contended."""
+        target = os.path.join(self.root, cgroup_path, 'cpu.weight')
+        return self._write_atomic(target, str(max(1, min(10000, int(weight)))))
+
+    def set_cpuset(self, cgroup_path: str, cpus: str, mems: str) -> bool:
+        """Pin a cgroup to CPUs and NUMA memory nodes (cpulist format, e.g. '0-3,8-11' and '0')."""
+        ok = self._write_atomic(os.path.join(self.root, cgroup_path, 'cpuset.cpus'), cpus)
+        return self._write_atomic(os.path.join(self.root, cgroup_path, 'cpuset.mems'), mems) and ok
+
+    def set_io_max(self, cgroup_path: str, limit_mbps: Optional[int], device: str = '8:0') -> bool:
         """
-        Write to io.max. 
-        Format: $MAJ:$MIN rbps=$LIMIT wbps=$LIMIT
-        For prototype, we use '8:0' (SDA).
+        Cap read and write bandwidth of one device (MAJ:MIN, default 8:0) at `limit_mbps` MB/s.
+        None lifts the device's limits.
         """
-        target = os.path.join('/sys/fs/cgroup', cgroup_path, 'io.max')
-        if limit_mbps is None:
-             # Cannot easily unlimit specific devices without deleting the line, 
-             # so we return False or log.
-             return False
-
-        limit_bytes = limit_mbps * 1024 * 1024
-        value = f"8:0 rbps={limit_bytes} wbps={limit_bytes}"
+        limit_bytes = None if limit_mbps is None else limit_mbps * 1024 * 1024
+        return self.set_io_limits(cgroup_path, device, rbps=limit_bytes, wbps=limit_bytes)
+
+    def set_io_limits(self, cgroup_path: str, device: str, rbps: Optional[int] = None, wbps: Optional[int] = None,
+                      riops: Optional[int] = None, wiops: Optional[int] = None) -> bool:
+        """
+        Write one device's line of io.max.
+        Format: $MAJ:$MIN rbps=$LIMIT wbps=$LIMIT riops=$LIMIT wiops=$LIMIT
+        Every key is written, None as `max`, so passing no limits removes the device's throttle.
+        """
+        target = os.path.join(self.root, cgroup_path, 'io.max')
+        limits = (('rbps', rbps), ('wbps', wbps), ('riops', riops), ('wiops', wiops))
+        value = device + ''.join(f" {k}={'max' if v is None else max(1, int(v))}" for k, v in limits)
         return self._write_atomic(target, value)
 
-    def set_network_limit(self, container_id: str, rate_kbps: Optional[int]) -> bool:
+    def set_network_limit(self, interface: str, rate_kbps: Optional[int], burst_kbit: int = 32,
+                          latency_ms: int = 400) -> bool:
+        """Queue a `tc` token-bucket limit on a host interface (a container's veth) for `flush_network()`.
+
+        The qdisc sits on the host side of the veth, so it shapes traffic towards the container.
+        None removes the limit. Unchanged limits queue nothing.
         """
-        Uses 'tc' (Traffic Control) to limit bandwidth.
+        current = self.network_limits.get(interface)
+        if rate_kbps:
+            rate_kbps = max(1, int(rate_kbps))
+            if current == rate_kbps:
+                return True
+            self._tc_before.setdefault(interface, current)
+            self._tc_batch.append(f"qdisc replace dev {interface} root tbf rate {rate_kbps}kbit "
+                                  f"burst {burst_kbit}kbit latency {latency_ms}ms")
+            self._tc_targets.append((interface, rate_kbps))
+            self.network_limits[interface] = rate_kbps
+        elif current is not None:
+            self._tc_before.setdefault(interface, current)
+            self._tc_batch.append(f"qdisc del dev {interface} root")
+            self._tc_targets.append((interface, None))
+            del self.network_limits[interface]
+        return True
+
+    def flush_network(self) -> List[str]:
+        """Apply the queued tc commands with a single `tc -force -batch -`; returns the batch.
+
+        In dry-run the batch is only printed (and kept in `last_tc_batch`). tc carries on past
+        a failing line, so only the interfaces whose lines failed are rolled back in
+        `network_limits` (and queued again the next time they are requested); deleting a qdisc
+        that is already gone counts as done. If tc cannot say which lines failed, the whole
+        batch is rolled back.
         """
-        import logging
+        batch, self._tc_batch = self._tc_batch, []
+        targets, self._tc_targets = self._tc_targets, []
+        before, self._tc_before = self._tc_before, {}
+        self.last_tc_batch = batch
+        if not batch:
+            return batch
+        script = "\n".join(batch) + "\n"
         if self.dry_run:
-            print(f"[dry-run] set_network_limit {container_id} -> {rate_kbps} kbps")
-            return True
+            if not self.quiet:
+                print(f"[dry-run] tc -force -batch -\n{script}", end="")
+            return batch
+        try:
+            result = subprocess.run(['tc', '-force', '-batch', '-'], input=script, capture_output=True,
+                                    text=True, timeout=10)
+        except (OSError, subprocess.SubprocessError) as e:
+            logging.error("tc batch of %d commands failed: %s", len(batch), e)
+            self._rollback_network(before, targets, set(range(1, len(batch) + 1)))
+            return batch
+        if result.returncode == 0:
+            return batch
+        failed = self._failed_tc_lines(result.stderr, targets)
+        if failed is None:
+            logging.error("tc batch of %d commands failed: %s", len(batch), result.stderr.strip())
+            failed = set(range(1, len(batch) + 1))
+        elif failed:
+            logging.error("%d of %d tc commands failed: %s", len(failed), len(batch), result.stderr.strip())
+        self._rollback_network(before, targets, failed)
+        return batch
 
-        if rate_kbps:
-            cmd = f"tc qdisc add dev veth-{container_id[:6]} root tbf rate {rate_kbps}kbit burst 32kbit latency 400ms"
-            print(f"Executing: {cmd}")
-            # subprocess.run(cmd.split(), check=False)
+    @staticmethod
+    def _failed_tc_lines(stderr: str, targets: List[Tuple[str, Optional[int]]]) -> Optional[Set[int]]:
+        """1-based batch lines tc reported as failed, or None if it named none.
+
+        A `qdisc del` that failed because the qdisc (or the veth) is already gone is not counted.
+        """
+        failed, reported, errors = set(), False, []
+        for line in stderr.splitlines():
+            match = _TC_FAILED_LINE.match(line.strip())
+            if not match:
+                errors.append(line)
+                continue
+            reported = True
+            number = int(match.group(1))
+            gone = any(msg in err for err in errors for msg in _TC_ALREADY_GONE)
+            if not (0 < number <= len(targets) and targets[number - 1][1] is None and gone):
+                failed.add(number)
+            errors = []
+        return failed if reported else None
+
+    def _rollback_network(self, before: Dict[str, Optional[int]], targets: List[Tuple[str, Optional[int]]],
+                          failed: Set[int]) -> None:
+        """Set each batched interface's `network_limits` to what its last successful line applied."""
+        applied = dict(before)
+        for number, (interface, limit) in enumerate(targets, 1):
+            if number not in failed:
+                applied[interface] = limit
+        for interface, limit in applied.items():
+            if limit is None:
+                self.network_limits.pop(interface, None)
+            else:
+                self.network_limits[interface] = limit
+
+    def set_memory_high(self, cgroup_path: str, bytes_limit: Optional[int]) -> bool:
+        """Set `memory.high` (reclaim/throttle threshold below memory.max). None writes `max`."""
+        target = os.path.join(self.root, cgroup_path, 'memory.high')
+        if bytes_limit is None:
+            value = 'max'
         else:
-            cmd = f"tc qdisc del dev veth-{container_id[:6]} root"
-            print(f"Executing: {cmd}")
-        return True
+            value = str(max(1, int(bytes_limit)))
+        return self._write_atomic(target, value)
 
     def set_memory_max(self, cgroup_path: str, bytes_limit: Optional[int]) -> bool:
         """Set `memory.max`. If `bytes_limit` is None, write `max`."""
-        target = os.path.join('/sys/fs/cgroup', cgroup_path, 'memory.max')
+        target = os.path.join(self.root, cgroup_path, 'memory.max')
         if bytes_limit is None:
             value = 'max'
         else:
@@ -1,19 +1,29 @@
 import asyncio
-from fastapi import FastAPI, Request, BackgroundTasks
+import gzip
+import json
+import math
+from fastapi import FastAPI, Request
 from fastapi.templating import Jinja2Templates
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 import logging
-from typing import Dict, List
+import time
+from typing import Dict, List, Optional
 
 # Prototype imports - in a real app these would be properly injected
 try:
     from src.agent import CgroupMonitor, CgroupController
     from src.security import SecurityScanner
+    from src.storage import TelemetryStore
+    from src.loadgen import make_sample, node_names, container_names
+    from src.state_backend import DashboardState, make_backend
 except ImportError:
     # Fallback for running directly from src/
     from .agent import CgroupMonitor, CgroupController
     from .security import SecurityScanner
+    from .storage import TelemetryStore
+    from .loadgen import make_sample, node_names, container_names
+    from .state_backend import DashboardState, make_backend
 
 app = FastAPI(title="Smart OS Container Manager")
 
@@ -26,23 +36,97 @@ if not os.path.exists(template_dir):
 
 templates = Jinja2Templates(directory=template_dir)
 
+scanner = SecurityScanner()
+
+def _security_scan_job(params: Dict, progress):
+    container_id = params["container_id"]
+    result = scanner.scan_container(container_id)
+    STATE.set_security_score(container_id, result)
+    return result
+
+EVALUATION_PARAMS = ("scenario", "duration", "modes", "predictor")
+MAX_EVALUATION_DURATION = 7 * 24 * 3600  # simulated seconds
+
+def _evaluation_params(params: Dict) -> Dict:
+    """Reject unknown params and clamp `duration`, before a job is queued."""
+    unknown = sorted(set(params) - set(EVALUATION_PARAMS))
+    if unknown:
+        raise ValueError(f"unknown evaluation params {unknown}; expected {list(EVALUATION_PARAMS)}")
+    try:
+        duration = int(params.get("duration", 20))
+    except (TypeError, ValueError):
+        raise ValueError(f"duration must be an integer, got {params.get('duration')!r}")
+    modes = params.get("modes", ["static", "dynamic"])
+    if not isinstance(modes, list) or not set(modes) <= {"static", "dynamic"}:
+        raise ValueError(f"modes must be a list of 'static'/'dynamic', got {modes!r}")
+    return dict(params, duration=max(1, min(duration, MAX_EVALUATION_DURATION)))
+
+def _evaluation_job(params: Dict, progress):
+    from src.evaluation import EvaluationSuite
+
+    scenario = params.get("scenario", "Web Server Load")
+    duration = int(params.get("duration", 20))
+    modes = params.get("modes", ["static", "dynamic"])
+    predictor = params.get("predictor", "moving_average")
+    evaluator = EvaluationSuite(None)
+    for i, mode in enumerate(modes):
+        evaluator.run_scenario(scenario, duration, mode, predictor=predictor,
+                               progress=lambda f, i=i: progress((i + f) / len(modes)))
+    return evaluator.results
+
+def create_state() -> DashboardState:
+    """Builds the dashboard state; only the process that owns the state calls this."""
+    # Optional on-disk history (survives restarts); enabled by pointing DASHBOARD_DATA_DIR at a directory
+    data_dir = os.environ.get("DASHBOARD_DATA_DIR")
+    state = DashboardState(
+        store=TelemetryStore(data_dir) if data_dir else None,
+        # Stale/evict TTLs and a fleet-size cap so state tracks the live fleet rather than its history
+        stale_after=float(os.environ.get("DASHBOARD_STALE_AFTER", 30)),
+        evict_after=float(os.environ.get("DASHBOARD_EVICT_AFTER", 300)),
+        node_down_after=float(os.environ.get("DASHBOARD_NODE_DOWN_AFTER", 60)),
+        max_containers=int(os.environ.get("DASHBOARD_MAX_CONTAINERS", 10000)),
+        event_capacity=int(os.environ.get("DASHBOARD_EVENT_CAPACITY", 10000)),
+    )
+    # Heavy work runs on the job pool instead of inside the event loop
+    state.jobs.register("evaluation", _evaluation_job, limit=1, cache_ttl=300, validate=_evaluation_params)
+    state.jobs.register("security_scan", _security_scan_job, limit=4, cache_ttl=30)
+    return state
+
 # Global state
-# In production, use Redis or a proper database
-# Structure: { "node_1": { "containers": {...}, "last_seen": timestamp }, ... }
-GLOBAL_STATE = {
-    "nodes": {}
-}
+# Structure: { "nodes": { "node_1": { "containers": {...}, "last_seen": timestamp }, ... }, "security_scores": {...} }
+# One process owns it; with DASHBOARD_STATE_BACKEND=shared, other uvicorn workers read shared-memory snapshots
+STATE = make_backend(create_state)
 
-scanner = SecurityScanner()
+def ingest_container(node_id: str, stats: Dict, now: Optional[float] = None):
+    """Store the latest sample for a container and append it to its history."""
+    STATE.ingest(node_id, [stats], now)
+
+GZIP_MIN_BYTES = 1024  # smaller bodies are not worth compressing
+_gzipped: Dict[str, tuple] = {}  # section -> (ETag, gzip body), compressed once per version
+
+def _snapshot(request: Request, name: str) -> Response:
+    """A snapshot section with its ETag: 304 when the client has this version, gzip when accepted."""
+    etag, body = STATE.read_snapshot(name)
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in (t.strip() for t in if_none_match.split(","))):
+        return Response(status_code=304, headers=headers)
+    if len(body) >= GZIP_MIN_BYTES and "gzip" in request.headers.get("accept-encoding", ""):
+        cached = _gzipped.get(name)
+        if cached is None or cached[0] != etag:
+            cached = _gzipped[name] = (etag, gzip.compress(body, 5))
+        body = cached[1]
+        headers["Content-Encoding"] = "gzip"
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
 @app.get("/api/stats")
-async def get_stats():
-    """Returns the aggregated stats from all nodes."""
-    return GLOBAL_STATE["nodes"]
+async def get_stats(request: Request):
+    """Returns the aggregated stats from all nodes (ETag / If-None-Match: 304 while unchanged)."""
+    return _snapshot(request, "nodes")
 
 @app.post("/api/update_stats")
 async def update_stats(stats: Dict):
@@ -52,80 +136,200 @@ async def update_stats(stats: Dict):
     For backward compatibility, we support single update if no node_id.
     """
     node_id = stats.get("node_id", "local")
-    
-    if node_id not in GLOBAL_STATE["nodes"]:
-        GLOBAL_STATE["nodes"][node_id] = {"containers": {}, "last_seen": 0}
-    
-    # Handle single container update (agent pushing one by one)
-    container_id = stats.get("id")
-    if container_id:
-        GLOBAL_STATE["nodes"][node_id]["containers"][container_id] = stats
-    
-    GLOBAL_STATE["nodes"][node_id]["last_seen"] = asyncio.get_event_loop().time()
-    
+
+    containers = stats.get("containers")
+    if not isinstance(containers, list):
+        # Handle single container update (agent pushing one by one)
+        containers = [stats]
+    # Batched update: one request per node per tick. Off the event loop, since the shared
+    # backend forwards it to the owner over a socket.
+    await asyncio.to_thread(STATE.ingest, node_id, containers)
+
     return {"status": "ok"}
 
-@app.get("/api/security/{container_id}")
-async def scan_container(container_id: str, background_tasks: BackgroundTasks):
-    """Trigger a security scan for a container."""
-    # Run synchronously for prototype simplicity, or background if heavy
-    result = scanner.scan_container(container_id)
-    GLOBAL_STATE["security_scores"][container_id] = result
+def _decode_batch(body: bytes, encoding: str) -> Dict:
+    if encoding == "gzip":
+        body = gzip.decompress(body)
+    return json.loads(body)
+
+@app.post("/api/ingest_batch")
+async def ingest_batch(request: Request):
+    """
+    Spooled telemetry from an agent, optionally gzip-compressed (Content-Encoding: gzip):
+    { "node_id": "host1", "spool_depth": 1200, "samples": [ {seq, ts, id, cpu_usage, ...}, ... ] }
+    Samples are recorded at their original timestamps; already ingested seqs are skipped.
+    """
+    body = await request.body()
+    try:
+        batch = await asyncio.to_thread(_decode_batch, body, request.headers.get("content-encoding", ""))
+    except (OSError, EOFError, ValueError) as e:
+        return JSONResponse({"error": f"undecodable batch: {e}"}, status_code=400)
+    samples = batch.get("samples") if isinstance(batch, dict) else None
+    if not isinstance(samples, list):
+        return JSONResponse({"error": "expected a 'samples' list"}, status_code=400)
+    stored = await asyncio.to_thread(STATE.ingest_spooled, batch.get("node_id", "local"), samples,
+                                     batch.get("spool_depth"))
+    return {"status": "ok", "received": len(samples), "stored": stored}
+
+def _rss_bytes() -> Optional[int]:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except Exception:
+        return None
+
+@app.get("/api/system")
+async def get_system():
+    """Process-level figures for load testing (see src/loadgen.py)."""
+    counts = await asyncio.to_thread(STATE.counts)
+    return dict(counts, pid=os.getpid(), rss_bytes=_rss_bytes())
+
+@app.get("/api/lifecycle")
+async def get_lifecycle():
+    """Eviction counters and current tracked fleet size."""
+    return await asyncio.to_thread(STATE.lifecycle_stats)
+
+@app.get("/api/aggregates")
+async def get_aggregates(node: Optional[str] = None):
+    """Fleet and per-node totals (cpu_usage, memory_bytes, prediction, containers, quarantined), kept on ingest."""
+    return await asyncio.to_thread(STATE.totals, node)
+
+@app.get("/api/top")
+async def get_top(metric: str = "cpu_usage", k: int = 10):
+    """Top-K containers by cpu_usage, memory_bytes, prediction or prediction_error."""
+    try:
+        return await asyncio.to_thread(STATE.top, metric, max(0, min(k, 1000)))
+    except KeyError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+@app.get("/api/containers")
+async def get_containers(cursor: Optional[str] = None, limit: int = 100, sort: str = "name",
+                         node: Optional[str] = None, prefix: Optional[str] = None,
+                         quarantined: Optional[bool] = None, cpu_gt: Optional[float] = None,
+                         fields: Optional[str] = None):
+    """
+    Paginated successor to /api/stats.
+    `sort`: name, cpu_usage, memory_bytes, prediction or prediction_error; prefix with '-' for descending.
+    Filters: `node`, name `prefix`, `quarantined`, `cpu_gt`. `fields` is a comma-separated projection
+    (id and node_id are always included). Pass `next_cursor` back as `cursor` for the next page.
+    """
+    field_list = [f for f in fields.split(",") if f] if fields else None
+    try:
+        return await asyncio.to_thread(
+            STATE.query_containers, sort=sort, cursor=cursor, limit=limit, node=node, prefix=prefix,
+            quarantined=quarantined, cpu_gt=cpu_gt, fields=field_list)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+@app.get("/api/series")
+async def get_series(container: str, request: Request, node: Optional[str] = None, metric: str = "cpu_usage",
+                     step: Optional[int] = None, source: str = "auto"):
+    """
+    Range query over a container's history.
+    `from`/`to` are epoch seconds (default: the last 5 minutes); `step` is the bucket width in seconds.
+    Answered from the coarsest retention tier that still satisfies `step`.
+    `source`: memory | disk | auto (disk when memory has nothing, e.g. after a restart, or the range is older
+    than the in-memory tiers keep).
+    """
+    params = request.query_params
+    try:
+        end = float(params["to"]) if params.get("to") else time.time()
+        start = float(params["from"]) if params.get("from") else end - 300
+        if not (math.isfinite(start) and math.isfinite(end)):
+            raise ValueError("not a finite number")
+    except ValueError as e:
+        return JSONResponse({"error": f"'from'/'to' must be epoch seconds: {e}"}, status_code=400)
+    result = await asyncio.to_thread(STATE.query_series, container, start, end, step, metric, node, source)
+    if result is None:
+        return JSONResponse({"error": f"no history for {container}"}, status_code=404)
     return result
 
+async def _submit_job(kind: str, params: Dict):
+    try:
+        job = await asyncio.to_thread(STATE.submit_job, kind, params)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    status_code = 200 if job["status"] in ("done", "failed") else 202
+    return JSONResponse(job, status_code=status_code)
+
+@app.get("/api/security/{container_id}")
+async def scan_container(container_id: str):
+    """Trigger a security scan for a container. Returns the job; poll /api/jobs/{job_id} for the result."""
+    return await _submit_job("security_scan", {"container_id": container_id})
+
 @app.get("/api/security_cache")
-async def get_security_cache():
-    return GLOBAL_STATE["security_scores"]
+async def get_security_cache(request: Request):
+    return _snapshot(request, "security_scores")
 
 @app.get("/api/run_evaluation")
-async def run_evaluation(background_tasks: BackgroundTasks):
+async def run_evaluation(scenario: str = "Web Server Load", duration: int = 3600,
+                         predictor: str = "moving_average"):
     """
-    Triggers an evaluation run. 
-    In specific implementation, this would invoke src.evaluation.
-    Here we mock it by running the self-test logic of evaluation suite and returning the file content.
+    Queues a static vs dynamic evaluation run and returns its job immediately.
+    `duration` is in simulated seconds (virtual clock, see src/simulation.py), at most a simulated week.
+    The result rows (same columns as evaluation_report.csv) appear in the job's `result`.
     """
-    from src.evaluation import EvaluationSuite
-    import csv 
-    import io
+    return await _submit_job("evaluation", {"scenario": scenario, "duration": duration, "predictor": predictor})
+
+@app.post("/api/jobs/{kind}")
+async def submit_job(kind: str, params: Dict):
+    try:
+        return await _submit_job(kind, params)
+    except KeyError as e:
+        return JSONResponse({"error": str(e)}, status_code=404)
+
+@app.get("/api/jobs")
+async def list_jobs():
+    return await asyncio.to_thread(STATE.list_jobs)
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await asyncio.to_thread(STATE.get_job, job_id)
+    if job is None:
+        return JSONResponse({"error": f"unknown job {job_id}"}, status_code=404)
+    return job
 
-    # Run synchronously for this prototype demo
-    evaluator = EvaluationSuite(None)
-    evaluator.run_scenario("Web Server Load", 20, "static")
-    evaluator.run_scenario("Web Server Load", 20, "dynamic")
-    evaluator.export_csv("evaluation_report.csv")
-    
-    # Read CSV and return
-    data = []
-    with open("evaluation_report.csv", "r") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            data.append(row)
-            
-from datetime import datetime
-from collections import deque
 import random
 import threading
-import time
 
-# Event Log (Circular Buffer)
-EVENT_LOG = deque(maxlen=50)
-
-def log_event(source, message, level="INFO"):
-    timestamp = datetime.now().strftime("%H:%M:%S")
-    event = {
-        "timestamp": timestamp,
-        "source": source,
-        "message": message,
-        "level": level
-    }
-    EVENT_LOG.appendleft(event)
+# Event Log (sequenced ring buffer kept by the state owner, see src/events.py)
+def log_event(source, message, level="INFO", **kwargs):
+    STATE.log_event(source, message, level, **kwargs)
 
 # Simulation Engine
 class SimulationEngine:
+    # Workload shape (see src/loadgen.py) used for generated fleets in each mode
+    SHAPE_FOR_MODE = {"normal": "steady", "spike": "bursty", "attack": "attack", "diurnal": "diurnal"}
+
     def __init__(self):
         self.active = False
         self.thread = None
-        self.mode = "normal"  # normal, spike, attack
+        self.mode = "normal"  # normal, spike, attack, diurnal
+        self.nodes = 1
+        self.containers = 0  # 0 keeps the three named demo containers
+        self.rate = 1.0
+        self.rng = random.Random()
+
+    def configure(self, nodes: int = 1, containers: int = 0, rate: float = 1.0):
+        """Scale the in-process simulation to `nodes` x `containers` updating `rate` times per second."""
+        self.nodes = max(1, int(nodes))
+        self.containers = max(0, int(containers))
+        self.rate = max(0.1, float(rate))
+        log_event("Simulator", f"fleet_configured_{self.nodes}x{self.containers or 3}@{self.rate}hz", "INFO")
+
+    def _generate_fleet(self, elapsed: float):
+        now = time.time()
+        shape = self.SHAPE_FOR_MODE.get(self.mode, "steady")
+        names = container_names(self.containers)
+        for node_id in node_names(self.nodes):
+            STATE.ingest(node_id, [make_sample(node_id, c_id, shape, elapsed, self.rng) for c_id in names], now)
     
     def start(self):
         if self.active: return
@@ -150,40 +354,39 @@ class SimulationEngine:
         ml_container_id = "os-ml-project"
         
         start_time = time.time()
+        sim_start = start_time
         
         while self.active:
-            # 1. Background Noise (Simulated Containers)
-            if node_id not in GLOBAL_STATE["nodes"]:
-                GLOBAL_STATE["nodes"][node_id] = {"containers": {}, "last_seen": 0}
-
-            current_time = asyncio.get_event_loop().time() if asyncio.get_event_loop().is_running() else time.time()
-            GLOBAL_STATE["nodes"][node_id]["last_seen"] = current_time
+            tick_start = time.time()
+            if self.containers:
+                # Scaled-out synthetic fleet instead of the three demo services
+                self._generate_fleet(tick_start - sim_start)
+                time.sleep(max(0.0, 1.0 / self.rate - (time.time() - tick_start)))
+                continue
 
+            # 1. Background Noise (Simulated Containers)
             for c_id in bg_containers:
                 # Standard random load for background services
                 base_cpu = 100000 + random.randint(-10000, 20000)
                 if self.mode == "spike" and c_id == "web-server": base_cpu += 700000
                 if self.mode == "attack": base_cpu += 1400000
 
-                GLOBAL_STATE["nodes"][node_id]["containers"][c_id] = {
+                ingest_container(node_id, {
                     "node_id": node_id,
                     "id": c_id,
                     "cpu_usage": int(base_cpu),
                     "memory_bytes": 256 * 1024 * 1024,
                     "prediction": int(base_cpu * 1.1)
-                }
+                })
                 
                 # Security Score for bg apps
                 score = 95 if self.mode != "attack" else (45 if c_id == "web-server" and random.random() < 0.1 else 95)
-                GLOBAL_STATE["security_scores"][c_id] = {"score": score, "risks": ["Potential Threat"] if score < 50 else []}
-                if score < 50: log_event("SecurityScanner", f"Threat Detected in {c_id}", "CRITICAL")
+                STATE.set_security_score(c_id, {"score": score, "risks": ["Potential Threat"] if score < 50 else []})
+                if score < 50: log_event("SecurityScanner", f"Threat Detected in {c_id}", "CRITICAL",
+                                         event_type="security", node_id=node_id, container=c_id, score=score)
 
             # 2. Check for Real Activity (os-ml-project)
-            ml_active = False
-            for nid in GLOBAL_STATE["nodes"]:
-                if ml_container_id in GLOBAL_STATE["nodes"][nid]["containers"]:
-                    ml_active = True
-                    break
+            ml_active = STATE.has_container(ml_container_id)
             
             # If the Real Docker Container is running, synchronize our story logs with it
             if ml_active:
@@ -217,26 +420,53 @@ class SimulationEngine:
                 # Reset log timer if container disappears
                 start_time = time.time()
 
-            time.sleep(1)
+            time.sleep(max(0.0, 1.0 / self.rate - (time.time() - tick_start)))
 
 sim_engine = SimulationEngine()
 
 @app.get("/api/events")
-async def get_events():
-    return list(EVENT_LOG)
+async def get_events(request: Request, after: Optional[int] = None, type: Optional[str] = None,
+                     node: Optional[str] = None, limit: int = 500):
+    """
+    Without parameters: the newest events, newest first (legacy shape).
+    With `after=<seq>` (0 to start): events with a larger seq, oldest first, optionally filtered by
+    comma-separated `type`s and `node`; pass `next_after` back as `after` to fetch only new events.
+    The legacy shape carries an ETag, so unchanged polls get 304.
+    """
+    if after is None and type is None and node is None:
+        return _snapshot(request, "events")
+    types = [t for t in type.split(",") if t] if type else None
+    return await asyncio.to_thread(STATE.read_events, after or 0, types, node, max(1, min(limit, 5000)))
+
+@app.post("/api/events")
+async def post_events(batch: Dict):
+    """Batched typed events from agents: { "node_id": "host1", "events": [ {agent_seq, type, ...}, ... ] }."""
+    events = batch.get("events")
+    if not isinstance(events, list):
+        return JSONResponse({"error": "expected an 'events' list"}, status_code=400)
+    STATE.append_events(batch.get("node_id", "local"), events)
+    return {"status": "ok", "received": len(events)}
 
 @app.post("/api/simulation/{action}")
-async def control_simulation(action: str, mode: str = "normal"):
+async def control_simulation(action: str, mode: str = "normal", nodes: int = 1, containers: int = 0,
+                             rate: float = 1.0):
     if action == "start":
         sim_engine.start()
     elif action == "stop":
         sim_engine.stop()
     elif action == "mode":
         sim_engine.set_mode(mode)
-    return {"status": "ok", "active": sim_engine.active, "mode": sim_engine.mode}
+    elif action == "configure":
+        sim_engine.configure(nodes, containers, rate)
+    return {"status": "ok", "active": sim_engine.active, "mode": sim_engine.mode,
+            "nodes": sim_engine.nodes, "containers": sim_engine.containers, "rate": sim_engine.rate}
 
 @app.on_event("startup")
 async def startup_event():
+    # Owner election / connecting to the owner can block briefly
+    await asyncio.to_thread(STATE.start)
     log_event("System", "Dashboard Initialized", "SUCCESS")
 
-
+@app.on_event("shutdown")
+async def shutdown_event():
+    STATE.close()
@@ -1,8 +1,8 @@
 import csv
-import time
-import random
 import logging
 
+from src.simulation import PolicySimulation
+
 class EvaluationSuite:
     """
     Runs scenarios to compare OS-level resource control effectiveness.
@@ -12,67 +12,35 @@ class EvaluationSuite:
     def __init__(self, agent_controller):
         self.controller = agent_controller
         self.results = []
+        self.batch_results = []
 
-    def run_scenario(self, name: str, duration_sec: int, mode: str):
+    def run_scenario(self, name: str, duration_sec: int, mode: str, progress=None, **sim_params):
         """
         Runs a simulated workload under specific mode.
         mode: 'static' (fixed limit) or 'dynamic' (AI agent control)
+        progress: optional callback receiving the completed fraction (0..1)
+        sim_params: passed to `PolicySimulation` (predictor, containers, headroom, threshold, throttle_target, seed, ...)
+
+        Runs on the discrete-event simulator's virtual clock (see src/simulation.py), driving the
+        real predictor, GovernanceEngine and scaling policy against a simulated cgroup controller.
         """
         logging.info(f"Starting Scenario: {name} ({mode})")
-        start_time = time.time()
-        
-        # Simulated metrics accumulator
-        total_cpu_allocated = 0
-        total_cpu_used = 0
-        oom_kills = 0
-        throttled_events = 0
-
-        for i in range(duration_sec):
-            # Simulate Application Load (Random Walk)
-            # Base load + spikes
-            app_demand = 100000 + (random.random() * 50000) # Base 100k-150k
-            if i % 10 == 0: # Spike every 10s
-                app_demand += 200000 
-            
-            # Determine Limit based on mode
-            if mode == 'static':
-                limit = 200000 # Hard limit 0.2 CPU
-            else:
-                # Dynamic: Simulate Agent prediction (Perfect prediction for simplicity)
-                limit = app_demand * 1.1 
-            
-            # Metrics
-            used = min(app_demand, limit)
-            waste = max(0, limit - used)
-            
-            if app_demand > limit:
-                throttled_events += 1
-                # In extreme cases, this could be OOM or Crash
-                if (app_demand - limit) > 100000:
-                    oom_kills += 1
-            
-            total_cpu_allocated += limit
-            total_cpu_used += used
-            
-            time.sleep(0.1) # Accelerated simulation (1s loop = 0.1s real)
-
-        # Calculate aggregations
-        efficiency = (total_cpu_used / total_cpu_allocated) * 100 if total_cpu_allocated > 0 else 0
-        
-        report = {
-            "Scenario": name,
-            "Mode": mode,
-            "Duration": duration_sec,
-            "Total_Allocated": int(total_cpu_allocated),
-            "Total_Used": int(total_cpu_used),
-            "Waste": int(total_cpu_allocated - total_cpu_used),
-            "Efficiency_Percent": round(efficiency, 2),
-            "Throttled_Events": throttled_events,
-            "OOM_Kills": oom_kills
-        }
+        sim = PolicySimulation(name, duration_sec, mode=mode, progress=progress, **sim_params)
+        report = sim.run()
         self.results.append(report)
         return report
 
+    def run_batch(self, scenarios, seeds=1000, duration_sec=3600, **batch_params):
+        """
+        Monte Carlo comparison over many seeds at once (see src/montecarlo.py).
+        Returns one row per scenario x policy with mean, std and 95% CI of each metric;
+        rows are kept separately from `results` because their columns differ.
+        """
+        from src.montecarlo import run_batch
+        logging.info(f"Starting batch evaluation: {', '.join(scenarios)} x {seeds} seeds")
+        self.batch_results = run_batch(scenarios, seeds=seeds, duration=duration_sec, **batch_params)
+        return self.batch_results
+
     def export_csv(self, filename="evaluation_report.csv"):
         if not self.results:
             return
@@ -0,0 +1,177 @@
+"""Sequenced event pipeline shared by the agent and the dashboard.
+
+Events are typed dicts (`type`, `level`, `source`, `node_id`, `message` plus
+free-form `data`). On the dashboard side `EventLog` keeps them in a fixed-size
+ring indexed by a server-assigned, monotonically increasing `seq`, so
+`read(after=seq)` is O(1) to locate and clients only ever fetch what is new.
+On the agent side `EventEmitter` stamps each event with its boot id (one per
+emitter, i.e. per agent run) and a sequence number counting from 1, and ships
+them in batches from a background thread; the dashboard drops sequence numbers
+it has already stored for that boot, so retries are harmless and a restarted
+agent starts a fresh sequence.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from itertools import islice
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+# Event types emitted by the agent and the dashboard
+LOG = "log"
+QUARANTINE = "quarantine"
+RELEASE = "release"
+CPU_MAX = "cpu_max"
+IO_MAX = "io_max"
+NETWORK_LIMIT = "network_limit"
+MEMORY_HIGH = "memory_high"
+MEMORY_MAX = "memory_max"
+OOM = "oom"
+DRIFT = "drift"
+PLACEMENT = "placement"
+SECURITY = "security"
+
+
+class EventLog:
+    """Bounded ring buffer of events addressed by sequence number; caller holds the state lock."""
+
+    def __init__(self, capacity: int = 10000):
+        self.capacity = capacity
+        self._ring: List[Optional[Dict]] = [None] * capacity
+        self.last_seq = 0  # seq of the newest event; 0 when empty
+        self._agent_seq: Dict[str, tuple] = {}  # node_id -> (agent boot, last agent seq accepted)
+
+    def __len__(self):
+        return min(self.last_seq, self.capacity)
+
+    @property
+    def first_seq(self) -> int:
+        """Seq of the oldest event still held."""
+        return max(1, self.last_seq - self.capacity + 1)
+
+    def append(self, event: Dict) -> Optional[Dict]:
+        """Store one event, assigning `seq`. Returns None for an agent seq already seen from that boot."""
+        node_id = event.get("node_id")
+        agent_seq = event.get("agent_seq")
+        if node_id is not None and agent_seq is not None:
+            boot = event.get("agent_boot")
+            last_boot, last_seq = self._agent_seq.get(node_id, (None, 0))
+            if boot == last_boot and agent_seq <= last_seq:
+                return None
+            self._agent_seq[node_id] = (boot, agent_seq)
+        ts = event.get("ts") or time.time()
+        self.last_seq += 1
+        stored = dict(event, seq=self.last_seq, ts=ts, type=event.get("type") or LOG,
+                      level=event.get("level") or "INFO",
+                      timestamp=datetime.fromtimestamp(ts).strftime("%H:%M:%S"))
+        self._ring[self.last_seq % self.capacity] = stored
+        return stored
+
+    def extend(self, events: Iterable[Dict]) -> int:
+        return sum(1 for e in events if self.append(e) is not None)
+
+    def read(self, after: int = 0, types: Optional[Iterable[str]] = None, node: Optional[str] = None,
+             limit: int = 500) -> Dict:
+        """Events with seq > `after`, oldest first.
+
+        `next_after` is the cursor for the following call; `missed` counts events
+        that were overwritten before this reader got to them.
+        """
+        types = set(types) if types else None
+        if after > self.last_seq:
+            after = 0  # cursor from before a dashboard restart
+        start = max(after + 1, self.first_seq)
+        missed = max(0, start - after - 1) if after else 0
+        out = []
+        seq = start
+        while seq <= self.last_seq and len(out) < limit:
+            e = self._ring[seq % self.capacity]
+            seq += 1
+            if types is not None and e["type"] not in types:
+                continue
+            if node is not None and e.get("node_id") != node:
+                continue
+            out.append(e)
+        return {"events": out, "next_after": seq - 1 if seq > start else after, "last_seq": self.last_seq,
+                "missed": missed}
+
+    def latest(self, n: int) -> List[Dict]:
+        """The newest `n` events, newest first (the legacy /api/events shape)."""
+        first = max(self.first_seq, self.last_seq - n + 1)
+        return [self._ring[s % self.capacity] for s in range(self.last_seq, first - 1, -1)]
+
+
+class EventEmitter:
+    """Agent-side batching sender for typed events.
+
+    `emit()` only appends to a bounded in-memory queue; a background thread posts
+    batches of up to `batch_size` events every `flush_interval` seconds. When the
+    dashboard is unreachable the batch is kept and retried, and the oldest events
+    are dropped once `max_pending` is exceeded (counted in `dropped`).
+    """
+
+    def __init__(self, url: str, node_id: str = "local", batch_size: int = 500, flush_interval: float = 1.0,
+                 max_pending: int = 50000, timeout: float = 1.0, session=None):
+        self.url = url
+        self.node_id = node_id
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.session = session
+        self._pending: deque = deque(maxlen=max_pending)
+        # Deduplicated per (boot, seq), so a restart starts over instead of having to outrun the last run
+        self.boot_id = uuid.uuid4().hex
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.sent = 0
+        self.dropped = 0
+
+    def emit(self, event_type: str, message: str, level: str = "INFO", source: str = "Agent", **data):
+        with self._lock:
+            self._seq += 1
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+            self._pending.append({"agent_boot": self.boot_id, "agent_seq": self._seq, "ts": time.time(),
+                                  "type": event_type, "level": level,
+                                  "source": source, "node_id": self.node_id, "message": message, "data": data})
+
+    def flush(self) -> int:
+        """Send everything pending; returns the number of events delivered."""
+        if self.session is None:
+            import requests
+            self.session = requests.Session()
+        delivered = 0
+        while True:
+            with self._lock:
+                batch = list(islice(self._pending, self.batch_size))
+            if not batch:
+                return delivered
+            try:
+                r = self.session.post(self.url, json={"node_id": self.node_id, "events": batch}, timeout=self.timeout)
+                r.raise_for_status()
+            except Exception as e:
+                logging.debug("Event batch not delivered (%d pending): %s", len(self._pending), e)
+                return delivered
+            with self._lock:
+                # Events may have been dropped from the left meanwhile; remove only what was sent
+                while self._pending and self._pending[0]["agent_seq"] <= batch[-1]["agent_seq"]:
+                    self._pending.popleft()
+            delivered += len(batch)
+            self.sent += len(batch)
+
+    def _loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        self.flush()
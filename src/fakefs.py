@@ -0,0 +1,207 @@
+"""Fake cgroup v2 and sysfs trees on an ordinary directory, for tests and benchmarks.
+
+Point `CgroupMonitor(root=...)` / `CgroupController(root=...)` at `FakeCgroupFS.root`
+to exercise the real file-reading and writing paths without a Linux host:
+
+    fs = FakeCgroupFS(tmp_dir, containers=100)
+    monitor = CgroupMonitor(root=fs.root)
+    fs.tick(5)  # advance every container's counters by 5 seconds of work
+
+`FakeSysfs` lays out the CPU/NUMA topology files that `src.placement` reads and
+`FakeNetwork` the /proc and /sys/class/net files that `src.network` reads.
+"""
+import os
+import random
+from typing import Dict, List, Optional
+
+DEVICES = ("8:0", "259:0")
+MEMORY_EVENTS = ("low", "high", "max", "oom", "oom_kill")
+
+
+class FakeCgroupFS:
+    """N docker-style container cgroups with realistic interface files.
+
+    Each container gets `cpu.stat`, `cpu.max`, `cpu.weight`, `memory.current`,
+    `memory.stat`, `memory.events`, `memory.max`, `memory.high`, `io.stat` and
+    `io.max`, laid out as `system.slice/docker-<id>.scope` like a systemd-managed
+    Docker host.
+    """
+
+    def __init__(self, root: str, containers: int = 10, seed: Optional[int] = 0):
+        self.root = str(root)
+        self.rng = random.Random(seed)
+        self.paths: List[str] = []
+        self.counters: Dict[str, Dict[str, int]] = {}
+        for i in range(containers):
+            cid = "%064x" % self.rng.getrandbits(256)
+            self.add(f"system.slice/docker-{cid}.scope")
+
+    def add(self, cgroup_path: str) -> str:
+        """Create one cgroup directory with zeroed counters and default limits."""
+        d = os.path.join(self.root, cgroup_path)
+        os.makedirs(d, exist_ok=True)
+        self.paths.append(cgroup_path)
+        self.counters[cgroup_path] = {
+            "usage_usec": 0, "user_usec": 0, "system_usec": 0, "nr_periods": 0, "nr_throttled": 0,
+            "throttled_usec": 0, "memory": self.rng.randint(32, 512) * 1024 * 1024,
+            **{f"events {k}": 0 for k in MEMORY_EVENTS},
+            **{f"{dev} {k}": 0 for dev in DEVICES for k in ("rbytes", "wbytes", "rios", "wios")},
+        }
+        for name, value in (("cpu.max", "max 100000"), ("cpu.weight", "100"), ("memory.max", "max"),
+                            ("memory.high", "max"), ("io.max", "")):
+            self.write(cgroup_path, name, value + "\n" if value else "")
+        self._flush(cgroup_path)
+        return cgroup_path
+
+    def write(self, cgroup_path: str, filename: str, value: str):
+        with open(os.path.join(self.root, cgroup_path, filename), "w") as f:
+            f.write(value)
+
+    def read(self, cgroup_path: str, filename: str) -> str:
+        with open(os.path.join(self.root, cgroup_path, filename)) as f:
+            return f.read()
+
+    def update(self, cgroup_path: str, values: Dict[str, int]):
+        """Set counters directly (e.g. {"memory": ..., "events oom_kill": 1}) and rewrite the files."""
+        self.counters[cgroup_path].update(values)
+        self._flush(cgroup_path)
+
+    def tick(self, seconds: float = 1.0):
+        """Advance every container by `seconds` of randomized CPU, memory and IO activity."""
+        for p in self.paths:
+            c = self.counters[p]
+            usage = int(self.rng.uniform(0.05, 1.5) * 1000000 * seconds)
+            user = int(usage * self.rng.uniform(0.6, 0.9))
+            c["usage_usec"] += usage
+            c["user_usec"] += user
+            c["system_usec"] += usage - user
+            periods = int(seconds * 10)
+            c["nr_periods"] += periods
+            if usage > 1000000 * seconds:
+                c["nr_throttled"] += periods // 2
+                c["throttled_usec"] += usage - int(1000000 * seconds)
+            c["memory"] = max(4096, c["memory"] + self.rng.randint(-4, 4) * 1024 * 1024)
+            for dev in DEVICES:
+                c[f"{dev} rbytes"] += self.rng.randint(0, 8 * 1024 * 1024)
+                c[f"{dev} wbytes"] += self.rng.randint(0, 4 * 1024 * 1024)
+                c[f"{dev} rios"] += self.rng.randint(0, 200)
+                c[f"{dev} wios"] += self.rng.randint(0, 100)
+            self._flush(p)
+
+    def _flush(self, cgroup_path: str):
+        c = self.counters[cgroup_path]
+        self.write(cgroup_path, "cpu.stat", "".join(
+            f"{k} {c[k]}\n" for k in ("usage_usec", "user_usec", "system_usec", "nr_periods", "nr_throttled",
+                                      "throttled_usec")) + "nr_bursts 0\nburst_usec 0\n")
+        mem = c["memory"]
+        self.write(cgroup_path, "memory.current", f"{mem}\n")
+        # Roughly 70% anonymous memory, the rest page cache split between active and inactive lists
+        self.write(cgroup_path, "memory.stat",
+                   f"anon {mem * 7 // 10}\nfile {mem * 3 // 10}\nkernel {mem // 50}\n"
+                   f"active_anon {mem * 6 // 10}\ninactive_anon {mem // 10}\n"
+                   f"active_file {mem // 10}\ninactive_file {mem * 2 // 10}\n")
+        self.write(cgroup_path, "memory.events", "".join(f"{k} {c[f'events {k}']}\n" for k in MEMORY_EVENTS))
+        self.write(cgroup_path, "io.stat", "".join(
+            f"{dev} rbytes={c[f'{dev} rbytes']} wbytes={c[f'{dev} wbytes']} rios={c[f'{dev} rios']} "
+            f"wios={c[f'{dev} wios']} dbytes=0 dios=0\n" for dev in DEVICES))
+
+
+class FakeSysfs:
+    """CPU and NUMA topology under `<root>/devices/system`, numbered like an SMT x86 host:
+    the first thread of every core comes first, then the sibling threads (cpu0 and cpuN are siblings)."""
+
+    def __init__(self, root: str, sockets: int = 2, cores_per_socket: int = 4, threads_per_core: int = 2):
+        self.root = str(root)
+        cores = sockets * cores_per_socket
+        self.cpus = cores * threads_per_core
+        cpu_dir = os.path.join(self.root, "devices", "system", "cpu")
+        node_dir = os.path.join(self.root, "devices", "system", "node")
+        node_cpus: Dict[int, List[int]] = {s: [] for s in range(sockets)}
+        for cpu in range(self.cpus):
+            core = cpu % cores
+            socket = core // cores_per_socket
+            node_cpus[socket].append(cpu)
+            siblings = [core + t * cores for t in range(threads_per_core)]
+            topo = os.path.join(cpu_dir, f"cpu{cpu}", "topology")
+            os.makedirs(topo, exist_ok=True)
+            for name, value in (("core_id", core % cores_per_socket), ("physical_package_id", socket),
+                                ("thread_siblings_list", ",".join(map(str, siblings)))):
+                with open(os.path.join(topo, name), "w") as f:
+                    f.write(f"{value}\n")
+        with open(os.path.join(cpu_dir, "online"), "w") as f:
+            f.write(f"0-{self.cpus - 1}\n")
+        for node, cpus in node_cpus.items():
+            os.makedirs(os.path.join(node_dir, f"node{node}"), exist_ok=True)
+            with open(os.path.join(node_dir, f"node{node}", "cpulist"), "w") as f:
+                f.write(",".join(map(str, cpus)) + "\n")
+        with open(os.path.join(node_dir, "online"), "w") as f:
+            f.write(f"0-{sockets - 1}\n")
+
+
+class FakeNetwork:
+    """Host `/proc` and `/sys/class/net` under `root`, with a veth pair per attached container.
+
+    Use with `NetworkMonitor(fs.root, proc=net.proc, sysfs=net.sysfs)`.
+    """
+
+    def __init__(self, root: str):
+        self.proc = os.path.join(str(root), "proc")
+        self.sysfs = os.path.join(str(root), "sys")
+        self.counters: Dict[str, Dict[str, int]] = {}  # host interface -> /proc/net/dev counters
+        self._next_index = 2
+        self._next_pid = 1000
+        self._link("self", "net:[4026531840]")
+        self._interface("eth0")
+        self._flush()
+
+    def _link(self, pid: str, netns: str):
+        os.makedirs(os.path.join(self.proc, pid, "ns"), exist_ok=True)
+        os.symlink(netns, os.path.join(self.proc, pid, "ns", "net"))
+
+    def _interface(self, name: str) -> int:
+        index = self._next_index
+        self._next_index += 1
+        os.makedirs(os.path.join(self.sysfs, "class", "net", name), exist_ok=True)
+        with open(os.path.join(self.sysfs, "class", "net", name, "ifindex"), "w") as f:
+            f.write(f"{index}\n")
+        self.counters[name] = {"rx_bytes": 0, "rx_packets": 0, "tx_bytes": 0, "tx_packets": 0}
+        return index
+
+    def attach(self, fs: FakeCgroupFS, cgroup_path: str) -> str:
+        """Put a process of `cgroup_path` in its own netns whose eth0 pairs with a new host veth."""
+        pid = str(self._next_pid)
+        self._next_pid += 1
+        veth = "veth%06x" % int(pid)
+        host_index = self._interface(veth)
+        fs.write(cgroup_path, "cgroup.procs", f"{pid}\n")
+        self._link(pid, f"net:[{4026532000 + int(pid)}]")
+        os.makedirs(os.path.join(self.proc, pid, "net"), exist_ok=True)
+        with open(os.path.join(self.proc, pid, "net", "dev"), "w") as f:
+            f.write("Inter-|   Receive\n face |bytes\n"
+                    "    lo: 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0\n  eth0: 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0\n")
+        eth0 = os.path.join(self.proc, pid, "root", "sys", "class", "net", "eth0")
+        os.makedirs(eth0, exist_ok=True)
+        for name, value in (("ifindex", 2), ("iflink", host_index)):
+            with open(os.path.join(eth0, name), "w") as f:
+                f.write(f"{value}\n")
+        self._flush()
+        return veth
+
+    def traffic(self, veth: str, rx_bytes: int = 0, tx_bytes: int = 0, rx_packets: int = 0, tx_packets: int = 0):
+        """Count traffic of the container behind `veth`, from its point of view (rx = received by it)."""
+        c = self.counters[veth]
+        c["tx_bytes"] += rx_bytes
+        c["tx_packets"] += rx_packets
+        c["rx_bytes"] += tx_bytes
+        c["rx_packets"] += tx_packets
+        self._flush()
+
+    def _flush(self):
+        os.makedirs(os.path.join(self.proc, "net"), exist_ok=True)
+        with open(os.path.join(self.proc, "net", "dev"), "w") as f:
+            f.write("Inter-|   Receive                            |  Transmit\n"
+                    " face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop "
+                    "fifo colls carrier compressed\n")
+            for name, c in self.counters.items():
+                f.write(f"{name:>6}: {c['rx_bytes']} {c['rx_packets']} 0 0 0 0 0 0 "
+                        f"{c['tx_bytes']} {c['tx_packets']} 0 0 0 0 0 0\n")
@@ -1,22 +1,33 @@
 import logging
 from typing import Dict, List, Optional
 
+from src.events import QUARANTINE, RELEASE
+
 class GovernanceEngine:
     """
     Enforces policies based on container state (Resource Usage + Security Score).
     """
 
-    def __init__(self, controller):
+    # cpu.max quota of a quarantined container: 10,000 usec = 10ms every 100ms = 0.1 CPU
+    QUARANTINE_QUOTA = 10000
+
+    def __init__(self, controller, events=None, score_threshold: int = 50, cpu_threshold: int = 500000):
         self.controller = controller
+        # Quarantine when the security score is below `score_threshold` and predicted CPU above `cpu_threshold`
+        self.score_threshold = score_threshold
+        self.cpu_threshold = cpu_threshold
+        self.events = events  # optional EventEmitter; actions are reported to the dashboard
         self.quarantined_containers = set()
+        self.quarantine_quotas: Dict[str, int] = {}  # container -> cpu.max quota it is clamped to
+        self.last_scan: Dict[str, Dict] = {}  # container -> latest security scan, reused between scans
 
     def evaluate(self, container_id: str, cpu_usage: int, security_score: int, risks: List[str]):
         """
         Evaluates strict policies.
         
         Policy 1: Quarantine High Risk & High Load
-        If Security Score < 50 AND CPU > 90% (heuristic threshold):
-            -> Clamp CPU to 1% (1000 usec per 100ms or similar small value)
+        If Security Score < score_threshold AND CPU > cpu_threshold:
+            -> Clamp CPU to QUARANTINE_QUOTA (0.1 CPU)
         """
         # Heuristic: If score is low and CPU is high (e.g., > 1 core usage assuming 1000000 base)
         # Note: cpu_usage is in usec. 1 vCPU = 1,000,000 usec/sec roughly if normalized? 
@@ -25,30 +36,60 @@ class GovernanceEngine:
         
         # In the agent, 'pred_cpu' is the predicted usage.
         
-        if security_score < 50:
+        if security_score < self.score_threshold:
             # Check if it needs quarantine
-            # We treat 'pred_cpu' > 500,000 (0.5 cores) as "High Load" for a "Vulnerable" container
-            if cpu_usage > 500000:
+            # We treat 'pred_cpu' > cpu_threshold (0.5 cores by default) as "High Load" for a "Vulnerable" container
+            if cpu_usage > self.cpu_threshold:
                 if container_id not in self.quarantined_containers:
                     logging.warning(f"SECURITY ALERT: Quarantining container {container_id} (Score: {security_score}, CPU: {cpu_usage})")
-                    self.enforce_quarantine(container_id)
+                    self.enforce_quarantine(container_id, score=security_score, cpu=cpu_usage, risks=risks)
                 return True # Action taken
         
-        if container_id in self.quarantined_containers and security_score >= 50:
+        if container_id in self.quarantined_containers and security_score >= self.score_threshold:
             # Heal
             logging.info(f"Container {container_id} security score improved ({security_score}). Releasing from quarantine.")
-            self.release_quarantine(container_id)
+            self.release_quarantine(container_id, score=security_score)
+            return True
+
+        if container_id in self.quarantined_containers:
+            # Still quarantined: hold the clamp so predictive scaling cannot overwrite it
             return True
 
         return False
 
-    def enforce_quarantine(self, container_id: str):
+    def apply(self, container_id: str, action: str, quota: Optional[int] = None, **reason) -> bool:
+        """Carry out a governance action chosen by a policy rule (see `src.policy`).
+
+        Returns True when governance owns the container's cpu.max this tick, like `evaluate`.
+        """
+        if action == "quarantine":
+            if container_id not in self.quarantined_containers:
+                logging.warning(f"SECURITY ALERT: Quarantining container {container_id} ({reason})")
+                self.enforce_quarantine(container_id, quota=quota, **reason)
+            return True
+        if action == "release":
+            if container_id not in self.quarantined_containers:
+                return False
+            logging.info(f"Releasing container {container_id} from quarantine ({reason})")
+            self.release_quarantine(container_id, **reason)
+            return True
+        return action == "hold"
+
+    def enforce_quarantine(self, container_id: str, quota: Optional[int] = None, **reason):
         """Severely scales down the container resources."""
-        # 10,000 usec = 10ms every 100ms = 0.1 CPU
-        self.controller.set_cpu_max(container_id, 10000) 
+        quota = quota or self.QUARANTINE_QUOTA
+        self.controller.set_cpu_max(container_id, quota)
         self.quarantined_containers.add(container_id)
+        self.quarantine_quotas[container_id] = quota
+        if self.events:
+            self.events.emit(QUARANTINE, f"Quarantined {container_id} (cpu.max {quota})", level="CRITICAL",
+                             source="GovernanceEngine", container=container_id, quota=quota, **reason)
 
-    def release_quarantine(self, container_id: str):
+    def release_quarantine(self, container_id: str, **reason):
         """Releases resource limits (sets to max)."""
         self.controller.set_cpu_max(container_id, None) # Unlimited
         self.quarantined_containers.remove(container_id)
+        self.quarantine_quotas.pop(container_id, None)
+        if self.events:
+            self.events.emit(RELEASE, f"Released {container_id} from quarantine", level="SUCCESS",
+                             source="GovernanceEngine", container=container_id, **reason)
@@ -0,0 +1,123 @@
+"""Device-aware IO throttling from real per-device bandwidth and IOPS rates.
+
+`CgroupMonitor.sample()` carries the cumulative per-device `io.stat` counters
+(`io_devices`). `IoPolicy` turns consecutive samples into read/write bytes/s
+and IOPS per device, and when a cgroup keeps exceeding `hog_bps` or
+`hog_iops` on a device it caps that device only (rbps/wbps and/or
+riops/wiops in `io.max`). Once the cgroup has stayed well below the cap for
+`release_after` ticks the device's limits are lifted again by writing `max`.
+"""
+import logging
+import os
+from typing import Dict, Optional
+
+from src.events import IO_MAX
+
+MIB = 1024 * 1024
+
+
+class _DeviceState:
+    def __init__(self, counters: Dict[str, int], timestamp: float):
+        self.counters = counters
+        self.timestamp = timestamp
+        self.over = 0  # consecutive ticks above the hog thresholds
+        self.under = 0  # consecutive ticks well below the caps while limited
+        self.limits: Optional[Dict[str, Optional[int]]] = None  # io.max keys in force; None = unthrottled
+
+
+class IoPolicy:
+    """Per-device noisy-neighbour IO throttling; call `evaluate` once per tick per cgroup."""
+
+    def __init__(self, controller, events=None, hog_bps: int = 100 * MIB, hog_iops: int = 5000,
+                 cap_bps: int = 50 * MIB, cap_iops: int = 2500, sustain: int = 2, release_after: int = 6,
+                 release_fraction: float = 0.5, sysfs: str = '/sys'):
+        self.controller = controller
+        self.events = events  # optional EventEmitter
+        self.hog_bps = hog_bps
+        self.hog_iops = hog_iops
+        self.cap_bps = cap_bps
+        self.cap_iops = cap_iops
+        self.sustain = sustain
+        self.release_after = release_after
+        self.release_fraction = release_fraction
+        self.sysfs = sysfs
+        self.state: Dict[str, Dict[str, _DeviceState]] = {}
+        self._names: Dict[str, str] = {}
+
+    def device_name(self, device: str) -> str:
+        """Kernel name of a MAJ:MIN block device (e.g. 'nvme0n1'), or the MAJ:MIN itself if unknown."""
+        name = self._names.get(device)
+        if name is None:
+            name = device
+            try:
+                with open(os.path.join(self.sysfs, 'dev', 'block', device, 'uevent')) as f:
+                    for line in f:
+                        if line.startswith('DEVNAME='):
+                            name = line.strip().split('=', 1)[1]
+            except OSError:
+                pass
+            self._names[device] = name
+        return name
+
+    def rates(self, cgroup_path: str, sample: Dict) -> Dict[str, Dict[str, float]]:
+        """Per-device rates since the previous sample of this cgroup: rbps, wbps, riops, wiops."""
+        devices = self.state.setdefault(cgroup_path, {})
+        now = sample.get('timestamp') or 0.0
+        out = {}
+        for device, counters in (sample.get('io_devices') or {}).items():
+            st = devices.get(device)
+            if st is None:
+                devices[device] = _DeviceState(counters, now)
+                continue
+            elapsed = now - st.timestamp
+            prev = st.counters
+            st.counters, st.timestamp = counters, now
+            if elapsed <= 0:
+                continue
+            deltas = [counters.get(k, 0) - prev.get(k, 0) for k in ('rbytes', 'wbytes', 'rios', 'wios')]
+            if min(deltas) < 0:
+                continue  # counters reset (cgroup recreated)
+            out[device] = dict(zip(('rbps', 'wbps', 'riops', 'wiops'), (d / elapsed for d in deltas)))
+        return out
+
+    def evaluate(self, cgroup_path: str, sample: Dict) -> Dict[str, Dict]:
+        """Throttle or release each device of one cgroup; returns rates plus the limits in force."""
+        devices = self.state.setdefault(cgroup_path, {})
+        decisions = {}
+        for device, r in self.rates(cgroup_path, sample).items():
+            st = devices[device]
+            bps = r['rbps'] + r['wbps']
+            iops = r['riops'] + r['wiops']
+            bps_hot = bps > self.hog_bps
+            iops_hot = iops > self.hog_iops
+            st.over = st.over + 1 if bps_hot or iops_hot else 0
+
+            if st.over >= self.sustain:
+                limits = dict(st.limits or dict.fromkeys(('rbps', 'wbps', 'riops', 'wiops')))
+                if bps_hot:
+                    limits.update(rbps=self.cap_bps, wbps=self.cap_bps)
+                if iops_hot:
+                    limits.update(riops=self.cap_iops, wiops=self.cap_iops)
+                if limits != st.limits and self.controller.set_io_limits(cgroup_path, device, **limits):
+                    logging.info("IO hog %s on %s: %.0f B/s, %.0f IOPS -> io.max %s",
+                                 cgroup_path, device, bps, iops, limits)
+                    self._emit(f"io.max for {cgroup_path} on {self.device_name(device)} capped", "WARNING",
+                               cgroup_path, device, limits=limits, bps=int(bps), iops=int(iops))
+                    st.limits = limits
+                st.under = 0
+            elif st.limits is not None:
+                calm = (bps < self.cap_bps * self.release_fraction and
+                        iops < self.cap_iops * self.release_fraction)
+                st.under = st.under + 1 if calm else 0
+                if st.under >= self.release_after and self.controller.set_io_limits(cgroup_path, device):
+                    self._emit(f"io.max for {cgroup_path} on {self.device_name(device)} lifted", "SUCCESS",
+                               cgroup_path, device, limits=None, bps=int(bps), iops=int(iops))
+                    st.limits = None
+                    st.under = 0
+            decisions[device] = dict(r, limits=st.limits)
+        return decisions
+
+    def _emit(self, message: str, level: str, cgroup_path: str, device: str, **data):
+        if self.events:
+            self.events.emit(IO_MAX, message, level=level, source="IoPolicy", container=cgroup_path,
+                             device=device, device_name=self.device_name(device), **data)
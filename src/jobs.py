@@ -0,0 +1,147 @@
+"""Background job executor for slow dashboard work (evaluation runs, security scans).
+
+Jobs run on a thread pool so request handlers return a job ID immediately.
+Each job kind has its own concurrency limit (extra jobs wait in a FIFO queue),
+identical in-flight requests are de-duplicated, and finished results are
+cached by (kind, params) for `cache_ttl` seconds.
+"""
+import itertools
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+
+class Job:
+    def __init__(self, job_id: str, kind: str, params: Dict):
+        self.id = job_id
+        self.kind = kind
+        self.params = params
+        self.status = "queued"  # queued -> running -> done | failed
+        self.progress = 0.0
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    def set_progress(self, fraction: float):
+        self.progress = max(0.0, min(1.0, float(fraction)))
+
+    def to_dict(self, include_result: bool = True) -> Dict:
+        out = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "progress": round(self.progress, 3),
+            "error": self.error,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+        }
+        if include_result:
+            out["result"] = self.result
+        return out
+
+
+class JobManager:
+    """Runs registered job kinds on a shared worker pool.
+
+    A handler is `fn(params: dict, progress: Callable[[float], None]) -> result`; an optional
+    `validate(params) -> params` checks and normalises the params at submission (ValueError to reject).
+    """
+
+    def __init__(self, max_workers: int = 4, max_jobs: int = 200):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._handlers: Dict[str, Dict] = {}
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._by_key: Dict[str, Job] = {}
+        self._running: Dict[str, int] = {}
+        self._pending: Dict[str, deque] = {}
+        self._ids = itertools.count(1)
+        self.max_jobs = max_jobs
+
+    def register(self, kind: str, fn: Callable, limit: int = 1, cache_ttl: float = 60.0,
+                 validate: Optional[Callable[[Dict], Dict]] = None):
+        self._handlers[kind] = {"fn": fn, "limit": limit, "cache_ttl": cache_ttl, "validate": validate}
+        self._running.setdefault(kind, 0)
+        self._pending.setdefault(kind, deque())
+
+    @staticmethod
+    def _key(kind: str, params: Dict) -> str:
+        return kind + ":" + json.dumps(params, sort_keys=True, default=str)
+
+    def submit(self, kind: str, params: Optional[Dict] = None) -> Job:
+        """Queue a job, or return an identical queued/running/fresh one."""
+        if kind not in self._handlers:
+            raise KeyError(f"unknown job kind: {kind}")
+        params = dict(params or {})
+        validate = self._handlers[kind]["validate"]
+        if validate is not None:
+            params = validate(params)
+        key = self._key(kind, params)
+        ttl = self._handlers[kind]["cache_ttl"]
+        with self._lock:
+            existing = self._by_key.get(key)
+            if existing is not None:
+                if existing.status in ("queued", "running"):
+                    return existing
+                if existing.status == "done" and time.time() - existing.finished < ttl:
+                    return existing
+            job = Job(f"{kind}-{next(self._ids)}", kind, params)
+            self._jobs[job.id] = job
+            self._by_key[key] = job
+            self._trim()
+            if self._running[kind] < self._handlers[kind]["limit"]:
+                self._start(job)
+            else:
+                self._pending[kind].append(job)
+        return job
+
+    def _trim(self):
+        while len(self._jobs) > self.max_jobs:
+            old_id, old = next(iter(self._jobs.items()))
+            if old.status in ("queued", "running"):
+                break
+            del self._jobs[old_id]
+            key = self._key(old.kind, old.params)
+            if self._by_key.get(key) is old:
+                del self._by_key[key]
+
+    def _start(self, job: Job):
+        # Caller holds self._lock
+        self._running[job.kind] += 1
+        self._executor.submit(self._run, job)
+
+    def _run(self, job: Job):
+        job.status = "running"
+        job.started = time.time()
+        try:
+            job.result = self._handlers[job.kind]["fn"](job.params, job.set_progress)
+            job.progress = 1.0
+            job.status = "done"
+        except Exception as e:
+            logging.error("Job %s failed: %s", job.id, e)
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+            with self._lock:
+                self._running[job.kind] -= 1
+                if self._pending[job.kind]:
+                    self._start(self._pending[job.kind].popleft())
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return [j.to_dict(include_result=False) for j in reversed(self._jobs.values())]
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
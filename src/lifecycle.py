@@ -0,0 +1,115 @@
+"""TTL and LRU lifecycle management for the dashboard's node/container state.
+
+Containers are tracked in recency order on every ingest. A periodic `sweep()`
+marks containers stale after `stale_after` seconds of silence, evicts them
+after `evict_after`, marks nodes down once their `last_seen` is older than
+`node_down_after`, and drops down nodes that no longer have containers.
+`max_containers` caps the tracked fleet; the least recently updated
+container is evicted first when it is exceeded.
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+Key = Tuple[str, str]
+
+
+class StateLifecycle:
+    def __init__(self, state: Dict, stale_after: float = 30.0, evict_after: float = 300.0,
+                 node_down_after: float = 60.0, max_containers: int = 10000, max_security_scores: int = 10000,
+                 on_evict: Optional[Callable[[str, str], None]] = None):
+        self.state = state
+        self.stale_after = stale_after
+        self.evict_after = evict_after
+        self.node_down_after = node_down_after
+        self.max_containers = max_containers
+        self.max_security_scores = max_security_scores
+        self.on_evict = on_evict
+        self._seen: "OrderedDict[Key, float]" = OrderedDict()
+        self._stale = set()
+        self._nodes_per_id: Counter = Counter()  # container_id -> number of nodes reporting it
+        self._lock = threading.Lock()
+        self.counters = {
+            "evicted_ttl": 0,
+            "evicted_lru": 0,
+            "marked_stale": 0,
+            "nodes_down": 0,
+            "nodes_removed": 0,
+            "security_scores_evicted": 0,
+        }
+
+    def touch(self, node_id: str, container_id: str, now: Optional[float] = None):
+        """Record activity for a container; called on every ingest."""
+        now = time.time() if now is None else now
+        key = (node_id, container_id)
+        with self._lock:
+            if key not in self._seen:
+                self._nodes_per_id[container_id] += 1
+            self._seen[key] = now
+            self._seen.move_to_end(key)
+            self._stale.discard(key)
+            node = self.state["nodes"].get(node_id)
+            if node is not None:
+                node.pop("status", None)
+            while len(self._seen) > self.max_containers:
+                old_key, _ = self._seen.popitem(last=False)
+                self._evict(old_key)
+                self.counters["evicted_lru"] += 1
+
+    def _evict(self, key: Key):
+        # Caller holds self._lock
+        node_id, container_id = key
+        self._stale.discard(key)
+        node = self.state["nodes"].get(node_id)
+        if node is not None:
+            node["containers"].pop(container_id, None)
+        self._nodes_per_id[container_id] -= 1
+        if self._nodes_per_id[container_id] <= 0:
+            del self._nodes_per_id[container_id]
+            if self.state.get("security_scores", {}).pop(container_id, None) is not None:
+                self.counters["security_scores_evicted"] += 1
+        if self.on_evict:
+            self.on_evict(node_id, container_id)
+
+    def sweep(self, now: Optional[float] = None) -> Dict:
+        """Apply TTLs. Cost is proportional to the number of expiring entries."""
+        now = time.time() if now is None else now
+        with self._lock:
+            expiring = []
+            for key, seen in self._seen.items():
+                if now - seen < self.stale_after:
+                    break  # ordered by recency: everything after is fresher
+                expiring.append((key, now - seen))
+            for key, age in expiring:
+                if age >= self.evict_after:
+                    del self._seen[key]
+                    self._evict(key)
+                    self.counters["evicted_ttl"] += 1
+                elif key not in self._stale:
+                    self._stale.add(key)
+                    self.counters["marked_stale"] += 1
+                    c = self.state["nodes"].get(key[0], {}).get("containers", {}).get(key[1])
+                    if c is not None:
+                        c["status"] = "stale"
+
+            for node_id, node in list(self.state["nodes"].items()):
+                silent = now - node.get("last_seen", 0)
+                if silent < self.node_down_after:
+                    continue
+                if node.get("status") != "down":
+                    node["status"] = "down"
+                    self.counters["nodes_down"] += 1
+                if not node["containers"] and silent >= self.evict_after:
+                    del self.state["nodes"][node_id]
+                    self.counters["nodes_removed"] += 1
+
+            scores = self.state.get("security_scores", {})
+            while len(scores) > self.max_security_scores:
+                del scores[next(iter(scores))]
+                self.counters["security_scores_evicted"] += 1
+        return self.stats()
+
+    def stats(self) -> Dict:
+        return dict(self.counters, tracked_containers=len(self._seen), stale_containers=len(self._stale),
+                    nodes=len(self.state["nodes"]))
@@ -0,0 +1,242 @@
+"""Synthetic fleet load generator for the dashboard's ingest path.
+
+Simulates N nodes x M containers with configurable workload shapes and drives
+`/api/update_stats` over real HTTP from a pool of worker processes. The
+coordinator reports achieved ingest throughput, request latency percentiles,
+visibility lag (time until a sample shows up in `/api/stats`) and server RSS.
+Given a `session` (anything with requests' `get`/`post`, e.g. a FastAPI
+TestClient) the workers run as threads in-process and share it instead.
+
+Usage:
+    python -m src.loadgen --url http://localhost:8000 --nodes 10 --containers 100 \\
+        --rate 1 --duration 60 --processes 4 --shape diurnal
+"""
+import argparse
+import json
+import math
+import multiprocessing as mp
+import queue
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+SHAPES = ("steady", "diurnal", "bursty", "attack")
+
+BASE_CPU = 100000  # usec/s, same baseline as the dashboard simulator
+BASE_MEM = 256 * 1024 * 1024
+
+
+def container_names(count: int) -> List[str]:
+    return [f"c-{i:04d}" for i in range(count)]
+
+
+def node_names(count: int) -> List[str]:
+    return [f"sim-node-{i + 1:02d}" for i in range(count)]
+
+
+def shape_cpu(shape: str, t: float, rng: random.Random, phase: float = 0.0, period: float = 600.0) -> float:
+    """CPU demand (usec/s) of one container at time `t` seconds into the run.
+
+    - steady:  baseline plus noise
+    - diurnal: sinusoid with a compressed `period`-second "day", per-container phase
+    - bursty:  baseline with short random bursts of 5-8x
+    - attack:  ramps to ~1.5 cores over the first minute and stays there
+    """
+    noise = rng.randint(-10000, 20000)
+    if shape == "diurnal":
+        return BASE_CPU * (1.0 + 3.0 * (0.5 + 0.5 * math.sin(2 * math.pi * (t / period + phase)))) + noise
+    if shape == "bursty":
+        burst = rng.random() < 0.05
+        return BASE_CPU * (rng.uniform(5, 8) if burst else 1.0) + noise
+    if shape == "attack":
+        return BASE_CPU + 1400000 * min(1.0, t / 60.0) + noise
+    return BASE_CPU + noise
+
+
+def make_sample(node_id: str, container_id: str, shape: str, t: float, rng: random.Random,
+                phase: float = 0.0) -> Dict:
+    """One telemetry sample in the agent's `report_stats` payload format."""
+    cpu = max(0, int(shape_cpu(shape, t, rng, phase)))
+    return {
+        "node_id": node_id,
+        "id": container_id,
+        "cpu_usage": cpu,
+        "memory_bytes": BASE_MEM + cpu * 64,
+        "prediction": int(cpu * 1.1),
+    }
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(math.ceil(q / 100.0 * len(values))) - 1))
+    return values[k]
+
+
+def _worker(url: str, nodes: List[str], containers: int, rate: float, duration: float, shape: str,
+            batch: bool, seed: int, start_at: float, out: "mp.Queue", session=None):
+    if session is None:
+        import requests
+        session = requests.Session()
+
+    rng = random.Random(seed)
+    names = container_names(containers)
+    phases = {c: rng.random() for c in names}
+    endpoint = url.rstrip('/') + "/api/update_stats"
+    latencies: List[float] = []
+    samples = errors = requests_sent = 0
+
+    time.sleep(max(0.0, start_at - time.time()))
+    interval = 1.0 / rate
+    tick = 0
+    while True:
+        due = start_at + tick * interval
+        if due - start_at >= duration:
+            break
+        time.sleep(max(0.0, due - time.time()))
+        t = time.time() - start_at
+        for node_id in nodes:
+            batch_samples = [make_sample(node_id, c, shape, t, rng, phases[c]) for c in names]
+            for s in batch_samples:
+                s["sent_at"] = time.time()
+            payloads = [{"node_id": node_id, "containers": batch_samples}] if batch else batch_samples
+            for payload in payloads:
+                t0 = time.perf_counter()
+                try:
+                    r = session.post(endpoint, json=payload, timeout=5)
+                    if r.status_code != 200:
+                        errors += 1
+                except Exception:
+                    errors += 1
+                latencies.append(time.perf_counter() - t0)
+                requests_sent += 1
+            samples += len(batch_samples)
+        tick += 1
+    out.put({"samples": samples, "requests": requests_sent, "errors": errors, "latencies": latencies})
+
+
+class LoadGenerator:
+    """Fans the simulated fleet out over worker processes and aggregates their results."""
+
+    def __init__(self, url: str = "http://localhost:8000", nodes: int = 1, containers: int = 3,
+                 rate: float = 1.0, duration: float = 30.0, shape: str = "steady", processes: int = 1,
+                 batch: bool = True, seed: int = 0, session=None):
+        if shape not in SHAPES:
+            raise ValueError(f"unknown shape {shape!r}; expected one of {SHAPES}")
+        self.url = url.rstrip('/')
+        self.nodes = node_names(nodes)
+        self.containers = containers
+        self.rate = rate
+        self.duration = duration
+        self.shape = shape
+        self.processes = max(1, min(processes, nodes))
+        self.batch = batch
+        self.seed = seed
+        self.session = session  # in-process run: worker threads share it
+
+    def _server_stats(self, session) -> Optional[Dict]:
+        try:
+            return session.get(self.url + "/api/system", timeout=2).json()
+        except Exception:
+            return None
+
+    def _visibility_lag(self, session) -> Optional[float]:
+        """Age of the newest sample the server exposes for the first simulated container."""
+        try:
+            nodes = session.get(self.url + "/api/stats", timeout=2).json()
+            sample = nodes[self.nodes[0]]["containers"][container_names(1)[0]]
+            return time.time() - sample["sent_at"]
+        except Exception:
+            return None
+
+    def run(self) -> Dict:
+        session = self.session
+        if session is None:
+            import requests
+            session = requests.Session()
+        rss_before = (self._server_stats(session) or {}).get("rss_bytes")
+        out = queue.Queue() if self.session is not None else mp.Queue()
+        start_at = time.time() + 1.0
+        procs = []
+        for i in range(self.processes):
+            assigned = self.nodes[i::self.processes]
+            args = (self.url, assigned, self.containers, self.rate, self.duration, self.shape, self.batch,
+                    self.seed + i, start_at, out)
+            if self.session is not None:
+                p = threading.Thread(target=_worker, args=args + (self.session,), daemon=True)
+            else:
+                p = mp.Process(target=_worker, args=args, daemon=True)
+            p.start()
+            procs.append(p)
+
+        rss_peak = rss_before or 0
+        lags: List[float] = []
+        time.sleep(max(0.0, start_at - time.time()))
+        while time.time() < start_at + self.duration:
+            stats = self._server_stats(session)
+            if stats and stats.get("rss_bytes"):
+                rss_peak = max(rss_peak, stats["rss_bytes"])
+            lag = self._visibility_lag(session)
+            if lag is not None:
+                lags.append(lag)
+            time.sleep(1.0)
+
+        results = [out.get(timeout=self.duration + 60) for _ in procs]
+        for p in procs:
+            p.join(timeout=5)
+        elapsed = time.time() - start_at
+        rss_after = (self._server_stats(session) or {}).get("rss_bytes")
+
+        latencies = [l for r in results for l in r["latencies"]]
+        samples = sum(r["samples"] for r in results)
+        requests_sent = sum(r["requests"] for r in results)
+        target = len(self.nodes) * self.containers * self.rate
+        ms = lambda v: round(v * 1000, 2) if v is not None else None
+        return {
+            "nodes": len(self.nodes),
+            "containers_per_node": self.containers,
+            "shape": self.shape,
+            "processes": self.processes,
+            "batch": self.batch,
+            "target_samples_per_sec": target,
+            "achieved_samples_per_sec": round(samples / elapsed, 1),
+            "requests_per_sec": round(requests_sent / elapsed, 1),
+            "samples": samples,
+            "errors": sum(r["errors"] for r in results),
+            "latency_ms": {
+                "p50": ms(_percentile(latencies, 50)),
+                "p90": ms(_percentile(latencies, 90)),
+                "p99": ms(_percentile(latencies, 99)),
+                "max": ms(max(latencies) if latencies else None),
+            },
+            "visibility_lag_ms": {"p50": ms(_percentile(lags, 50)), "max": ms(max(lags) if lags else None)},
+            "server_rss_bytes": {"before": rss_before, "peak": rss_peak or None, "after": rss_after},
+        }
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description='Synthetic load generator for the dashboard ingest path')
+    p.add_argument('--url', default='http://localhost:8000', help='Dashboard base URL')
+    p.add_argument('--nodes', type=int, default=1, help='Number of simulated nodes')
+    p.add_argument('--containers', type=int, default=3, help='Containers per node')
+    p.add_argument('--rate', type=float, default=1.0, help='Updates per container per second')
+    p.add_argument('--duration', type=float, default=30.0, help='Run length in seconds')
+    p.add_argument('--shape', choices=SHAPES, default='steady', help='Workload shape')
+    p.add_argument('--processes', type=int, default=1, help='Worker processes (nodes are split between them)')
+    p.add_argument('--no-batch', action='store_true', help='Send one request per container instead of per node')
+    p.add_argument('--seed', type=int, default=0, help='Random seed')
+    return p.parse_args(argv)
+
+
+def run_from_cli(argv=None):
+    args = parse_args(argv)
+    gen = LoadGenerator(url=args.url, nodes=args.nodes, containers=args.containers, rate=args.rate,
+                        duration=args.duration, shape=args.shape, processes=args.processes,
+                        batch=not args.no_batch, seed=args.seed)
+    print(json.dumps(gen.run(), indent=2))
+
+
+if __name__ == '__main__':
+    run_from_cli()
@@ -0,0 +1,158 @@
+"""Predictive memory control: memory.high ahead of demand, memory.max ahead of pressure.
+
+Per container the policy keeps the last few `memory.current` samples and fits a
+linear trend to forecast usage `horizon` ticks out. Each tick it:
+
+- sets `memory.high` to the forecast plus headroom, so a container that grows
+  faster than predicted is reclaimed and throttled by the kernel instead of
+  running into `memory.max` and the OOM killer;
+- raises `memory.max` (only where one is configured, and never lowers it) when
+  the forecast approaches it, or immediately after `max`/`oom` events;
+- once a container has been flat for `idle_ticks`, pulls `memory.high` down to
+  its working set (`anon` + `active_file` from `memory.stat`) so idle page
+  cache is handed back to the node.
+
+`memory.high` is left alone until `min_samples` readings are in the trend
+window, and `release()` writes `max` back to every memory.high the policy set
+(the agent does this on shutdown). `memory.events` deltas (high, max, oom,
+oom_kill) are read every tick to measure the effect and are summed per
+container in `totals`.
+"""
+import logging
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+from src.events import MEMORY_HIGH, MEMORY_MAX, OOM
+
+MIB = 1024 * 1024
+EVENT_KEYS = ("high", "max", "oom", "oom_kill")
+
+
+class _MemoryState:
+    def __init__(self, window: int):
+        self.history = deque(maxlen=window)
+        self.high: Optional[int] = None  # last memory.high written; None = not managed yet
+        self.max: Optional[int] = None  # memory.max in force; None = unlimited
+        self.max_known = False
+        self.idle = 0
+        self.events: Optional[Dict[str, int]] = None
+
+
+class MemoryPolicy:
+    """Forecast-driven memory.high/memory.max for the agent; call `evaluate` once per tick per cgroup."""
+
+    def __init__(self, controller, monitor, events=None, window: int = 12, horizon: int = 6,
+                 high_headroom: float = 1.15, max_headroom: float = 1.5, min_bytes: int = 64 * MIB,
+                 idle_ticks: int = 30, idle_slope: int = 256 * 1024, step: int = 4 * MIB,
+                 hysteresis: float = 0.05, max_limit: Optional[int] = None, min_samples: int = 6):
+        self.controller = controller
+        self.monitor = monitor
+        self.events = events  # optional EventEmitter
+        self.window = window
+        self.horizon = horizon
+        self.high_headroom = high_headroom
+        self.max_headroom = max_headroom
+        self.min_bytes = min_bytes
+        self.idle_ticks = idle_ticks
+        self.idle_slope = idle_slope  # bytes/tick below which a container counts as flat
+        self.step = step  # limits are rounded up to this granularity
+        self.hysteresis = hysteresis  # skip memory.high rewrites smaller than this fraction
+        self.max_limit = max_limit  # never raise memory.max above this (e.g. node capacity)
+        self.min_samples = min(min_samples, window)  # samples in the trend before memory.high is managed
+        self.state: Dict[str, _MemoryState] = {}
+        self.totals: Dict[str, Dict[str, int]] = {}
+
+    def forecast(self, history) -> Tuple[float, float]:
+        """(predicted bytes `horizon` ticks ahead, slope in bytes/tick) from a least-squares trend."""
+        n = len(history)
+        if n < 2:
+            return (float(history[-1]) if n else 0.0), 0.0
+        mean_x = (n - 1) / 2.0
+        mean_y = sum(history) / n
+        cov = sum((i - mean_x) * (y - mean_y) for i, y in enumerate(history))
+        var = sum((i - mean_x) ** 2 for i in range(n))
+        slope = cov / var
+        # Only growth is extrapolated; shrinking containers are handled by the idle path
+        return history[-1] + max(0.0, slope) * self.horizon, slope
+
+    def _align(self, value: float) -> int:
+        return int(-(-value // self.step) * self.step)
+
+    def _event_deltas(self, cgroup_path: str, st: _MemoryState) -> Dict[str, int]:
+        counters = self.monitor.read_memory_events(cgroup_path) or {}
+        previous = st.events if st.events is not None else counters
+        st.events = counters
+        deltas = {k: max(0, counters.get(k, 0) - previous.get(k, 0)) for k in EVENT_KEYS}
+        totals = self.totals.setdefault(cgroup_path, dict.fromkeys(EVENT_KEYS, 0))
+        for k, v in deltas.items():
+            totals[k] += v
+        return deltas
+
+    def evaluate(self, cgroup_path: str, memory_bytes: Optional[int]) -> Optional[Dict]:
+        """Update limits for one cgroup from its latest `memory.current`; returns the decision."""
+        if not memory_bytes:
+            return None
+        st = self.state.get(cgroup_path)
+        if st is None:
+            st = self.state[cgroup_path] = _MemoryState(self.window)
+        st.history.append(memory_bytes)
+        deltas = self._event_deltas(cgroup_path, st)
+        if not st.max_known:
+            st.max = self.monitor.read_memory_limit(cgroup_path, 'memory.max')
+            st.max_known = True
+
+        predicted, slope = self.forecast(st.history)
+        st.idle = st.idle + 1 if abs(slope) <= self.idle_slope and not any(deltas.values()) else 0
+        pressure = deltas["max"] or deltas["oom"] or deltas["oom_kill"]
+
+        high = predicted * self.high_headroom
+        if st.idle >= self.idle_ticks:
+            stat = self.monitor.read_memory_stat(cgroup_path) or {}
+            working_set = stat.get("anon", 0) + stat.get("active_file", 0) or memory_bytes
+            high = min(high, working_set * self.high_headroom)
+        high = max(self.min_bytes, self._align(high))
+
+        if st.max is not None:
+            wanted = predicted * self.max_headroom
+            if pressure:
+                # The kernel already hit memory.max: give real room rather than the forecast's
+                wanted = max(wanted, st.max * self.max_headroom)
+            if wanted > st.max:
+                new_max = self._align(wanted)
+                if self.max_limit is not None:
+                    new_max = min(new_max, self.max_limit)
+                if new_max > st.max and self.controller.set_memory_max(cgroup_path, new_max):
+                    logging.info("Memory forecast for %s: %d -> raise memory.max %d -> %d",
+                                 cgroup_path, predicted, st.max, new_max)
+                    self._emit(MEMORY_MAX, f"memory.max for {cgroup_path}: {st.max} -> {new_max}", "WARNING",
+                               cgroup_path, previous=st.max, value=new_max, forecast=int(predicted))
+                    st.max = new_max
+            # memory.high above memory.max would never trigger
+            high = min(high, st.max)
+
+        if len(st.history) < self.min_samples:
+            pass  # too few samples for a trend: a one-sample "forecast" would clamp a growing container
+        elif st.high is None or abs(high - st.high) > self.hysteresis * st.high:
+            if self.controller.set_memory_high(cgroup_path, high):
+                self._emit(MEMORY_HIGH, f"memory.high for {cgroup_path}: {st.high or 'max'} -> {high}", "INFO",
+                           cgroup_path, previous=st.high, value=high, forecast=int(predicted),
+                           idle=st.idle >= self.idle_ticks)
+                st.high = high
+
+        if deltas["oom_kill"]:
+            self._emit(OOM, f"{deltas['oom_kill']} OOM kill(s) in {cgroup_path}", "CRITICAL", cgroup_path,
+                       oom_kill=deltas["oom_kill"], memory_bytes=memory_bytes)
+
+        return {"current": memory_bytes, "forecast": int(predicted), "slope": slope, "high": st.high,
+                "max": st.max, "idle": st.idle >= self.idle_ticks, "events": deltas}
+
+    def release(self, controller=None):
+        """Write `max` back to every memory.high the policy set (e.g. on agent shutdown)."""
+        controller = controller or self.controller
+        for cgroup_path, st in self.state.items():
+            if st.high is not None and controller.set_memory_high(cgroup_path, None):
+                st.high = None
+
+    def _emit(self, event_type: str, message: str, level: str, cgroup_path: str, **data):
+        if self.events:
+            self.events.emit(event_type, message, level=level, source="MemoryPolicy", container=cgroup_path, **data)
@@ -2,18 +2,27 @@ import os
 import time
 from typing import Dict, Optional
 
+from src.network import NetworkMonitor
+
+CGROUP_ROOT = '/sys/fs/cgroup'
+
 class CgroupMonitor:
     """Small helper to read minimal cgroup v2 stats for a container.
 
     Methods are intentionally simple and tolerant so unit tests can run on non-Linux hosts.
+    `recorder` (e.g. `src.trace.TraceWriter`) receives every sample, for later replay.
+    `root` is the cgroup v2 mount (a fake tree in tests and benchmarks).
+    `network` (a `src.network.NetworkMonitor`) finds each cgroup's veth; one is created for `root` by default.
     """
 
-    def __init__(self):
-        pass
+    def __init__(self, recorder=None, root: str = CGROUP_ROOT, network: Optional[NetworkMonitor] = None):
+        self.recorder = recorder
+        self.root = root
+        self.network = network if network is not None else NetworkMonitor(root)
 
     def read_cpu_stat(self, cgroup_path: str) -> Optional[Dict[str, int]]:
-        """Read `/sys/fs/cgroup/<path>/cpu.stat` and return dict with usage_usec."""
-        path = os.path.join('/sys/fs/cgroup', cgroup_path, 'cpu.stat')
+        """Read `<root>/<path>/cpu.stat` and return dict with usage_usec."""
+        path = os.path.join(self.root, cgroup_path, 'cpu.stat')
         try:
             with open(path, 'r') as f:
                 data = f.read().splitlines()
@@ -26,31 +35,98 @@ class CgroupMonitor:
         return out
 
     def read_memory_current(self, cgroup_path: str) -> Optional[int]:
-        path = os.path.join('/sys/fs/cgroup', cgroup_path, 'memory.current')
+        path = os.path.join(self.root, cgroup_path, 'memory.current')
         try:
             with open(path, 'r') as f:
                 return int(f.read().strip())
         except Exception:
             return None
 
+    def _read_flat_keyed(self, cgroup_path: str, filename: str) -> Optional[Dict[str, int]]:
+        """Parse a flat-keyed interface file (`key value` per line), e.g. memory.stat."""
+        path = os.path.join(self.root, cgroup_path, filename)
+        try:
+            with open(path, 'r') as f:
+                data = f.read().split()
+        except Exception:
+            return None
+        return {data[i]: int(data[i + 1]) for i in range(0, len(data) - 1, 2)}
+
+    def read_memory_stat(self, cgroup_path: str) -> Optional[Dict[str, int]]:
+        """`memory.stat` breakdown (anon, file, active_file, inactive_file, ...) in bytes."""
+        return self._read_flat_keyed(cgroup_path, 'memory.stat')
+
+    def read_memory_events(self, cgroup_path: str) -> Optional[Dict[str, int]]:
+        """Cumulative `memory.events` counters: low, high, max, oom, oom_kill."""
+        return self._read_flat_keyed(cgroup_path, 'memory.events')
+
+    def read_memory_limit(self, cgroup_path: str, filename: str = 'memory.max') -> Optional[int]:
+        """Configured `memory.max`/`memory.high` in bytes; None when unlimited or unreadable."""
+        path = os.path.join(self.root, cgroup_path, filename)
+        try:
+            with open(path, 'r') as f:
+                value = f.read().strip()
+            return None if value == 'max' else int(value)
+        except Exception:
+            return None
+
+    def read_files(self, cgroup_path: str, filenames) -> Dict[str, Optional[str]]:
+        """Raw contents of several interface files (e.g. the limits a reconciler compares); None if unreadable."""
+        out = {}
+        for name in filenames:
+            try:
+                with open(os.path.join(self.root, cgroup_path, name), 'r') as f:
+                    out[name] = f.read()
+            except Exception:
+                out[name] = None
+        return out
+
     def sample(self, cgroup_path: str) -> Dict:
         now = time.time()
         cpu = self.read_cpu_stat(cgroup_path) or {}
         mem = self.read_memory_current(cgroup_path)
-        return {
+        io = self.read_io_devices(cgroup_path)
+        net = self.network.counters(cgroup_path)
+        sample = {
             'timestamp': now,
             'cgroup_path': cgroup_path,
             'cpu_stat': cpu,
             'memory_bytes': mem,
-            'io_read_bytes': self.read_io_stat(cgroup_path),
-            # Network stat would ideally require container runtime introspection or /proc/net/dev of the namespace
-            # For prototype, we skip implementation or mock it
-            'net_rx_bytes': 0 
+            # Total read+write bytes over all devices (kept for existing consumers); per device below
+            'io_read_bytes': sum(d.get('rbytes', 0) + d.get('wbytes', 0) for d in io.values()),
+            'io_devices': io,
+            # Bytes received by the container through its veth (0 without one); full counters below
+            'net_rx_bytes': net['rx_bytes'] if net else 0,
+            'net': net,
         }
+        if self.recorder is not None:
+            self.recorder.write(sample)
+        return sample
+
+    def read_io_devices(self, cgroup_path: str) -> Dict[str, Dict[str, int]]:
+        """Per-device cumulative io.stat counters: {"8:0": {"rbytes", "wbytes", "rios", "wios", ...}}."""
+        path = os.path.join(self.root, cgroup_path, 'io.stat')
+        devices = {}
+        try:
+            with open(path, 'r') as f:
+                data = f.read().splitlines()
+        except Exception:
+            return devices
+        for line in data:
+            parts = line.split()
+            if not parts:
+                continue
+            counters = {}
+            for p in parts[1:]:
+                k, _, v = p.partition('=')
+                if v.isdigit():
+                    counters[k] = int(v)
+            devices[parts[0]] = counters
+        return devices
 
     def read_io_stat(self, cgroup_path: str) -> int:
         """Reads io.stat for the given cgroup and returns total read+write bytes."""
-        path = os.path.join('/sys/fs/cgroup', cgroup_path, 'io.stat')
+        path = os.path.join(self.root, cgroup_path, 'io.stat')
         total_bytes = 0
         try:
             with open(path, 'r') as f:
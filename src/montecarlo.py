@@ -0,0 +1,246 @@
+"""Vectorized Monte Carlo evaluation of CPU limit policies.
+
+Where `src.simulation` replays one seed through the real agent objects, this
+module evaluates thousands of seeds at once with NumPy so static and dynamic
+limits can be compared with confidence intervals instead of a single number.
+For each scenario a (seeds x seconds) demand matrix is drawn with the same
+workload shapes as `src.loadgen`; every policy is a row block in the same
+arrays:
+
+- static: a fixed limit, evaluated over the whole matrix in one step;
+- dynamic: the agent's policy (5-sample moving average of observed usage,
+  `cpu_quota_for(prediction, threshold, headroom)`), stepped second by second
+  with all seeds and all (headroom, threshold) pairs advancing together.
+
+Seed blocks are fanned out over a process pool; per-seed metrics are reduced
+to mean, standard deviation and a 95% confidence interval.
+
+Usage:
+    python -m src.montecarlo --scenarios "Web Server Load" bursty diurnal --seeds 2000 \\
+        --duration 3600 --headroom 1.1 1.2 1.5 --threshold 0 200000 --csv mc.csv --json mc.json
+"""
+import argparse
+import csv
+import itertools
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+BASE_CPU = 100000  # usec/s, as in src.loadgen
+SCENARIOS = ("Web Server Load", "steady", "diurnal", "bursty", "attack")
+METRICS = ("Efficiency_Percent", "Waste", "Throttled_Events", "OOM_Kills")
+Z95 = 1.959964
+
+
+def demand_matrix(scenario: str, seeds: Sequence[int], duration: int, variation: float = 0.0) -> np.ndarray:
+    """CPU demand (usec/s) for each seed (rows) and simulated second (columns)."""
+    out = np.empty((len(seeds), duration))
+    t = np.arange(duration, dtype=float)
+    for row, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed)
+        noise = rng.integers(-10000, 20001, duration)
+        if scenario == "Web Server Load":
+            d = 100000 + rng.random(duration) * 50000 + 200000 * (t % 10 == 0)
+        elif scenario == "diurnal":
+            phase = rng.random()
+            d = BASE_CPU * (1.0 + 3.0 * (0.5 + 0.5 * np.sin(2 * np.pi * (t / 600.0 + phase)))) + noise
+        elif scenario == "bursty":
+            burst = rng.random(duration) < 0.05
+            d = BASE_CPU * np.where(burst, rng.uniform(5, 8, duration), 1.0) + noise
+        elif scenario == "attack":
+            d = BASE_CPU + 1400000 * np.minimum(1.0, t / 60.0) + noise
+        elif scenario == "steady":
+            d = BASE_CPU + noise
+        else:
+            raise ValueError(f"unknown scenario {scenario!r}; expected one of {SCENARIOS}")
+        if variation:
+            # Workload variants: each seed's load is scaled by a log-normal factor
+            d = d * rng.lognormal(0.0, variation)
+        out[row] = d
+    return np.maximum(out, 0.0)
+
+
+def _account(demand: np.ndarray, limit: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Usage and allocation for one simulated second; a NaN limit means unlimited."""
+    unlimited = np.isnan(limit)
+    used = np.where(unlimited, demand, np.fmin(demand, limit))
+    # An unlimited cgroup reserves nothing beyond what it uses
+    allocated = np.where(unlimited, used, limit)
+    return used, allocated
+
+
+def evaluate_static(demand: np.ndarray, limit: float) -> Dict[str, np.ndarray]:
+    """Fixed limit for every seed; the whole matrix is reduced at once."""
+    used = np.minimum(demand, limit)
+    deficit = demand - used
+    allocated = np.full(demand.shape[0], limit * demand.shape[1])
+    total_used = used.sum(axis=1)
+    return {
+        "Efficiency_Percent": total_used / allocated * 100,
+        "Waste": allocated - total_used,
+        "Throttled_Events": (deficit > 0).sum(axis=1),
+        "OOM_Kills": (deficit > 100000).sum(axis=1),
+    }
+
+
+def evaluate_dynamic(demand: np.ndarray, headrooms: Sequence[float], thresholds: Sequence[float],
+                     window: int = 5) -> List[Dict[str, np.ndarray]]:
+    """Agent policy for every (headroom, threshold) pair, all seeds stepping together.
+
+    Mirrors `PolicySimulation` with a 1s interval: the limit in force during second t
+    was decided from the usage observed up to t-1, and the first second is unlimited.
+    """
+    seeds, duration = demand.shape
+    pairs = len(headrooms)
+    # (seconds x rows), row block p holds every seed under policy p; contiguous per step
+    d = np.ascontiguousarray(np.tile(demand.T, (1, pairs)))
+    headroom = np.repeat(np.asarray(headrooms, dtype=float), seeds)
+    threshold = np.repeat(np.asarray(thresholds, dtype=float), seeds)
+    rows = d.shape[1]
+
+    limit = np.full(rows, np.nan)
+    ring = np.zeros((window, rows))
+    window_sum = np.zeros(rows)
+    total_used = np.zeros(rows)
+    total_alloc = np.zeros(rows)
+    throttled = np.zeros(rows, dtype=np.int64)
+    severe = np.zeros(rows, dtype=np.int64)
+    for t in range(duration):
+        dt = d[t]
+        used, allocated = _account(dt, limit)
+        total_used += used
+        total_alloc += allocated
+        deficit = dt - used
+        throttled += deficit > 0
+        severe += deficit > 100000
+        # Agent tick: moving average of the usage it could observe, then cpu_quota_for
+        slot = t % window
+        window_sum += used - ring[slot]
+        ring[slot] = used
+        pred = window_sum / min(t + 1, window)
+        limit = np.where(pred > threshold, np.maximum(1.0, np.floor(pred * headroom)), np.nan)
+
+    eff = np.divide(total_used, total_alloc, out=np.zeros(rows), where=total_alloc > 0) * 100
+    results = []
+    for p in range(pairs):
+        s = slice(p * seeds, (p + 1) * seeds)
+        results.append({
+            "Efficiency_Percent": eff[s],
+            "Waste": total_alloc[s] - total_used[s],
+            "Throttled_Events": throttled[s],
+            "OOM_Kills": severe[s],
+        })
+    return results
+
+
+def _run_block(args) -> List[Tuple[Tuple, Dict[str, np.ndarray]]]:
+    scenario, seeds, duration, variation, static_limits, dynamic = args
+    demand = demand_matrix(scenario, seeds, duration, variation)
+    out = [((scenario, "static", limit, None, None), evaluate_static(demand, limit)) for limit in static_limits]
+    if dynamic:
+        headrooms, thresholds = zip(*dynamic)
+        for (h, th), metrics in zip(dynamic, evaluate_dynamic(demand, headrooms, thresholds)):
+            out.append(((scenario, "dynamic", None, h, th), metrics))
+    return out
+
+
+def confidence(values: np.ndarray) -> Dict[str, float]:
+    n = len(values)
+    mean = float(np.mean(values))
+    std = float(np.std(values, ddof=1)) if n > 1 else 0.0
+    half = Z95 * std / math.sqrt(n) if n > 1 else 0.0
+    return {"mean": mean, "std": std, "ci_low": mean - half, "ci_high": mean + half}
+
+
+def run_batch(scenarios: Sequence[str] = ("Web Server Load",), seeds: int = 1000, duration: int = 3600,
+              static_limits: Sequence[float] = (200000,), headrooms: Sequence[float] = (1.2,),
+              thresholds: Sequence[float] = (0,), variation: float = 0.0, workers: Optional[int] = None,
+              block_size: Optional[int] = None, first_seed: int = 0) -> List[Dict]:
+    """Evaluate every scenario x policy over `seeds` seeds; one summary row per (scenario, policy).
+
+    Seeds are split into blocks (default: one per worker) and each (scenario, block) is a pool task.
+    """
+    dynamic = list(itertools.product(headrooms, thresholds))
+    workers = workers or os.cpu_count() or 1
+    block_size = block_size or max(1, math.ceil(seeds / workers))
+    seed_list = list(range(first_seed, first_seed + seeds))
+    blocks = [seed_list[i:i + block_size] for i in range(0, len(seed_list), block_size)]
+    tasks = [(sc, block, duration, variation, tuple(static_limits), dynamic) for sc in scenarios for block in blocks]
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            parts = list(pool.map(_run_block, tasks))
+    else:
+        parts = [_run_block(t) for t in tasks]
+
+    merged: Dict[Tuple, Dict[str, List[np.ndarray]]] = {}
+    for part in parts:
+        for key, metrics in part:
+            slot = merged.setdefault(key, {m: [] for m in METRICS})
+            for m in METRICS:
+                slot[m].append(metrics[m])
+
+    rows = []
+    for (scenario, mode, limit, headroom, threshold), metrics in merged.items():
+        row = {"Scenario": scenario, "Mode": mode, "Static_Limit": limit, "Headroom": headroom,
+               "Threshold": threshold, "Seeds": seeds, "Duration": duration, "Variation": variation}
+        for m in METRICS:
+            ci = confidence(np.concatenate(metrics[m]))
+            row[f"{m}_Mean"] = round(ci["mean"], 4)
+            row[f"{m}_Std"] = round(ci["std"], 4)
+            row[f"{m}_CI95_Low"] = round(ci["ci_low"], 4)
+            row[f"{m}_CI95_High"] = round(ci["ci_high"], 4)
+        rows.append(row)
+    return rows
+
+
+def write_csv(rows: List[Dict], filename: str):
+    with open(filename, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_json(rows: List[Dict], filename: str):
+    with open(filename, 'w') as f:
+        json.dump(rows, f, indent=2)
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description='Monte Carlo comparison of static vs dynamic CPU limits')
+    p.add_argument('--scenarios', nargs='+', default=['Web Server Load'], choices=SCENARIOS)
+    p.add_argument('--seeds', type=int, default=1000)
+    p.add_argument('--duration', type=int, default=3600, help='Simulated seconds per seed')
+    p.add_argument('--static-limit', type=float, nargs='*', default=[200000], help='usec/s')
+    p.add_argument('--headroom', type=float, nargs='*', default=[1.2])
+    p.add_argument('--threshold', type=float, nargs='*', default=[0])
+    p.add_argument('--variation', type=float, default=0.0, help='Log-normal sigma of per-seed load scaling')
+    p.add_argument('--workers', type=int, default=None, help='Processes (default: CPU count)')
+    p.add_argument('--csv', default=None)
+    p.add_argument('--json', default=None)
+    return p.parse_args(argv)
+
+
+def run_from_cli(argv=None):
+    args = parse_args(argv)
+    rows = run_batch(args.scenarios, seeds=args.seeds, duration=args.duration, static_limits=args.static_limit,
+                     headrooms=args.headroom or [], thresholds=args.threshold or [0], variation=args.variation,
+                     workers=args.workers)
+    for r in rows:
+        print(f"{r['Scenario']:<16} {r['Mode']:<8} limit={r['Static_Limit']} headroom={r['Headroom']} "
+              f"threshold={r['Threshold']}  efficiency {r['Efficiency_Percent_Mean']:.2f}% "
+              f"[{r['Efficiency_Percent_CI95_Low']:.2f}, {r['Efficiency_Percent_CI95_High']:.2f}]  "
+              f"throttled {r['Throttled_Events_Mean']:.1f}  oom {r['OOM_Kills_Mean']:.1f}")
+    if args.csv:
+        write_csv(rows, args.csv)
+    if args.json:
+        write_json(rows, args.json)
+    return rows
+
+
+if __name__ == '__main__':
+    run_from_cli()
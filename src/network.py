@@ -0,0 +1,219 @@
+"""Per-container network accounting and shaping.
+
+A container's traffic crosses the host through one end of a veth pair. To find
+it, `NetworkMonitor` takes a process of the cgroup (`cgroup.procs`), reads the
+`iflink` of its interfaces from inside its network namespace
+(`/proc/<pid>/root/sys/class/net/<if>/iflink`) and matches that against the
+host's `ifindex` files. The mapping is cached per cgroup.
+
+Counters for all containers come from a single read of the host's
+`/proc/net/dev` per tick (cached for `max_age` seconds). They are reported from
+the container's point of view: what the host veth transmits the container
+receives.
+
+`NetworkPolicy` turns consecutive samples into byte/packet rates and caps
+containers that keep receiving above `hog_bps` with a `tc` token bucket on
+their veth. The controller queues the commands and `flush()` applies all of
+them with one `tc -batch` call per tick.
+"""
+import logging
+import os
+import time
+from typing import Dict, Optional
+
+from src.events import NETWORK_LIMIT
+
+MIB = 1024 * 1024
+NET_DEV_FIELDS = ("rx_bytes", "rx_packets", "rx_errs", "rx_drop", "rx_fifo", "rx_frame", "rx_compressed",
+                  "rx_multicast", "tx_bytes", "tx_packets", "tx_errs", "tx_drop", "tx_fifo", "tx_colls",
+                  "tx_carrier", "tx_compressed")
+
+
+def read_net_dev(path: str = '/proc/net/dev') -> Dict[str, Dict[str, int]]:
+    """All interfaces' cumulative counters from one `/proc/net/dev` read: {"veth1a2b": {"rx_bytes": ...}}."""
+    try:
+        with open(path, 'r') as f:
+            lines = f.read().splitlines()[2:]  # two header lines
+    except OSError:
+        return {}
+    out = {}
+    for line in lines:
+        name, _, values = line.partition(':')
+        if values:
+            out[name.strip()] = dict(zip(NET_DEV_FIELDS, map(int, values.split())))
+    return out
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path, 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+class NetworkMonitor:
+    """Maps cgroups to their host veth and reads the counters of all of them in bulk."""
+
+    def __init__(self, root: str, proc: str = '/proc', sysfs: str = '/sys', max_age: float = 1.0,
+                 retry_after: float = 30.0, clock=time.monotonic):
+        self.root = root
+        self.proc = proc
+        self.sysfs = sysfs
+        self.max_age = max_age
+        self.retry_after = retry_after  # seconds before a cgroup without a veth is looked up again
+        self.clock = clock
+        self.veths: Dict[str, str] = {}  # cgroup path -> host interface
+        self._misses: Dict[str, float] = {}
+        self._ifindex: Dict[int, str] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._read_at: Optional[float] = None
+
+    def interfaces(self) -> Dict[str, Dict[str, int]]:
+        """Host interface counters, re-read at most once every `max_age` seconds."""
+        now = self.clock()
+        if self._read_at is None or now - self._read_at >= self.max_age:
+            self._counters = read_net_dev(os.path.join(self.proc, 'net', 'dev'))
+            self._read_at = now
+        return self._counters
+
+    def _host_interface(self, ifindex: int) -> Optional[str]:
+        if ifindex not in self._ifindex:
+            # New veths appear as containers start: rebuild the whole index on a miss
+            net = os.path.join(self.sysfs, 'class', 'net')
+            try:
+                names = os.listdir(net)
+            except OSError:
+                names = []
+            self._ifindex = {}
+            for name in names:
+                index = _read(os.path.join(net, name, 'ifindex'))
+                if index and index.isdigit():
+                    self._ifindex[int(index)] = name
+        return self._ifindex.get(ifindex)
+
+    def veth_for(self, cgroup_path: str) -> Optional[str]:
+        """Host-side interface of a cgroup's network namespace, or None (host networking, no processes)."""
+        veth = self.veths.get(cgroup_path)
+        if veth is not None and veth in self.interfaces():
+            return veth
+        self.veths.pop(cgroup_path, None)
+        now = self.clock()
+        missed = self._misses.get(cgroup_path)
+        if missed is not None and now - missed < self.retry_after:
+            return None
+        self._misses[cgroup_path] = now
+        procs = _read(os.path.join(self.root, cgroup_path, 'cgroup.procs'))
+        if not procs:
+            return None
+        pid = procs.split(None, 1)[0]
+        netns = self._netns(pid)
+        if netns is None or netns == self._netns('self'):
+            return None  # host networking: the host's own veth ends would be mistaken for the container's
+        for name in read_net_dev(os.path.join(self.proc, pid, 'net', 'dev')):
+            if name == 'lo':
+                continue
+            iflink = _read(os.path.join(self.proc, pid, 'root', 'sys', 'class', 'net', name, 'iflink'))
+            index = _read(os.path.join(self.proc, pid, 'root', 'sys', 'class', 'net', name, 'ifindex'))
+            if not iflink or not iflink.isdigit() or iflink == index:
+                continue  # not one end of a pair
+            veth = self._host_interface(int(iflink))
+            if veth:
+                self.veths[cgroup_path] = veth
+                del self._misses[cgroup_path]
+                return veth
+        return None
+
+    def _netns(self, pid: str) -> Optional[str]:
+        try:
+            return os.readlink(os.path.join(self.proc, pid, 'ns', 'net'))
+        except OSError:
+            return None
+
+    def counters(self, cgroup_path: str) -> Optional[Dict[str, int]]:
+        """Cumulative bytes/packets as seen by the container: rx is what its veth sent to it."""
+        veth = self.veth_for(cgroup_path)
+        c = self.interfaces().get(veth) if veth else None
+        if c is None:
+            return None
+        return {"interface": veth, "rx_bytes": c["tx_bytes"], "tx_bytes": c["rx_bytes"],
+                "rx_packets": c["tx_packets"], "tx_packets": c["rx_packets"]}
+
+
+class NetworkPolicy:
+    """Caps containers that keep receiving above `hog_bps`; call `evaluate` per cgroup, then `flush` per tick."""
+
+    def __init__(self, controller, events=None, hog_bps: int = 50 * MIB, cap_kbps: int = 200000,
+                 sustain: int = 2, release_after: int = 6, release_fraction: float = 0.5):
+        self.controller = controller
+        self.events = events  # optional EventEmitter
+        self.hog_bps = hog_bps
+        self.cap_kbps = cap_kbps
+        self.sustain = sustain
+        self.release_after = release_after
+        self.release_fraction = release_fraction
+        self.state: Dict[str, Dict] = {}
+
+    def rates(self, cgroup_path: str, sample: Dict) -> Optional[Dict[str, float]]:
+        """rx/tx bytes and packets per second since the previous sample of this cgroup."""
+        net = sample.get('net')
+        now = sample.get('timestamp')
+        if not net or now is None:
+            return None
+        st = self.state.setdefault(cgroup_path, {"last": None, "over": 0, "under": 0, "limit": None})
+        last, st["last"] = st["last"], (net, now)
+        if last is not None and last[0]["interface"] != net["interface"]:
+            # Container restarted on a new veth: it starts unshaped
+            st.update(over=0, under=0, limit=None)
+            return None
+        if last is None or now <= last[1]:
+            return None
+        keys = ("rx_bytes", "tx_bytes", "rx_packets", "tx_packets")
+        deltas = [net[k] - last[0][k] for k in keys]
+        if min(deltas) < 0:
+            return None  # counters reset (veth recreated)
+        elapsed = now - last[1]
+        return dict(zip(("rx_bps", "tx_bps", "rx_pps", "tx_pps"), (d / elapsed for d in deltas)))
+
+    def evaluate(self, cgroup_path: str, sample: Dict) -> Optional[Dict]:
+        """Queue a cap or release for one cgroup's veth; returns its rates plus the limit in force."""
+        r = self.rates(cgroup_path, sample)
+        if r is None:
+            return None
+        st = self.state[cgroup_path]
+        veth = sample['net']['interface']
+        st["over"] = st["over"] + 1 if r["rx_bps"] > self.hog_bps else 0
+        if st["over"] >= self.sustain and st["limit"] is None:
+            if self.controller.set_network_limit(veth, self.cap_kbps):
+                logging.info("Network hog %s on %s: %.0f B/s received -> %d kbit/s", cgroup_path, veth,
+                             r["rx_bps"], self.cap_kbps)
+                self._emit(f"network for {cgroup_path} capped at {self.cap_kbps} kbit/s", "WARNING", cgroup_path,
+                           veth, limit_kbps=self.cap_kbps, rx_bps=int(r["rx_bps"]))
+                st["limit"] = self.cap_kbps
+            st["under"] = 0
+        elif st["limit"] is not None:
+            calm = r["rx_bps"] * 8 / 1000 < st["limit"] * self.release_fraction
+            st["under"] = st["under"] + 1 if calm else 0
+            if st["under"] >= self.release_after and self.controller.set_network_limit(veth, None):
+                self._emit(f"network limit for {cgroup_path} lifted", "SUCCESS", cgroup_path, veth,
+                           limit_kbps=None, rx_bps=int(r["rx_bps"]))
+                st["limit"] = None
+                st["under"] = 0
+        return dict(r, interface=veth, limit_kbps=st["limit"])
+
+    def flush(self):
+        """Apply every change queued this tick in one tc invocation.
+
+        Limits are then re-read from the controller, which rolls back a failed batch, so a cap or
+        release tc did not apply is retried next tick instead of policy and kernel drifting apart.
+        """
+        batch = self.controller.flush_network()
+        for st in self.state.values():
+            if st["last"] is not None:
+                st["limit"] = self.controller.network_limits.get(st["last"][0]["interface"])
+        return batch
+
+    def _emit(self, message: str, level: str, cgroup_path: str, interface: str, **data):
+        if self.events:
+            self.events.emit(NETWORK_LIMIT, message, level=level, source="NetworkPolicy", container=cgroup_path,
+                             interface=interface, **data)
@@ -0,0 +1,229 @@
+"""Topology-aware cpuset/NUMA placement.
+
+Quotas decide how much CPU a container may use; placement decides where. The
+planner reads the host's cores, SMT siblings and NUMA nodes from sysfs and
+tracks each container's CPU load (EWMA of `cpu.stat` usage rates, in cores):
+
+- predicted-hot containers (load above `hot_cores` for `hot_ticks` ticks) get
+  an exclusive set of whole physical cores, sized to their load plus headroom,
+  on a single NUMA node, with `cpuset.mems` pinned to that node;
+- idle containers are packed onto a small pool of shared cores on the node
+  with the fewest isolated containers;
+- everyone else shares the remaining cores.
+
+Rebalancing is damped: a container must stay hot/cold for several ticks to
+change class, isolated containers keep their cores while they still fit, and
+at most `max_moves` isolations change per rebalance. `plan()` only computes;
+`rebalance()` writes `cpuset.cpus`/`cpuset.mems` through the controller, so a
+dry-run controller (or `plan()` alone against `src.fakefs.FakeSysfs`) plans
+without touching the host. The containers' parent cgroup must have `cpuset`
+enabled in `cgroup.subtree_control`.
+"""
+import glob
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+
+from src.events import PLACEMENT
+
+Core = Tuple[int, ...]  # SMT sibling CPUs of one physical core
+
+
+def parse_cpulist(text: str) -> List[int]:
+    """'0-3,8,10-11' -> [0, 1, 2, 3, 8, 10, 11]"""
+    cpus = []
+    for part in text.strip().split(','):
+        if not part:
+            continue
+        lo, _, hi = part.partition('-')
+        cpus.extend(range(int(lo), int(hi or lo) + 1))
+    return cpus
+
+
+def format_cpulist(cpus) -> str:
+    """[0, 1, 2, 3, 8] -> '0-3,8'"""
+    out = []
+    for cpu in sorted(cpus):
+        if out and cpu == out[-1][1] + 1:
+            out[-1][1] = cpu
+        else:
+            out.append([cpu, cpu])
+    return ','.join(str(lo) if lo == hi else f"{lo}-{hi}" for lo, hi in out)
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+class Topology:
+    """Physical cores grouped by NUMA node."""
+
+    def __init__(self, nodes: Dict[int, List[Core]]):
+        self.nodes = {n: sorted(cores) for n, cores in nodes.items()}
+        self.node_of = {core: n for n, cores in self.nodes.items() for core in cores}
+
+    @property
+    def cores(self) -> List[Core]:
+        return [c for n in sorted(self.nodes) for c in self.nodes[n]]
+
+    @classmethod
+    def from_sysfs(cls, sysfs: str = '/sys') -> "Topology":
+        system = os.path.join(sysfs, 'devices', 'system')
+        online = parse_cpulist(_read(os.path.join(system, 'cpu', 'online')) or '0')
+        node_of_cpu = {}
+        for node_dir in glob.glob(os.path.join(system, 'node', 'node[0-9]*')):
+            node = int(os.path.basename(node_dir)[4:])
+            for cpu in parse_cpulist(_read(os.path.join(node_dir, 'cpulist')) or ''):
+                node_of_cpu[cpu] = node
+        nodes: Dict[int, set] = {}
+        for cpu in online:
+            siblings = _read(os.path.join(system, 'cpu', f'cpu{cpu}', 'topology', 'thread_siblings_list'))
+            core = tuple(c for c in parse_cpulist(siblings) if c in online) if siblings else (cpu,)
+            # Machines without NUMA directories are a single node
+            nodes.setdefault(node_of_cpu.get(cpu, 0), set()).add(core)
+        return cls({n: list(cores) for n, cores in nodes.items()})
+
+
+class _Load:
+    def __init__(self):
+        self.last: Optional[Tuple[int, float]] = None
+        self.cores = 0.0  # EWMA of usage in cores
+        self.rates = 0
+        self.hot_streak = 0
+        self.cold_streak = 0
+        self.hot = False
+
+
+class PlacementPlanner:
+    """Plans cpuset.cpus/cpuset.mems per container from load history; see module docstring."""
+
+    def __init__(self, topology: Topology, hot_cores: float = 1.0, idle_cores: float = 0.05, headroom: float = 1.25,
+                 hot_ticks: int = 3, cool_ticks: int = 6, alpha: float = 0.3, min_shared_cores: int = 2,
+                 max_isolated_fraction: float = 0.5, idle_pool_cores: int = 1, max_moves: int = 2,
+                 rebalance_every: int = 1):
+        self.topology = topology
+        self.hot_cores = hot_cores
+        self.idle_cores = idle_cores
+        self.headroom = headroom
+        self.hot_ticks = hot_ticks
+        self.cool_ticks = cool_ticks
+        self.alpha = alpha
+        self.min_shared_cores = min_shared_cores
+        self.max_isolated_fraction = max_isolated_fraction
+        self.idle_pool_cores = idle_pool_cores
+        self.max_moves = max_moves
+        self.rebalance_every = rebalance_every
+        self.loads: Dict[str, _Load] = {}
+        self.isolated: Dict[str, List[Core]] = {}  # current exclusive cores per container
+        self.current: Dict[str, Dict] = {}  # assignment last applied per container
+        self.ticks = 0
+
+    def observe(self, cgroup_path: str, sample: Dict) -> float:
+        """Feed a monitor sample; returns the container's smoothed load in cores."""
+        load = self.loads.get(cgroup_path)
+        if load is None:
+            load = self.loads[cgroup_path] = _Load()
+        usage = (sample.get('cpu_stat') or {}).get('usage_usec')
+        now = sample.get('timestamp')
+        if usage is not None and now is not None:
+            if load.last and now > load.last[1] and usage >= load.last[0]:
+                rate = (usage - load.last[0]) / (now - load.last[1]) / 1e6
+                load.cores = rate if load.rates == 0 else self.alpha * rate + (1 - self.alpha) * load.cores
+                load.rates += 1
+                hot = load.cores > self.hot_cores
+                load.hot_streak = load.hot_streak + 1 if hot else 0
+                load.cold_streak = 0 if hot else load.cold_streak + 1
+                if hot and load.hot_streak >= self.hot_ticks:
+                    load.hot = True
+                elif not hot and load.cold_streak >= self.cool_ticks:
+                    load.hot = False
+            load.last = (usage, now)
+        return load.cores
+
+    def plan(self) -> Dict[str, Dict]:
+        """Assignment per observed container: {"cpus", "mems", "class"} (isolated, shared or idle)."""
+        topo = self.topology
+        total = len(topo.cores)
+        budget = min(int(total * self.max_isolated_fraction), total - self.min_shared_cores)
+        free = {n: list(cores) for n, cores in topo.nodes.items()}
+        isolated: Dict[str, List[Core]] = {}
+        moves = 0
+
+        hot = sorted((p for p, l in self.loads.items() if l.hot), key=lambda p: -self.loads[p].cores)
+        threads = len(topo.cores[0])
+        need = {p: max(1, math.ceil(self.loads[p].cores * self.headroom / threads)) for p in hot}
+
+        def take(path, cores):
+            nonlocal budget
+            for c in cores:
+                free[topo.node_of[c]].remove(c)
+            budget -= len(cores)
+            isolated[path] = cores
+
+        def still_free(cores):
+            return cores and len(cores) <= budget and all(c in free[topo.node_of[c]] for c in cores)
+
+        # Sticky first: containers keep their cores while those still cover the load without gross waste
+        for path in hot:
+            previous = self.isolated.get(path)
+            if still_free(previous) and need[path] <= len(previous) <= need[path] + 1:
+                take(path, previous)
+        for path in hot:
+            if path in isolated:
+                continue
+            previous = self.isolated.get(path)
+            if moves >= self.max_moves:
+                if still_free(previous):
+                    take(path, previous)  # out of moves this round: stay put
+                continue
+            node = max(free, key=lambda n: (len(free[n]), -n))
+            if need[path] > min(budget, len(free[node])):
+                continue  # does not fit on one node within the isolation budget: stays shared
+            take(path, free[node][:need[path]])
+            moves += 1
+        self.isolated = isolated
+
+        shared = [c for n in sorted(free) for c in free[n]]
+        shared_nodes = sorted(n for n in free if free[n])
+        # Idle pool on the node hosting the fewest isolated containers (least interference)
+        busy = {n: 0 for n in free}
+        for cores in isolated.values():
+            busy[topo.node_of[cores[0]]] += 1
+        idle_node = min(shared_nodes, key=lambda n: (busy[n], -len(free[n]), n)) if shared_nodes else None
+        idle_pool = free[idle_node][:self.idle_pool_cores] if idle_node is not None else shared
+
+        plan = {}
+        for path, load in self.loads.items():
+            if path in isolated:
+                cores = isolated[path]
+                plan[path] = {"cpus": format_cpulist(c for core in cores for c in core),
+                              "mems": str(topo.node_of[cores[0]]), "class": "isolated"}
+            elif load.rates and load.cores < self.idle_cores and not load.hot:
+                plan[path] = {"cpus": format_cpulist(c for core in idle_pool for c in core),
+                              "mems": str(idle_node), "class": "idle"}
+            else:
+                plan[path] = {"cpus": format_cpulist(c for core in shared for c in core),
+                              "mems": format_cpulist(shared_nodes), "class": "shared"}
+        return plan
+
+    def rebalance(self, controller, events=None) -> Optional[Dict[str, Dict]]:
+        """Every `rebalance_every` calls: plan and write the cpusets that changed. Returns the changes."""
+        self.ticks += 1
+        if (self.ticks - 1) % self.rebalance_every:
+            return None
+        changes = {}
+        for path, a in self.plan().items():
+            previous = self.current.get(path)
+            if previous and previous["cpus"] == a["cpus"] and previous["mems"] == a["mems"]:
+                continue
+            if controller.set_cpuset(path, a["cpus"], a["mems"]):
+                self.current[path] = a
+                changes[path] = a
+                if events:
+                    events.emit(PLACEMENT, f"{path} -> cpus {a['cpus']} mems {a['mems']} ({a['class']})",
+                                source="Placement", container=path, load=round(self.loads[path].cores, 3), **a)
+        return changes
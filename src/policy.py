@@ -0,0 +1,242 @@
+"""Declarative, hot-reloadable CPU governance policies evaluated over the whole fleet at once.
+
+A policy file (JSON) holds ordered rules; every container takes the action of
+the first rule whose condition matches it:
+
+    {
+      "labels": {"system.slice/docker-*.scope": {"runtime": "docker"}},
+      "rules": [
+        {"name": "quarantine-risky-hot", "action": "quarantine", "params": {"quota": 10000},
+         "when": {"all": [{"metric": "security_score", "op": "<", "value": 50},
+                          {"metric": "pred_cpu", "op": ">", "value": 500000}]}},
+        {"name": "predictive-scaling", "action": "scale", "params": {"threshold": 2000000, "headroom": 1.2}}
+      ]
+    }
+
+Conditions are `all`/`any`/`not` trees over leaves
+`{"metric"|"label": name, "op": op, "value": v}`. Labels are assigned per cgroup
+path glob (later patterns win) and the pseudo-metric `path` is the cgroup path.
+Ordering ops (`<`, `<=`, `>`, `>=`) never match a container the label does not
+cover, or whose label value cannot be compared with `value`.
+
+Rules are compiled once into numpy predicates over per-tick metric arrays (one
+element per container). Identical leaves are evaluated once per tick no matter
+how many rules use them, leaves over paths and labels are cached until the
+fleet changes, and rule matching stops as soon as every container has an
+action. The file is re-read when its mtime or size changes; an invalid edit is
+logged and the previous rules stay in force, and so does a reload whose rules
+fail while being evaluated.
+"""
+import fnmatch
+import json
+import logging
+import operator
+import os
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Per-container metrics the agent provides each tick
+METRICS = ("cpu_usage", "pred_cpu", "memory_bytes", "io_bytes", "net_rx_bytes", "security_score", "risks",
+           "quarantined")
+# Actions understood by the agent (see `run_iteration`)
+ACTIONS = ("quarantine", "release", "hold", "scale", "cpu_max", "none")
+
+
+def _glob(column, pattern):
+    return np.fromiter((fnmatch.fnmatchcase(str(v), pattern) for v in column), bool, len(column))
+
+
+OPS: Dict[str, Callable] = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge, "==": operator.eq,
+    "!=": operator.ne,
+    "in": lambda column, values: np.isin(column, list(values)),
+    "glob": _glob,
+}
+ORDERING = ("<", "<=", ">", ">=")
+
+
+def _compare_present(op: Callable, column: np.ndarray, value) -> np.ndarray:
+    """Elementwise `op(v, value)` over an object column: False where v is None or not comparable."""
+    out = np.zeros(len(column), bool)
+    for i, v in enumerate(column):
+        if v is not None:
+            try:
+                out[i] = bool(op(v, value))
+            except TypeError:
+                pass
+    return out
+
+
+class Rule:
+    """One compiled rule: a predicate over the fleet's columns and the action it selects."""
+
+    def __init__(self, name: str, action: str, params: Dict, predicate: Callable):
+        self.name = name
+        self.action = action
+        self.params = params
+        self.predicate = predicate
+
+    def __repr__(self):
+        return f"Rule({self.name!r}, {self.action!r})"
+
+
+class PolicyEngine:
+    """Rules from a JSON policy file, recompiled whenever the file changes."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rules: List[Rule] = []
+        self.labels: List = []  # [(glob, {key: value})]
+        self.hits: Counter = Counter()  # rule name -> containers matched, over all ticks
+        self.reloads = 0
+        self._stamp = None
+        self._fleet: Optional[tuple] = None
+        self._static: Dict[str, np.ndarray] = {}  # leaves over path/labels, valid while the fleet is unchanged
+        self._fleet_columns: Dict[str, np.ndarray] = {}
+        self._good: Optional[tuple] = None  # (rules, labels) that last evaluated without error
+        self.load()
+
+    def load(self):
+        """Read and compile the policy file; raises OSError/ValueError on a missing or invalid file."""
+        st = os.stat(self.path)
+        with open(self.path) as f:
+            try:
+                spec = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{self.path}: {e}") from e
+        labels = list((spec.get("labels") or {}).items())
+        rules = [self._compile_rule(i, r) for i, r in enumerate(spec.get("rules") or [])]
+        self.rules, self.labels = rules, labels
+        self._stamp = (st.st_mtime_ns, st.st_size)
+        self._fleet = None
+        self._static = {}
+        self.reloads += 1
+        logging.info("Loaded %d policy rules from %s", len(rules), self.path)
+
+    def maybe_reload(self) -> bool:
+        """Reload if the file changed since the last load; keeps the current rules if the new ones are invalid."""
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        if (st.st_mtime_ns, st.st_size) == self._stamp:
+            return False
+        try:
+            self.load()
+            return True
+        except (OSError, ValueError) as e:
+            logging.error("Keeping previous policy, %s is invalid: %s", self.path, e)
+            self._stamp = (st.st_mtime_ns, st.st_size)  # do not retry until it is edited again
+            return False
+
+    def _compile_rule(self, index: int, spec: Dict) -> Rule:
+        name = spec.get("name") or f"rule-{index}"
+        action = spec.get("action")
+        if action not in ACTIONS:
+            raise ValueError(f"rule {name!r}: unknown action {action!r}; expected one of {list(ACTIONS)}")
+        return Rule(name, action, dict(spec.get("params") or {}), self._compile(spec.get("when"), name))
+
+    def _compile(self, cond: Optional[Dict], rule: str) -> Callable:
+        """Condition tree -> fn(columns, memo) returning a bool array."""
+        if not cond:
+            return lambda cols, memo: np.ones(len(cols["path"]), bool)
+        if "all" in cond or "any" in cond:
+            combine = np.logical_and if "all" in cond else np.logical_or
+            parts = [self._compile(c, rule) for c in cond.get("all", cond.get("any"))]
+            if not parts:
+                raise ValueError(f"rule {rule!r}: empty {list(cond)[0]!r}")
+            return lambda cols, memo: combine.reduce([p(cols, memo) for p in parts])
+        if "not" in cond:
+            inner = self._compile(cond["not"], rule)
+            return lambda cols, memo: ~inner(cols, memo)
+
+        if "label" in cond:
+            column = "label:" + cond["label"]
+        else:
+            column = cond.get("metric")
+            if column not in METRICS and column != "path":
+                raise ValueError(f"rule {rule!r}: unknown metric {column!r}; expected one of {list(METRICS)}")
+        op = OPS.get(cond.get("op"))
+        if op is None or "value" not in cond:
+            raise ValueError(f"rule {rule!r}: leaf needs an op ({', '.join(OPS)}) and a value: {cond}")
+        value = cond["value"]
+        key = json.dumps(cond, sort_keys=True)
+        static = column not in METRICS
+        if static and cond.get("op") in ORDERING:
+            # Labels are sparse and untyped: unlabelled containers simply do not match
+            compare = op
+            op = lambda data, v: _compare_present(compare, data, v)
+
+        def leaf(cols, memo):
+            cache = self._static if static else memo
+            result = cache.get(key)
+            if result is None:
+                data = cols.get(column)
+                if data is None:  # label no pattern assigns
+                    data = np.full(len(cols["path"]), None, dtype=object)
+                result = cache[key] = np.asarray(op(data, value), dtype=bool)
+            return result
+
+        return leaf
+
+    def _label_columns(self, paths: Sequence[str]) -> Dict[str, np.ndarray]:
+        keys = {k for _, labels in self.labels for k in labels}
+        columns = {f"label:{k}": np.full(len(paths), None, dtype=object) for k in keys}
+        for pattern, labels in self.labels:
+            match = _glob(paths, pattern)
+            for k, v in labels.items():
+                columns[f"label:{k}"][match] = v
+        return columns
+
+    def evaluate(self, paths: Sequence[str], metrics: Dict[str, Sequence]) -> List[Optional[Rule]]:
+        """First matching rule per container (None: no rule matched). `metrics` maps METRICS to per-path values.
+
+        If the rules raise while being evaluated, the last rules that evaluated cleanly are restored
+        (no rule matches if there are none, or if they fail on these metrics too).
+        """
+        self.maybe_reload()
+        try:
+            chosen = self._evaluate(paths, metrics)
+        except Exception as e:
+            good = self._good
+            logging.error("Policy %s failed to evaluate (%s); %s", self.path, e,
+                          "restoring the previous rules" if good else "no rule applies")
+            if not good or good == (self.rules, self.labels):
+                return [None] * len(paths)
+            self.rules, self.labels = good
+            self._fleet = None
+            self._static = {}
+            try:
+                chosen = self._evaluate(paths, metrics)
+            except Exception as e:
+                logging.error("Previous rules of %s failed to evaluate too (%s); no rule applies", self.path, e)
+                return [None] * len(paths)
+        self._good = (self.rules, self.labels)
+        return chosen
+
+    def _evaluate(self, paths: Sequence[str], metrics: Dict[str, Sequence]) -> List[Optional[Rule]]:
+        fleet = tuple(paths)
+        if fleet != self._fleet:
+            self._fleet = fleet
+            self._static = {}
+            self._fleet_columns = {"path": np.array(paths, dtype=object), **self._label_columns(paths)}
+        cols = dict(self._fleet_columns)
+        for name in METRICS:
+            values = metrics.get(name)
+            cols[name] = (np.full(len(paths), np.nan) if values is None else
+                          np.array([np.nan if v is None else v for v in values], dtype=float))
+
+        chosen = np.full(len(paths), -1)
+        unmatched = np.ones(len(paths), bool)
+        memo: Dict[str, np.ndarray] = {}
+        for i, rule in enumerate(self.rules):
+            hit = rule.predicate(cols, memo) & unmatched
+            if hit.any():
+                chosen[hit] = i
+                unmatched &= ~hit
+                self.hits[rule.name] += int(hit.sum())
+                if not unmatched.any():
+                    break
+        return [self.rules[i] if i >= 0 else None for i in chosen]
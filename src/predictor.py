@@ -1,4 +1,6 @@
-from typing import List
+import math
+from collections import deque
+from typing import Dict, List, Optional, Sequence
 
 class MovingAveragePredictor:
     """Tiny predictor used in the prototype.
@@ -21,3 +23,79 @@ class MovingAveragePredictor:
             return 0.0
         window = self.history[-self.window:]
         return sum(window) / len(window)
+
+
+class ResidualQuantiles:
+    """Forecast quantiles from a point predictor's recent one-step errors.
+
+    `observe(actual, forecast)` scores the previous forecast against what happened and
+    remembers the new one; `quantile(q)` is that forecast plus the empirical q-quantile
+    of the last `window` errors. Stable series get tight intervals, bursty ones wide
+    (and skewed) ones. None until `min_samples` errors have been seen.
+
+    Usage under a quota is censored at the quota, so `throttled` (what cpu.stat's
+    throttled_usec grew by over the interval) is added back to the usage. Otherwise
+    throttling would shrink the errors, the quota with them, and throttle more.
+    """
+    def __init__(self, window: int = 120, min_samples: int = 10):
+        self.errors = deque(maxlen=window)
+        self.min_samples = min_samples
+        self.forecast: Optional[float] = None
+
+    def observe(self, actual: float, forecast: float, throttled: float = 0.0):
+        if self.forecast is not None:
+            self.errors.append(actual + throttled - self.forecast)
+        self.forecast = forecast
+
+    def quantile(self, q: float) -> Optional[float]:
+        n = len(self.errors)
+        if self.forecast is None or n < self.min_samples:
+            return None
+        errors = sorted(self.errors)
+        return self.forecast + errors[min(n - 1, max(0, math.ceil(q * n) - 1))]
+
+    def quantiles(self, qs: Sequence[float] = (0.5, 0.9, 0.99)) -> Dict[float, Optional[float]]:
+        return {q: self.quantile(q) for q in qs}
+
+
+class QuantilePredictor:
+    """Point predictor plus quantiles of the CPU usage rate (`predict_quantile(q)`, usec/s).
+
+    `fit`/`predict` delegate to `base` unchanged. `observe(sample)` takes each monitor
+    sample, turns consecutive cpu.stat readings into a usage rate (as CpuAllocator and
+    ThrottleFeedback do), forecasts the next rate as the moving average of the last
+    `rate_window` and scores the previous forecast with ResidualQuantiles. The rate
+    `throttled_usec` grew by is added back so throttled intervals are not mistaken for
+    low demand.
+    """
+    def __init__(self, base=None, window: int = 120, min_samples: int = 10, rate_window: int = 5):
+        self.base = base if base is not None else MovingAveragePredictor()
+        self.residuals = ResidualQuantiles(window, min_samples)
+        self.rates = deque(maxlen=rate_window)
+        self._last: Optional[tuple] = None  # (usage_usec, throttled_usec, timestamp)
+
+    def fit(self, history: List[float]):
+        self.base.fit(history)
+
+    def predict(self, horizon: int = 1) -> float:
+        return self.base.predict(horizon)
+
+    def observe(self, sample: Dict) -> Optional[float]:
+        """Record a monitor sample; returns the usage rate (usec/s) since the previous one."""
+        stat = sample.get('cpu_stat') or {}
+        now = sample.get('timestamp')
+        if 'usage_usec' not in stat or now is None:
+            return None
+        current = (stat['usage_usec'], stat.get('throttled_usec', 0), now)
+        last, self._last = self._last, current
+        if last is None or now <= last[2] or current[0] < last[0] or current[1] < last[1]:
+            return None  # first sample, or counters reset (cgroup recreated)
+        elapsed = now - last[2]
+        rate = (current[0] - last[0]) / elapsed
+        self.rates.append(rate)
+        self.residuals.observe(rate, sum(self.rates) / len(self.rates), (current[1] - last[1]) / elapsed)
+        return rate
+
+    def predict_quantile(self, q: float) -> Optional[float]:
+        """q-quantile of the next interval's usage rate (usec/s); None until enough intervals were seen."""
+        return self.residuals.quantile(q)
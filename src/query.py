@@ -0,0 +1,148 @@
+"""Paginated container listing over the indexes kept on ingest.
+
+`ContainerIndex` keeps containers sorted by name and the set of quarantined
+ones; the metric orderings come from `FleetAggregates.indexes`. A query walks
+one index in the requested order starting just after the cursor, applies the
+filters to each entry and stops after `limit` matches (or `max_scan` entries),
+so a page costs O(log n + page) instead of serialising the whole fleet.
+Filters on the sort key itself (name prefix when sorting by name, `cpu_gt`
+when sorting by CPU) narrow the walk to a bisected range.
+"""
+import base64
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    from src.aggregates import _MAX_KEY, RANKED_METRICS, SortedIndex
+except ImportError:
+    from .aggregates import _MAX_KEY, RANKED_METRICS, SortedIndex
+
+SORT_KEYS = ("name",) + RANKED_METRICS
+MAX_LIMIT = 1000
+
+Key = Tuple[str, str]
+
+
+class ContainerIndex:
+    """Name-ordered index and quarantine set; caller holds the state lock."""
+
+    def __init__(self):
+        self.names = SortedIndex()
+        self.quarantined = set()
+
+    def __len__(self):
+        return len(self.names)
+
+    def update(self, node_id: str, container_id: str, sample: Dict):
+        key = (node_id, container_id)
+        if self.names.value(key) is None:
+            self.names.update(key, container_id)
+        if sample.get("quarantined"):
+            self.quarantined.add(key)
+        else:
+            self.quarantined.discard(key)
+
+    def remove(self, node_id: str, container_id: str):
+        key = (node_id, container_id)
+        self.names.remove(key)
+        self.quarantined.discard(key)
+
+
+def encode_cursor(sort: str, entry: Tuple) -> str:
+    value, (node_id, container_id) = entry
+    raw = json.dumps([sort, value, node_id, container_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> Tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, node_id, container_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"invalid cursor: {e}")
+    if cursor_sort != sort:
+        raise ValueError(f"cursor was issued for sort={cursor_sort!r}, not {sort!r}")
+    # The value is bisected against the index, so it must compare with the sort column's values
+    if sort.lstrip("-") == "name":
+        valid = isinstance(value, str)
+    else:
+        # metric indexes hold numbers only (a missing metric counts as 0), so a null value is forged
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+    if not valid or not isinstance(node_id, str) or not isinstance(container_id, str):
+        raise ValueError("invalid cursor: malformed position")
+    return value, (node_id, container_id)
+
+
+def _prefix_end(prefix: str) -> str:
+    """Smallest string greater than every string starting with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _project(node_id: str, stats: Dict, fields: Optional[Iterable[str]]) -> Dict:
+    if not fields:
+        return dict(stats, node_id=node_id)
+    item = {"id": stats.get("id"), "node_id": node_id}
+    for f in fields:
+        if f in stats:
+            item[f] = stats[f]
+    return item
+
+
+def query_containers(nodes: Dict, names: ContainerIndex, metric_indexes: Dict[str, SortedIndex],
+                     sort: str = "name", cursor: Optional[str] = None, limit: int = 100,
+                     node: Optional[str] = None, prefix: Optional[str] = None,
+                     quarantined: Optional[bool] = None, cpu_gt: Optional[float] = None,
+                     fields: Optional[List[str]] = None, max_scan: int = 10000) -> Dict:
+    """One page of containers; `sort` is a key from SORT_KEYS, prefixed with '-' for descending."""
+    descending = sort.startswith("-")
+    key_name = sort.lstrip("-")
+    if key_name not in SORT_KEYS:
+        raise ValueError(f"unknown sort {sort!r}; expected one of {SORT_KEYS} (optionally prefixed with '-')")
+    limit = max(1, min(int(limit), MAX_LIMIT))
+    index = names.names if key_name == "name" else metric_indexes[key_name]
+    cpu_index = metric_indexes["cpu_usage"]
+    after = decode_cursor(cursor, sort) if cursor else None
+
+    # Narrow the walk when the filter is on the sort key itself.
+    start = None
+    stop = None
+    if key_name == "name" and prefix:
+        start = (_prefix_end(prefix),) if descending else (prefix,)
+        stop = (lambda v: v < prefix) if descending else (lambda v: not v.startswith(prefix))
+    elif key_name == "cpu_usage" and cpu_gt is not None:
+        if descending:
+            stop = lambda v: v <= cpu_gt
+        else:
+            start = (cpu_gt, _MAX_KEY)
+
+    items = []
+    last = None
+    scanned = 0
+    exhausted = True
+    for entry in index.iter_from(after=after, descending=descending, start=start):
+        value, (node_id, container_id) = entry
+        if stop is not None and stop(value):
+            break
+        if len(items) == limit or scanned == max_scan:
+            exhausted = False
+            break
+        scanned += 1
+        last = entry
+        if node is not None and node_id != node:
+            continue
+        if prefix and not container_id.startswith(prefix):
+            continue
+        if quarantined is not None and ((node_id, container_id) in names.quarantined) != quarantined:
+            continue
+        if cpu_gt is not None and (cpu_index.value((node_id, container_id)) or 0.0) <= cpu_gt:
+            continue
+        stats = nodes.get(node_id, {}).get("containers", {}).get(container_id)
+        if stats is not None:
+            items.append(_project(node_id, stats, fields))
+
+    return {
+        "items": items,
+        "next_cursor": None if exhausted or last is None else encode_cursor(sort, last),
+        "scanned": scanned,
+        "total": len(names),
+    }
@@ -0,0 +1,216 @@
+"""Desired-state reconciliation of cgroup limits.
+
+Policies no longer write cgroup files directly. Each one gets a
+`StagedController` (same API as `CgroupController`) whose writes become claims
+in a shared `DesiredState`, keyed by (cgroup path, file, device). When several
+policies claim the same knob in one tick the highest-priority owner wins (e.g.
+governance over scaling). Once per tick `Reconciler.reconcile()`:
+
+- reads the current value of every claimed or previously applied knob in bulk;
+- reports drift where a file no longer holds what the reconciler last wrote
+  (someone else changed it) and, with `correct_drift`, restores it;
+- writes only the knobs whose normalized value differs, highest priority
+  first, limited by a token bucket (excess changes wait for the next pass);
+- rolls back a cgroup's already-applied writes of this pass when a later write
+  to the same cgroup fails, so a cgroup never ends up half-updated.
+"""
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from src.controller import CgroupController
+from src.events import DRIFT
+from src.monitor import CGROUP_ROOT
+
+Key = Tuple[str, str, Optional[str]]  # (cgroup path, interface file, device for io.max)
+
+IO_KEYS = ("rbps", "wbps", "riops", "wiops")
+
+
+def normalize(filename: str, value: Optional[str]):
+    """Comparable form of a limit, so e.g. `max` and `max 100000` in cpu.max are equal."""
+    if value is None:
+        return None
+    if filename == 'cpu.max':
+        parts = value.split()
+        return (parts[0], parts[1] if len(parts) > 1 else '100000') if parts else None
+    if filename == 'io.max':
+        limits = dict(p.split('=', 1) for p in value.split()[1:] if '=' in p)
+        return tuple(limits.get(k, 'max') for k in IO_KEYS)
+    return value.strip()
+
+
+def _io_line(content: str, device: str) -> str:
+    """The io.max line of one device; a device without a line is unlimited."""
+    for line in content.splitlines():
+        if line.split(' ', 1)[0] == device:
+            return line
+    return device + ''.join(f" {k}=max" for k in IO_KEYS)
+
+
+class DesiredState:
+    """Claims on cgroup knobs for the current tick, resolved by owner priority."""
+
+    def __init__(self, root: str = CGROUP_ROOT):
+        self.root = root
+        self.claims: Dict[Key, Tuple[int, str, str]] = {}  # key -> (priority, owner, value)
+
+    def key_for(self, target_path: str, value: str) -> Key:
+        cgroup_dir, filename = os.path.split(target_path)
+        cgroup_path = os.path.relpath(cgroup_dir, self.root)
+        device = value.split(' ', 1)[0] if filename == 'io.max' else None
+        return cgroup_path, filename, device
+
+    def claim(self, key: Key, value: str, owner: str, priority: int) -> bool:
+        current = self.claims.get(key)
+        if current is not None and current[0] > priority:
+            return False  # a higher-priority owner already decided this knob
+        self.claims[key] = (priority, owner, value)
+        return True
+
+    def owner(self, name: str, priority: int = 0) -> "StagedController":
+        return StagedController(self, name, priority)
+
+    def clear(self):
+        self.claims.clear()
+
+    def __len__(self):
+        return len(self.claims)
+
+
+class StagedController(CgroupController):
+    """CgroupController whose writes are claims in a DesiredState instead of file writes."""
+
+    def __init__(self, desired: DesiredState, owner: str, priority: int = 0):
+        super().__init__(dry_run=True, quiet=True, root=desired.root)
+        self.desired = desired
+        self.owner = owner
+        self.priority = priority
+
+    def _write_atomic(self, target_path: str, value: str) -> bool:
+        self.applied[target_path] = value
+        return self.desired.claim(self.desired.key_for(target_path, value), value, self.owner, self.priority)
+
+
+class Reconciler:
+    """Applies a DesiredState to the real cgroup files with diffing, rate limiting and rollback."""
+
+    def __init__(self, controller, monitor, events=None, writes_per_second: float = 200.0, burst: int = 200,
+                 correct_drift: bool = True, clock=time.monotonic):
+        self.controller = controller
+        self.monitor = monitor
+        self.events = events  # optional EventEmitter
+        self.writes_per_second = writes_per_second
+        self.burst = burst
+        self.correct_drift = correct_drift
+        self.clock = clock
+        self._tokens = float(burst)
+        self._refilled = clock()
+        self.expected: Dict[Key, str] = {}  # what each knob held after our last write
+        self.pending: Dict[Key, Tuple[int, str, str]] = {}  # changes deferred by the rate limit
+        self.totals = {"passes": 0, "applied": 0, "skipped": 0, "deferred": 0, "failed": 0, "rolled_back": 0,
+                       "drift": 0}
+
+    def observe(self, keys) -> Dict[Key, Optional[str]]:
+        """Current value of each knob, reading every file of every cgroup once."""
+        if self.controller.dry_run:
+            # Nothing is written in dry-run, so the files can only ever disagree with the plan
+            return dict.fromkeys(keys)
+        files: Dict[str, set] = {}
+        for path, filename, _ in keys:
+            files.setdefault(path, set()).add(filename)
+        contents = {path: self.monitor.read_files(path, sorted(names)) for path, names in files.items()}
+        observed = {}
+        for key in keys:
+            path, filename, device = key
+            content = contents[path][filename]
+            if content is not None and device is not None:
+                content = _io_line(content, device)
+            observed[key] = content
+        return observed
+
+    def _take_token(self) -> bool:
+        now = self.clock()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.writes_per_second)
+        self._refilled = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def reconcile(self, desired: DesiredState) -> Dict:
+        """One reconciliation pass; returns what was changed, deferred, failed and drifted."""
+        claims = dict(self.pending)
+        claims.update(desired.claims)
+        self.pending = {}
+        keys = set(claims) | set(self.expected)
+        observed = self.observe(keys)
+
+        drift = []
+        for key, expected in self.expected.items():
+            current = observed[key]
+            if current is not None and normalize(key[1], current) != normalize(key[1], expected):
+                drift.append({"container": key[0], "file": key[1], "device": key[2], "expected": expected.strip(),
+                              "observed": current.strip()})
+                if self.correct_drift:
+                    claims.setdefault(key, (0, "drift", expected))
+                else:
+                    self.expected[key] = current
+
+        changes: List[Tuple[int, Key, str]] = []
+        skipped = 0
+        for key, (priority, _, value) in claims.items():
+            # Unknown current value (file not readable, e.g. dry-run off-host): trust our own last write
+            current = observed[key] if observed[key] is not None else self.expected.get(key)
+            if normalize(key[1], current) == normalize(key[1], value):
+                skipped += 1
+                self.expected[key] = value
+            else:
+                changes.append((priority, key, value))
+
+        # Highest priority first; one cgroup's changes stay together for rollback
+        changes.sort(key=lambda c: (-c[0], c[1][0]))
+        by_cgroup: Dict[str, List[Tuple[int, Key, str]]] = {}
+        for change in changes:
+            by_cgroup.setdefault(change[1][0], []).append(change)
+
+        applied = deferred = rolled_back = 0
+        failed = []
+        for path, group in by_cgroup.items():
+            done: List[Key] = []
+            for priority, key, value in group:
+                if not self._take_token():
+                    self.pending[key] = claims[key]
+                    deferred += 1
+                    continue
+                if self.controller.write(path, key[1], value):
+                    done.append(key)
+                    self.expected[key] = value
+                    continue
+                failed.append({"container": path, "file": key[1], "device": key[2], "value": value})
+                for k in reversed(done):
+                    previous = observed[k]
+                    if previous is not None and self.controller.write(path, k[1], previous.strip()):
+                        self.expected[k] = previous
+                        rolled_back += 1
+                done = []
+                break
+            applied += len(done)
+
+        for d in drift:
+            logging.warning("Drift on %s %s: expected %r, found %r", d["container"], d["file"], d["expected"],
+                            d["observed"])
+            if self.events:
+                self.events.emit(DRIFT, f"{d['file']} of {d['container']} changed outside the agent", level="WARNING",
+                                 source="Reconciler", **d)
+
+        report = {"claims": len(claims), "applied": applied, "skipped": skipped, "deferred": deferred,
+                  "failed": failed, "rolled_back": rolled_back, "drift": drift}
+        totals = self.totals
+        totals["passes"] += 1
+        for k in ("applied", "skipped", "deferred", "rolled_back"):
+            totals[k] += report[k]
+        totals["failed"] += len(failed)
+        totals["drift"] += len(drift)
+        return report
@@ -0,0 +1,383 @@
+"""Discrete-event policy simulator on a virtual clock.
+
+Replays a workload against the agent's real decision code - a predictor
+(`MovingAveragePredictor`, `SimpleMLModel` or `LSTMPredictor`), the
+`GovernanceEngine` and the agent's `cpu_quota_for` scaling policy - with a
+`SimulatedController` standing in for cgroupfs. The controller keeps the
+values the agent writes in memory and enforces `cpu.max` on the simulated
+demand, accumulating `nr_throttled`/`throttled_usec` like the kernel's
+`cpu.stat`. Nothing sleeps: events run in timestamp order off a heap and the
+clock jumps straight to the next one, so an hour of simulated time for a
+handful of containers takes a fraction of a second.
+
+Usage:
+    python -m src.simulation --scenario diurnal --duration 86400 --containers 10 \\
+        --sweep headroom=1.1,1.2,1.5 threshold=0,200000 --out sweep.csv
+    python -m src.simulation --scenario bursty --sweep throttle_target=0.01,0.05,0.2
+"""
+import argparse
+import csv
+import heapq
+import itertools
+import logging
+import os
+import random
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.agent import cpu_quota_for
+from src.controller import CgroupController
+from src.governance import GovernanceEngine
+from src.loadgen import SHAPES, shape_cpu
+from src.predictor import MovingAveragePredictor, ResidualQuantiles
+from src.throttle import ThrottleFeedback
+
+
+# Rates are usec of CPU per second, so the simulated agent writes cpu.max with a 1s period
+# and a quota equal to the rate it wants to allow.
+PERIOD = 1000000
+
+
+def _web_server_demand(t: float, rng: random.Random, phase: float = 0.0) -> float:
+    # The original EvaluationSuite workload: 100-150k usec/s with a 200k spike every 10s
+    demand = 100000 + rng.random() * 50000
+    if int(t) % 10 == 0:
+        demand += 200000
+    return demand
+
+
+def _shape(shape: str) -> Callable[[float, random.Random, float], float]:
+    return lambda t, rng, phase=0.0: max(0.0, shape_cpu(shape, t, rng, phase))
+
+
+# scenario name -> demand(t, rng, phase) in usec of CPU per second
+WORKLOADS: Dict[str, Callable[[float, random.Random, float], float]] = {"Web Server Load": _web_server_demand}
+WORKLOADS.update({shape: _shape(shape) for shape in SHAPES})
+
+
+def _attack_security(t: float) -> Tuple[int, List[str]]:
+    # The "attack" workload turns malicious after 30s
+    return (40, ["Potential Threat"]) if t >= 30 else (95, [])
+
+
+SECURITY = {"attack": _attack_security}
+
+
+def make_predictor(name: str):
+    if name == "moving_average":
+        return MovingAveragePredictor(window=5)
+    if name == "ml":
+        from src.ml_model import SimpleMLModel
+        return SimpleMLModel()
+    if name == "lstm":
+        from src.lstm_model import LSTMPredictor
+        return LSTMPredictor()
+    raise ValueError(f"unknown predictor {name!r}; expected moving_average, ml or lstm")
+
+
+class Simulator:
+    """Event loop over a virtual clock: callbacks run in (time, priority) order."""
+
+    def __init__(self, start: float = 0.0):
+        self.now = start
+        self._queue: List[Tuple[float, int, int, Callable[[], None]]] = []
+        self._seq = itertools.count()
+        self.processed = 0
+
+    def time(self) -> float:
+        return self.now
+
+    def at(self, when: float, fn: Callable[[], None], priority: int = 0):
+        heapq.heappush(self._queue, (when, priority, next(self._seq), fn))
+
+    def every(self, interval: float, fn: Callable[[], None], start: Optional[float] = None, priority: int = 0):
+        def tick():
+            fn()
+            self.at(self.now + interval, tick, priority)
+        self.at(self.now if start is None else start, tick, priority)
+
+    def run(self, until: float):
+        """Run every event scheduled before `until`, then leave the clock there."""
+        queue = self._queue
+        while queue and queue[0][0] < until:
+            when, _, _, fn = heapq.heappop(queue)
+            self.now = when
+            fn()
+            self.processed += 1
+        self.now = until
+
+
+class SimulatedController(CgroupController):
+    """In-memory cgroupfs: remembers writes and enforces cpu.max on simulated demand."""
+
+    def __init__(self):
+        super().__init__(dry_run=True)
+        self.cpu_stat: Dict[str, Dict[str, int]] = {}
+        self._cpu_limits: Dict[str, Optional[float]] = {}  # cgroup dir -> usec/s, parsed once per write
+        self._dirs: Dict[str, str] = {}
+
+    def _write_atomic(self, target_path: str, value: str) -> bool:
+        self.applied[target_path] = value
+        if target_path.endswith('/cpu.max'):
+            quota, _, period = value.partition(' ')
+            limit = None if quota == 'max' else int(quota) * 1000000 / int(period or 100000)
+            self._cpu_limits[target_path[:-len('/cpu.max')]] = limit
+        return True
+
+    def cpu_limit(self, cgroup_path: str) -> Optional[float]:
+        """Current cpu.max as usec of CPU per second, or None when unlimited."""
+        cgroup_dir = self._dirs.get(cgroup_path)
+        if cgroup_dir is None:
+            cgroup_dir = self._dirs[cgroup_path] = os.path.join(self.root, cgroup_path)
+        return self._cpu_limits.get(cgroup_dir)
+
+    def consume(self, cgroup_path: str, demand: float, seconds: float = 1.0) -> Tuple[float, bool]:
+        """Run `demand` usec/s of work for `seconds`; returns (usage rate, throttled)."""
+        limit = self.cpu_limit(cgroup_path)
+        used = demand if limit is None else min(demand, limit)
+        stat = self.cpu_stat.setdefault(cgroup_path, {"usage_usec": 0, "nr_periods": 0, "nr_throttled": 0,
+                                                      "throttled_usec": 0})
+        periods = int(seconds * 10)  # 100ms periods
+        stat["usage_usec"] += int(used * seconds)
+        stat["nr_periods"] += periods
+        throttled = used < demand
+        if throttled:
+            stat["nr_throttled"] += periods
+            stat["throttled_usec"] += int((demand - used) * seconds)
+        return used, throttled
+
+
+class _Container:
+    def __init__(self, path: str, phase: float, predictor):
+        self.path = path
+        self.phase = phase
+        self.predictor = predictor
+        self.history: List[float] = []
+        self.last_usage = 0.0
+        self.unmet = 0.0
+        self.scan = (100, [])
+        self.quantiles: Optional[ResidualQuantiles] = None
+
+
+class PolicySimulation:
+    """One scenario run of a control policy against simulated containers.
+
+    mode: 'static' (fixed `static_limit`, no agent) or 'dynamic' (predictor + governance + cpu_quota_for).
+    The agent ticks every `interval` simulated seconds and rescans security every `scan_every` ticks.
+    With `throttle_target`, quotas are the forecast's (1 - target) quantile from the predictor's recent
+    errors instead of `headroom` times the forecast. With `feedback` (a gain class of src/throttle.py,
+    e.g. 'latency'), the headroom is steered by the throttling observed in cpu.stat instead.
+    """
+
+    def __init__(self, scenario: str, duration: int, mode: str = "dynamic", predictor: str = "moving_average",
+                 containers: int = 1, interval: float = 1.0, static_limit: int = 200000, headroom: float = 1.2,
+                 threshold: float = 0, throttle_target: Optional[float] = None,
+                 feedback: Optional[str] = None, scan_every: int = 10, refit_every: int = 300, history_len: int = 1000,
+                 seed: int = 0, progress: Optional[Callable[[float], None]] = None):
+        if scenario not in WORKLOADS:
+            raise ValueError(f"unknown scenario {scenario!r}; expected one of {sorted(WORKLOADS)}")
+        self.scenario = scenario
+        self.duration = int(duration)
+        self.mode = mode
+        self.predictor_name = predictor
+        self.interval = interval
+        self.static_limit = static_limit
+        self.headroom = headroom
+        self.threshold = threshold
+        self.throttle_target = throttle_target
+        self.feedback_class = feedback
+        self.scan_every = scan_every
+        self.refit_every = refit_every
+        self.history_len = history_len
+        self.progress = progress
+        self.rng = random.Random(seed)
+        self.demand = WORKLOADS[scenario]
+        self.security = SECURITY.get(scenario)
+        self.sim = Simulator()
+        self.controller = SimulatedController()
+        self.governance = GovernanceEngine(self.controller)
+        self.containers = [_Container(f"sim/c-{i:04d}", self.rng.random(),
+                                      make_predictor(predictor) if mode == "dynamic" else None)
+                           for i in range(containers)]
+        self.feedback = None
+        if mode == "dynamic" and feedback:
+            self.feedback = ThrottleFeedback(period=PERIOD)
+            for c in self.containers:
+                self.feedback.configure(c.path, feedback)
+        if mode == "dynamic" and throttle_target:
+            for c in self.containers:
+                c.quantiles = ResidualQuantiles()
+        self.ticks = 0
+        self.totals = {"allocated": 0.0, "used": 0.0, "throttled": 0, "severe": 0, "quarantined": 0}
+
+    # --- events ---------------------------------------------------------------
+
+    def _account(self):
+        """Workload runs for one simulated second under the limits currently in force."""
+        t = self.sim.now
+        totals = self.totals
+        for c in self.containers:
+            demand = self.demand(t, self.rng, c.phase)
+            limit = self.controller.cpu_limit(c.path)
+            used, throttled = self.controller.consume(c.path, demand)
+            c.last_usage = used
+            c.unmet = demand - used  # what cpu.stat throttled_usec grew by
+            # An unlimited cgroup reserves nothing beyond what it uses
+            totals["allocated"] += used if limit is None else limit
+            totals["used"] += used
+            if throttled:
+                totals["throttled"] += 1
+                if demand - used > 100000:
+                    totals["severe"] += 1
+            if c.path in self.governance.quarantined_containers:
+                totals["quarantined"] += 1
+
+    def _predict(self, c: _Container) -> float:
+        if isinstance(c.predictor, MovingAveragePredictor):
+            # Only the window is used; fitting the full history would copy it every tick
+            c.predictor.fit(c.history[-c.predictor.window:])
+            return c.predictor.predict()
+        if self.ticks % self.refit_every == 0:
+            c.predictor.fit(c.history)
+        return c.predictor.predict(c.history)
+
+    def _control(self):
+        """One agent iteration, as in `run_iteration`, fed with the usage the agent could observe."""
+        for c in self.containers:
+            c.history.append(c.last_usage)
+            if len(c.history) > self.history_len:
+                del c.history[0]
+            pred = self._predict(c)
+            upper = None
+            if c.quantiles:
+                c.quantiles.observe(c.last_usage, pred, c.unmet)
+                upper = c.quantiles.quantile(1 - self.throttle_target)
+            if self.security and self.ticks % self.scan_every == 0:
+                c.scan = self.security(self.sim.now)
+            score, risks = c.scan
+            if self.feedback:
+                # The agent's view of the second just accounted: cumulative cpu.stat at this instant
+                self.feedback.observe(c.path, {"cpu_stat": self.controller.cpu_stat.get(c.path),
+                                               "timestamp": self.sim.now})
+            if self.governance.evaluate(c.path, pred, score, risks):
+                continue
+            if self.feedback:
+                quota = self.feedback.quota(c.path, pred) if pred > self.threshold else None
+            else:
+                quota = cpu_quota_for(pred, self.threshold, self.headroom, upper)
+            self.controller.set_cpu_max(c.path, quota, period=PERIOD)
+        self.ticks += 1
+
+    # --- run ------------------------------------------------------------------
+
+    def run(self) -> Dict:
+        if self.mode == "static":
+            for c in self.containers:
+                self.controller.set_cpu_max(c.path, self.static_limit, period=PERIOD)
+        else:
+            # Control runs after the second it observed has been accounted
+            self.sim.every(self.interval, self._control, start=self.interval, priority=1)
+        self.sim.every(1.0, self._account)
+        if self.progress:
+            step = max(1.0, self.duration / 100.0)
+            self.sim.every(step, lambda: self.progress(min(1.0, self.sim.now / self.duration)), start=step,
+                           priority=2)
+        self.sim.run(self.duration)
+        if self.progress:
+            self.progress(1.0)
+        return self.report()
+
+    def report(self) -> Dict:
+        t = self.totals
+        efficiency = t["used"] / t["allocated"] * 100 if t["allocated"] > 0 else 0
+        stats = self.controller.cpu_stat.values()
+        return {
+            "Scenario": self.scenario,
+            "Mode": self.mode,
+            "Predictor": self.predictor_name if self.mode == "dynamic" else "",
+            "Duration": self.duration,
+            "Containers": len(self.containers),
+            "Headroom": self.headroom,
+            "Threshold": self.threshold,
+            "Throttle_Target": self.throttle_target,
+            "Feedback": self.feedback_class or "",
+            "Total_Allocated": int(t["allocated"]),
+            "Total_Used": int(t["used"]),
+            "Waste": int(t["allocated"] - t["used"]),
+            "Efficiency_Percent": round(efficiency, 2),
+            "Throttled_Events": t["throttled"],
+            # Seconds where demand exceeded the limit by more than 0.1 CPU (the old "OOM" proxy)
+            "OOM_Kills": t["severe"],
+            "Throttled_Usec": sum(s["throttled_usec"] for s in stats),
+            "Quarantined_Seconds": t["quarantined"],
+            "Sim_Events": self.sim.processed,
+        }
+
+
+def sweep(scenario: str, duration: int, grid: Dict[str, Iterable], **params) -> List[Dict]:
+    """Run one dynamic simulation per combination of the `grid` values (e.g. headroom, threshold)."""
+    keys = list(grid)
+    reports = []
+    for values in itertools.product(*(list(grid[k]) for k in keys)):
+        run_params = dict(params, **dict(zip(keys, values)))
+        reports.append(PolicySimulation(scenario, duration, **run_params).run())
+    return reports
+
+
+def write_csv(reports: List[Dict], filename: str):
+    with open(filename, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(reports[0].keys()))
+        writer.writeheader()
+        writer.writerows(reports)
+
+
+def _parse_grid(items: List[str]) -> Dict[str, List[float]]:
+    grid = {}
+    for item in items:
+        key, _, values = item.partition('=')
+        grid[key] = [float(v) for v in values.split(',') if v]
+    return grid
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description='Discrete-event simulation of the agent control policy')
+    p.add_argument('--scenario', default='Web Server Load', choices=sorted(WORKLOADS))
+    p.add_argument('--duration', type=int, default=3600, help='Simulated seconds')
+    p.add_argument('--mode', default='dynamic', choices=['static', 'dynamic'])
+    p.add_argument('--predictor', default='moving_average', choices=['moving_average', 'ml', 'lstm'])
+    p.add_argument('--containers', type=int, default=1)
+    p.add_argument('--interval', type=float, default=1.0, help='Agent interval in simulated seconds')
+    p.add_argument('--headroom', type=float, default=1.2)
+    p.add_argument('--threshold', type=float, default=0)
+    p.add_argument('--throttle-target', type=float, default=None,
+                   help='Size quotas for this throttling probability from forecast quantiles instead of --headroom')
+    p.add_argument('--feedback', choices=['latency', 'standard', 'batch'], default=None,
+                   help='Steer headroom from observed throttling with this gain class (src/throttle.py)')
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--sweep', nargs='*', default=[], metavar='PARAM=V1,V2',
+                   help='Grid of simulation parameters to sweep, e.g. headroom=1.1,1.2 threshold=0,200000')
+    p.add_argument('--out', default=None, help='Write the reports to this CSV file')
+    return p.parse_args(argv)
+
+
+def run_from_cli(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='[%(levelname)s] %(message)s')
+    params = dict(mode=args.mode, predictor=args.predictor, containers=args.containers, interval=args.interval,
+                  headroom=args.headroom, threshold=args.threshold, throttle_target=args.throttle_target,
+                  feedback=args.feedback, seed=args.seed)
+    grid = _parse_grid(args.sweep)
+    if grid:
+        for key in grid:
+            params.pop(key, None)
+        reports = sweep(args.scenario, args.duration, grid, **params)
+    else:
+        reports = [PolicySimulation(args.scenario, args.duration, **params).run()]
+    for r in reports:
+        print(r)
+    if args.out:
+        write_csv(reports, args.out)
+    return reports
+
+
+if __name__ == '__main__':
+    run_from_cli()
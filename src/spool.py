@@ -0,0 +1,263 @@
+"""Durable on-disk spool for agent telemetry.
+
+`report_stats` posts one sample at a time and drops it when the dashboard is
+unreachable. With a spool every sample is appended to local segment files
+first (`seg-<n>.jsonl`, append-only, rotated at `segment_bytes`) and a
+background thread ships the backlog oldest-first in large gzip-compressed
+batches to `/api/ingest_batch`, where samples are recorded at their original
+timestamps. A small cursor file remembers how far the dashboard has
+acknowledged, so nothing is lost or resent across agent restarts; each record
+also carries the spooling process's boot id and a sequence number so a batch
+retried after a lost response is not stored twice.
+
+The spool is bounded: past `max_bytes` whole segments are dropped oldest first
+(counted in `dropped`). Catch-up after an outage is rate-limited to
+`max_rate` samples per second so a reconnecting fleet does not flatten ingest.
+`depth` (samples not yet acknowledged) is logged and sent with every batch;
+the dashboard shows it per node as `spool_depth`.
+"""
+import glob
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+MIB = 1024 * 1024
+
+
+class Spool:
+    """Bounded FIFO of JSON records in segmented append-only files; thread-safe."""
+
+    def __init__(self, directory: str, segment_bytes: int = 4 * MIB, max_bytes: int = 256 * MIB, fsync: bool = False):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync = fsync
+        self.dropped = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        # Oldest first: [number, path, records, bytes]
+        self._segments: List[list] = []
+        last_seq = 0
+        for path in sorted(glob.glob(os.path.join(directory, "seg-*.jsonl"))):
+            records, size, seq = self._scan(path)
+            self._segments.append([int(os.path.basename(path)[4:-6]), path, records, size])
+            last_seq = max(last_seq, seq)
+        self._cursor_path = os.path.join(directory, "cursor.json")
+        self._offset = self._consumed = 0  # read position inside the head segment
+        cursor = self._load_cursor()
+        if cursor and self._segments and cursor.get("segment") == self._segments[0][0]:
+            self._offset, self._consumed = cursor["offset"], cursor["records"]
+        # The dashboard dedupes on (boot, seq): a new boot id per process keeps fresh records apart
+        # from anything seen before a restart, even if the directory was wiped or the clock stepped
+        self.boot_id = uuid.uuid4().hex
+        self._seq = last_seq
+        if not self._segments:
+            self._new_segment(0)
+        self._file = open(self._segments[-1][1], "ab")
+
+    @staticmethod
+    def _scan(path: str) -> Tuple[int, int, int]:
+        """(complete records, bytes, last seq) of a segment; a torn last line is not counted."""
+        records = seq = 0
+        with open(path, "rb") as f:
+            data = f.read()
+        for line in data.splitlines():
+            try:
+                seq = json.loads(line)["seq"]
+                records += 1
+            except (ValueError, KeyError, TypeError):
+                continue
+        return records, len(data), seq
+
+    def _load_cursor(self) -> Optional[Dict]:
+        try:
+            with open(self._cursor_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_cursor(self):
+        tmp = self._cursor_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump({"segment": self._segments[0][0], "offset": self._offset, "records": self._consumed}, f)
+        os.replace(tmp, self._cursor_path)
+
+    def _new_segment(self, number: int):
+        path = os.path.join(self.directory, f"seg-{number:012d}.jsonl")
+        self._segments.append([number, path, 0, 0])
+
+    @property
+    def depth(self) -> int:
+        """Records spooled but not yet acknowledged."""
+        with self._lock:
+            return sum(s[2] for s in self._segments) - self._consumed
+
+    @property
+    def size(self) -> int:
+        with self._lock:
+            return sum(s[3] for s in self._segments)
+
+    def append(self, record: Dict) -> int:
+        """Spool one record (`boot` and `seq` are added); returns its seq."""
+        with self._lock:
+            self._seq += 1
+            line = json.dumps(dict(record, boot=self.boot_id, seq=self._seq), separators=(",", ":")).encode() + b"\n"
+            active = self._segments[-1]
+            if active[3] and active[3] + len(line) > self.segment_bytes:
+                self._file.close()
+                self._new_segment(active[0] + 1)
+                active = self._segments[-1]
+                self._file = open(active[1], "ab")
+            self._file.write(line)
+            active[2] += 1
+            active[3] += len(line)
+            self._enforce_cap()
+            return self._seq
+
+    def _enforce_cap(self):
+        # Caller holds the lock. The active segment is never dropped.
+        while len(self._segments) > 1 and sum(s[3] for s in self._segments) > self.max_bytes:
+            number, path, records, _ = self._segments.pop(0)
+            self.dropped += records - self._consumed
+            logging.warning("Telemetry spool over %d bytes: dropped %d samples (%s)", self.max_bytes,
+                            records - self._consumed, os.path.basename(path))
+            self._offset = self._consumed = 0
+            os.remove(path)
+            self._save_cursor()
+
+    def sync(self):
+        """Push appended records to the OS (and disk, with `fsync`)."""
+        with self._lock:
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def read(self, max_records: int) -> Tuple[List[Dict], Optional[Tuple]]:
+        """Up to `max_records` of the oldest unacknowledged records (from one segment) and a cursor for `commit`."""
+        with self._lock:
+            self._file.flush()
+            if self._consumed >= self._segments[0][2] and len(self._segments) > 1:
+                # fully shipped before the writer rotated past it
+                os.remove(self._segments.pop(0)[1])
+                self._offset = self._consumed = 0
+                self._save_cursor()
+            number, path, records, _ = self._segments[0]
+            if self._consumed >= records:
+                return [], None
+            out = []
+            with open(path, "rb") as f:
+                f.seek(self._offset)
+                offset = self._offset
+                for line in f:
+                    if len(out) >= max_records:
+                        break
+                    offset += len(line)
+                    try:
+                        out.append(json.loads(line))
+                    except ValueError:
+                        continue  # torn write from a crash
+            return out, (number, offset, len(out))
+
+    def commit(self, cursor: Tuple):
+        """Acknowledge records returned by `read`; fully shipped segments are deleted."""
+        number, offset, count = cursor
+        with self._lock:
+            if not self._segments or self._segments[0][0] != number:
+                return  # the segment was dropped by the size cap meanwhile
+            self._offset = offset
+            self._consumed += count
+            head = self._segments[0]
+            if self._consumed >= head[2] and len(self._segments) > 1:
+                self._segments.pop(0)
+                os.remove(head[1])
+                self._offset = self._consumed = 0
+            self._save_cursor()
+
+    def close(self):
+        self.sync()
+        with self._lock:
+            self._file.close()
+
+
+class SpoolingReporter:
+    """Drop-in `reporter` for `run_iteration` that spools samples and ships them in the background."""
+
+    def __init__(self, url: str, spool: Spool, node_id: str = "local", batch_size: int = 2000,
+                 max_rate: float = 5000.0, flush_interval: float = 1.0, timeout: float = 5.0, session=None):
+        self.url = url
+        self.spool = spool
+        self.node_id = node_id
+        self.batch_size = batch_size
+        self.max_rate = max_rate  # samples/s during catch-up
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.session = session
+        self.sent = 0
+        self._next_send = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __call__(self, container_id, cpu, mem, prediction, node_id="local", quarantined=False):
+        self.spool.append({"node_id": node_id, "id": container_id, "cpu_usage": cpu, "memory_bytes": mem,
+                           "prediction": prediction, "quarantined": quarantined, "ts": time.time()})
+
+    @property
+    def depth(self) -> int:
+        return self.spool.depth
+
+    def _post(self, samples: List[Dict]):
+        if self.session is None:
+            import requests
+            self.session = requests.Session()
+        body = gzip.compress(json.dumps({"node_id": self.node_id, "spool_depth": self.spool.depth,
+                                         "samples": samples}, separators=(",", ":")).encode(), 6)
+        r = self.session.post(self.url, data=body, timeout=self.timeout,
+                              headers={"Content-Type": "application/json", "Content-Encoding": "gzip"})
+        r.raise_for_status()
+
+    def flush(self) -> int:
+        """Ship the backlog until it is empty, the dashboard fails or `close()` is called; returns samples sent."""
+        delivered = 0
+        while not self._stop.is_set():
+            samples, cursor = self.spool.read(self.batch_size)
+            if not samples:
+                return delivered
+            # Pace batches to max_rate so a long backlog drains at a rate ingest can absorb
+            wait = self._next_send - time.monotonic()
+            if wait > 0 and self._stop.wait(wait):
+                break
+            try:
+                self._post(samples)
+            except Exception as e:
+                logging.debug("Telemetry batch not delivered (%d spooled): %s", self.spool.depth, e)
+                return delivered
+            self.spool.commit(cursor)
+            self._next_send = time.monotonic() + len(samples) / self.max_rate
+            delivered += len(samples)
+            self.sent += len(samples)
+        return delivered
+
+    def _loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.spool.sync()
+            self.flush()
+            depth = self.spool.depth
+            if depth > self.batch_size:
+                logging.info("Telemetry spool depth: %d samples (%d dropped)", depth, self.spool.dropped)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Stop shipping; whatever is still spooled is sent by the next agent run."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.timeout + 1)
+        self.spool.close()
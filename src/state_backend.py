@@ -0,0 +1,706 @@
+"""State backends for the dashboard.
+
+`DashboardState` owns everything the dashboard keeps (node/container stats,
+security scores, the event log, time-series history, lifecycle and jobs).
+Exactly one process owns it:
+
+- `LocalStateBackend` (default): the single uvicorn worker owns the state.
+- `SharedStateBackend`: for `uvicorn --workers N`. The first worker to take a
+  lock file becomes the single writer; it serves the state to the other
+  workers over a local `multiprocessing.managers` socket and publishes
+  pre-encoded read snapshots (stats, events, security scores) into a
+  seqlock-protected shared-memory segment. Every worker answers the hot read
+  endpoints from that segment, so all clients see the same snapshot, and
+  forwards writes to the owner in batches from a background sender thread.
+  Readers watch the owner; when it goes away (crash, restart) they re-run the
+  election, so one of them takes over with a fresh state and the others
+  reconnect to it instead of serving its last snapshot forever.
+
+Select with DASHBOARD_STATE_BACKEND=local|shared (DASHBOARD_STATE_ADDR sets
+the socket path for the shared backend).
+
+Every snapshot section carries its own version, bumped only when that section
+changes. Both backends serve a section's JSON body encoded once per version,
+and `read_snapshot` pairs it with an ETag built from that version and the
+owner's epoch, so the dashboard can answer unchanged polls with 304.
+"""
+import json
+import logging
+import os
+import queue
+import struct
+import threading
+import time
+from multiprocessing.managers import BaseManager
+from typing import Callable, Dict, List, Optional, Tuple
+
+try:
+    from src.aggregates import FleetAggregates
+    from src.events import EventLog
+    from src.jobs import JobManager
+    from src.lifecycle import StateLifecycle
+    from src.query import ContainerIndex, query_containers
+    from src.timeseries import TimeSeriesStore
+except ImportError:
+    from .aggregates import FleetAggregates
+    from .events import EventLog
+    from .jobs import JobManager
+    from .lifecycle import StateLifecycle
+    from .query import ContainerIndex, query_containers
+    from .timeseries import TimeSeriesStore
+
+SECTIONS = ("nodes", "security_scores", "events")
+# Agent boots per node whose spool seqs are remembered (a retried batch can still hold an older boot's backlog)
+SPOOL_BOOTS = 8
+# Raised by a manager proxy whose owner process is gone
+_OWNER_GONE = (EOFError, ConnectionError, FileNotFoundError)
+
+
+def _dumps(obj) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), default=str).encode()
+
+
+def _etag(epoch: int, version: int) -> str:
+    # Weak: the same version is served both plain and gzip-encoded
+    return f'W/"{epoch:x}-{version}"'
+
+
+class DashboardState:
+    """All mutable dashboard state, guarded by one lock."""
+
+    def __init__(self, store=None, stale_after: float = 30.0, evict_after: float = 300.0,
+                 node_down_after: float = 60.0, max_containers: int = 10000, event_log_size: int = 50,
+                 event_capacity: int = 10000, sweep_interval: float = 5.0, job_workers: int = 4):
+        self.lock = threading.RLock()
+        self.state = {"nodes": {}, "security_scores": {}}
+        self.events = EventLog(capacity=event_capacity)
+        self.event_log_size = event_log_size  # newest events in the "events" snapshot section
+        self.series = TimeSeriesStore()
+        self.aggregates = FleetAggregates()
+        self.index = ContainerIndex()
+        self.store = store
+        self.lifecycle = StateLifecycle(self.state, stale_after=stale_after, evict_after=evict_after,
+                                        node_down_after=node_down_after, max_containers=max_containers,
+                                        on_evict=self._on_evict)
+        self.jobs = JobManager(max_workers=job_workers)
+        self.sweep_interval = sweep_interval
+        self.version = 0  # bumped on every change visible in a snapshot section
+        self.section_versions = dict.fromkeys(SECTIONS, 0)  # per section, for ETags
+        self.epoch = int(time.time() * 1000)  # tells versions of a restarted dashboard apart
+        self._encoded: Dict[str, Tuple[int, bytes]] = {}  # section -> (version, JSON body)
+        self._spool_seq: Dict[str, Dict[Optional[str], int]] = {}  # node_id -> {agent boot: last seq ingested}
+        self._sample_ts: Dict[Tuple[str, str], float] = {}  # (node_id, container_id) -> time of its current sample
+        self._stop = threading.Event()
+        self._sweeper = None
+
+    def _on_evict(self, node_id: str, container_id: str):
+        self._sample_ts.pop((node_id, container_id), None)
+        self.series.remove(node_id, container_id)
+        self.aggregates.remove(node_id, container_id)
+        self.index.remove(node_id, container_id)
+
+    # --- writes ---------------------------------------------------------------
+
+    def _changed(self, *sections: str):
+        # Caller holds self.lock
+        self.version += 1
+        for name in sections:
+            self.section_versions[name] += 1
+
+    def ingest(self, node_id: str, samples: List[Dict], now: Optional[float] = None,
+               received: Optional[float] = None):
+        """Store the latest sample per container and append it to its history.
+
+        `now` is when the samples were taken (their history timestamp), `received` (default: `now`)
+        when they arrived, which is what keeps the containers and the node alive. A sample older
+        than a container's current one only goes to the history.
+        """
+        now = time.time() if now is None else now
+        received = now if received is None else received
+        with self.lock:
+            scores_evicted = self.lifecycle.counters["security_scores_evicted"]
+            node = self.state["nodes"].get(node_id)
+            if node is None:
+                node = self.state["nodes"][node_id] = {"containers": {}, "last_seen": 0}
+            for stats in samples:
+                container_id = stats.get("id")
+                if not container_id:
+                    continue
+                key = (node_id, container_id)
+                if self._sample_ts.get(key, now) <= now:
+                    self._sample_ts[key] = now
+                    node["containers"][container_id] = stats
+                    self.aggregates.update(node_id, container_id, stats)
+                    self.index.update(node_id, container_id, stats)
+                self.lifecycle.touch(node_id, container_id, received)
+                self.series.record(node_id, container_id, stats, ts=now)
+                if self.store is not None:
+                    self.store.append(node_id, container_id, stats, ts=now)
+            node["last_seen"] = max(node["last_seen"], received)
+            if self.lifecycle.counters["security_scores_evicted"] != scores_evicted:
+                self._changed("nodes", "security_scores")  # the container cap evicted someone's last entry
+            else:
+                self._changed("nodes")
+
+    def ingest_many(self, batches: List[Tuple[str, List[Dict], Optional[float]]]):
+        for node_id, samples, now in batches:
+            self.ingest(node_id, samples, now)
+
+    def ingest_spooled(self, node_id: str, samples: List[Dict], spool_depth: Optional[int] = None) -> int:
+        """Backfill samples replayed from an agent's spool at their original `ts`; returns how many were new.
+
+        Samples carry the spooling agent's `boot` id and `seq`; ones at or below the last seq seen
+        from that boot of the node (a batch retried after a lost response) are skipped. History is
+        recorded at `ts`, liveness at the time the batch arrived, so a backlog is not swept away as
+        stale on arrival.
+        """
+        received = time.time()
+        with self.lock:
+            boots = self._spool_seq.setdefault(node_id, {})
+            runs: List[Tuple[str, List[Dict], Optional[float]]] = []
+            for s in samples:
+                boot, seq = s.get("boot"), s.get("seq", 0)
+                last = boots.get(boot, 0)
+                if seq and seq <= last:
+                    continue
+                if boot not in boots and len(boots) >= SPOOL_BOOTS:
+                    del boots[next(iter(boots))]  # forget the oldest boot's backlog
+                boots[boot] = max(last, seq)
+                ts = s.get("ts")
+                stats = {k: v for k, v in s.items() if k not in ("boot", "seq", "ts")}
+                sample_node = s.get("node_id") or node_id
+                if runs and runs[-1][0] == sample_node and runs[-1][2] == ts:
+                    runs[-1][1].append(stats)
+                else:
+                    runs.append((sample_node, [stats], ts))
+            for sample_node, stats, ts in runs:
+                self.ingest(sample_node, stats, ts, received)
+            if spool_depth is not None and node_id in self.state["nodes"]:
+                self.state["nodes"][node_id]["spool_depth"] = spool_depth
+                self._changed("nodes")
+            return sum(len(r[1]) for r in runs)
+
+    def log_event(self, source: str, message: str, level: str = "INFO", event_type: str = "log",
+                  node_id: Optional[str] = None, **data):
+        event = {"source": source, "message": message, "level": level, "type": event_type}
+        if node_id is not None:
+            event["node_id"] = node_id
+        if data:
+            event["data"] = data
+        with self.lock:
+            self.events.append(event)
+            self._changed("events")
+
+    def log_events(self, events: List[Tuple[str, str, str]]):
+        with self.lock:
+            for source, message, level in events:
+                self.events.append({"source": source, "message": message, "level": level, "type": "log"})
+            self._changed("events")
+
+    def append_events(self, node_id: str, events: List[Dict]) -> int:
+        """Store a batch of typed events from an agent; returns how many were new."""
+        with self.lock:
+            stored = self.events.extend(dict(e, node_id=e.get("node_id") or node_id) for e in events)
+            if stored:
+                self._changed("events")
+            return stored
+
+    def append_events_many(self, batches: List[Tuple[str, List[Dict]]]) -> int:
+        return sum(self.append_events(node_id, events) for node_id, events in batches)
+
+    def set_security_score(self, container_id: str, result: Dict):
+        with self.lock:
+            self.state["security_scores"][container_id] = result
+            self._changed("security_scores")
+
+    # --- reads ----------------------------------------------------------------
+
+    def has_container(self, container_id: str) -> bool:
+        with self.lock:
+            return any(container_id in n["containers"] for n in self.state["nodes"].values())
+
+    def section(self, name: str):
+        if name == "events":
+            return self.events.latest(self.event_log_size)
+        return self.state[name]
+
+    def encoded_section(self, name: str) -> Tuple[int, bytes]:
+        """(section version, JSON body); the body is serialized at most once per version."""
+        with self.lock:
+            version = self.section_versions[name]
+            cached = self._encoded.get(name)
+            if cached is None or cached[0] != version:
+                cached = self._encoded[name] = (version, _dumps(self.section(name)))
+            return cached
+
+    def encode_sections(self) -> Tuple[int, Dict[str, bytes]]:
+        with self.lock:
+            return self.version, {name: self.encoded_section(name)[1] for name in SECTIONS}
+
+    def section_stamps(self) -> Tuple[int, Dict[str, int]]:
+        """(epoch, per-section versions) of the current state."""
+        with self.lock:
+            return self.epoch, dict(self.section_versions)
+
+    def query_series(self, container: str, start: float, end: float, step: Optional[int], metric: str,
+                     node: Optional[str], source: str = "auto", now: Optional[float] = None) -> Optional[Dict]:
+        """Range query over a container's history; see `/api/series`."""
+        now = time.time() if now is None else now
+        result = None
+        if source != "disk":
+            result = self.series.query(container, start=start, end=end, step=step, metric=metric,
+                                       node_id=node, now=now)
+        if self.store is not None and source != "memory":
+            oldest_kept = now - self.series.tiers[-1][1]
+            if source == "disk" or result is None or start < oldest_kept:
+                node = node or self.store.find_node(container)
+                step = max(1, int(step or 60))
+                points = self.store.query_buckets(node, container, metric, start, end, step)
+                if points:
+                    result = {"node_id": node, "container": container, "metric": metric, "from": start,
+                              "to": end, "tier": "disk", "step": step, "points": points}
+        return result
+
+    def query_containers(self, **params) -> Dict:
+        """One page of containers; see `src.query.query_containers` and `/api/containers`."""
+        with self.lock:
+            return query_containers(self.state["nodes"], self.index, self.aggregates.indexes, **params)
+
+    def read_events(self, after: int = 0, types: Optional[List[str]] = None, node: Optional[str] = None,
+                    limit: int = 500) -> Dict:
+        """Events with seq > `after`, oldest first; see `/api/events`."""
+        with self.lock:
+            return self.events.read(after=after, types=types, node=node, limit=limit)
+
+    def totals(self, node: Optional[str] = None) -> Dict:
+        return self.aggregates.totals(node)
+
+    def top(self, metric: str = "cpu_usage", k: int = 10) -> List[Dict]:
+        return self.aggregates.top(metric, k)
+
+    def lifecycle_stats(self) -> Dict:
+        return self.lifecycle.stats()
+
+    def counts(self) -> Dict:
+        with self.lock:
+            return {
+                "nodes": len(self.state["nodes"]),
+                "containers": sum(len(n["containers"]) for n in self.state["nodes"].values()),
+                "series": len(self.series),
+            }
+
+    # --- jobs -----------------------------------------------------------------
+
+    def submit_job(self, kind: str, params: Dict) -> Dict:
+        return self.jobs.submit(kind, params).to_dict()
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        job = self.jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def list_jobs(self) -> List[Dict]:
+        return self.jobs.list()
+
+    # --- background work ----------------------------------------------------
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                with self.lock:
+                    before = dict(self.lifecycle.counters)
+                    self.lifecycle.sweep()
+                    if self.lifecycle.counters != before:
+                        self._changed("nodes", "security_scores")
+            except Exception as e:
+                logging.error("Lifecycle sweep failed: %s", e)
+
+    def start(self):
+        if self._sweeper:
+            return
+        self._stop.clear()
+        self._sweeper = threading.Thread(target=self._sweep_loop, daemon=True)
+        self._sweeper.start()
+        if self.store is not None:
+            self.store.start()
+
+    def close(self):
+        self._stop.set()
+        self.jobs.shutdown()
+        if self.store is not None:
+            self.store.close()
+
+
+class LocalStateBackend:
+    """Single-process backend: calls go straight to the in-process `DashboardState`."""
+
+    def __init__(self, state_factory: Callable[[], DashboardState]):
+        self.local = state_factory()
+
+    def __getattr__(self, name):
+        return getattr(self.local, name)
+
+    def read_section(self, name: str) -> bytes:
+        return self.local.encoded_section(name)[1]
+
+    def read_snapshot(self, name: str) -> Tuple[str, bytes]:
+        """(ETag, JSON body) of a snapshot section."""
+        version, body = self.local.encoded_section(name)
+        return _etag(self.local.epoch, version), body
+
+    def start(self):
+        self.local.start()
+
+    def close(self):
+        self.local.close()
+
+
+class SnapshotBuffer:
+    """Shared-memory region with pre-encoded JSON sections behind a seqlock.
+
+    Header: seq (odd while a write is in progress), version, moved flag, the
+    owner's epoch, one length and one version per section, followed by the
+    section bodies back to back.
+    """
+
+    HEADER = struct.Struct("<QQQQ" + "Q" * 2 * len(SECTIONS))
+
+    def __init__(self, name: Optional[str] = None, size: int = 0, create: bool = False):
+        from multiprocessing import shared_memory
+
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            self.HEADER.pack_into(self.shm.buf, 0, 0, 0, 0, 0, *([0] * 2 * len(SECTIONS)))
+        else:
+            # Readers must not register the owner's segment with the resource
+            # tracker, or it gets unlinked when they exit (`track=` is 3.13+).
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                from multiprocessing import resource_tracker
+                register = resource_tracker.register
+                resource_tracker.register = lambda *args, **kwargs: None
+                try:
+                    self.shm = shared_memory.SharedMemory(name=name)
+                finally:
+                    resource_tracker.register = register
+        self.name = self.shm.name
+        self.size = self.shm.size
+        self._seq = 0
+        self._cache: Tuple[int, Optional[Tuple]] = (-1, None)
+
+    def fits(self, sections: Dict[str, bytes]) -> bool:
+        return self.HEADER.size + sum(len(sections[s]) for s in SECTIONS) <= self.size
+
+    def write(self, version: int, sections: Dict[str, bytes], moved: bool = False, epoch: int = 0,
+              versions: Optional[Dict[str, int]] = None):
+        buf = self.shm.buf
+        self._seq += 1  # odd: readers retry until the write completes
+        struct.pack_into("<Q", buf, 0, self._seq)
+        lengths = [0] * len(SECTIONS)
+        if not moved:
+            offset = self.HEADER.size
+            for i, s in enumerate(SECTIONS):
+                body = sections[s]
+                buf[offset:offset + len(body)] = body
+                offset += len(body)
+                lengths[i] = len(body)
+        stamps = [(versions or {}).get(s, version) for s in SECTIONS]
+        self.HEADER.pack_into(buf, 0, self._seq, version, int(moved), epoch, *lengths, *stamps)
+        self._seq += 1
+        struct.pack_into("<Q", buf, 0, self._seq)
+
+    def read(self) -> Optional[Dict[str, bytes]]:
+        """Consistent copy of all sections, or None if the owner moved to a new segment."""
+        stamped = self.read_stamped()
+        return stamped[0] if stamped else None
+
+    def read_stamped(self) -> Optional[Tuple[Dict[str, bytes], int, Dict[str, int]]]:
+        """Like `read`, plus the owner's epoch and the version of each section."""
+        buf = self.shm.buf
+        n_sections = len(SECTIONS)
+        for _ in range(100):
+            seq, version, moved, epoch, *fields = self.HEADER.unpack_from(buf, 0)
+            lengths, stamps = fields[:n_sections], fields[n_sections:]
+            if seq & 1:
+                time.sleep(0)
+                continue
+            if moved:
+                return None
+            if seq == self._cache[0]:
+                return self._cache[1]
+            out = {}
+            offset = self.HEADER.size
+            for s, n in zip(SECTIONS, lengths):
+                out[s] = bytes(buf[offset:offset + n])
+                offset += n
+            if struct.unpack_from("<Q", buf, 0)[0] == seq:
+                self._cache = (seq, (out, epoch, dict(zip(SECTIONS, stamps))))
+                return self._cache[1]
+        raise RuntimeError("snapshot buffer is being rewritten too often to read")
+
+    def close(self, unlink: bool = False):
+        try:
+            self.shm.close()
+            if unlink:
+                self.shm.unlink()
+        except Exception:
+            pass
+
+
+class _OwnerManager(BaseManager):
+    pass
+
+
+class _ClientManager(BaseManager):
+    pass
+
+
+_ClientManager.register("owner")
+
+
+class _OwnerHandle:
+    """What the owner exposes over the manager socket."""
+
+    def __init__(self, backend: "SharedStateBackend"):
+        self._backend = backend
+
+    def snapshot_location(self) -> Tuple[str, int]:
+        return self._backend._snapshot.name, self._backend._snapshot.size
+
+    def call(self, method: str, *args, **kwargs):
+        return getattr(self._backend.local, method)(*args, **kwargs)
+
+
+class SharedStateBackend:
+    """Multi-worker backend: single-writer owner plus reader workers (see module docstring)."""
+
+    def __init__(self, state_factory: Callable[[], DashboardState], address: Optional[str] = None,
+                 authkey: bytes = b"os-dashboard", publish_interval: float = 0.25,
+                 snapshot_size: int = 4 * 1024 * 1024, flush_interval: float = 0.02,
+                 owner_check_interval: float = 1.0):
+        self.state_factory = state_factory
+        self.address = address or f"/tmp/os-dashboard-{os.getuid()}.sock"
+        self.authkey = authkey
+        self.publish_interval = publish_interval
+        self.snapshot_size = snapshot_size
+        self.flush_interval = flush_interval
+        self.owner_check_interval = owner_check_interval
+        self.local: Optional[DashboardState] = None  # set in the owner only
+        self._snapshot: Optional[SnapshotBuffer] = None
+        self._remote = None
+        self._lock_fd = None
+        self._outbox: "queue.Queue" = queue.Queue()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._election = threading.Lock()
+        self._generation = 0  # bumped whenever this worker switches owner
+
+    @property
+    def is_owner(self) -> bool:
+        return self.local is not None
+
+    # --- startup --------------------------------------------------------------
+
+    def _try_become_owner(self) -> bool:
+        import fcntl
+
+        fd = os.open(self.address + ".lock", os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd  # held for the life of the process
+        if os.path.exists(self.address):
+            os.remove(self.address)  # stale socket from a previous owner
+        self.local = self.state_factory()
+        self.local.start()
+        self._snapshot = SnapshotBuffer(size=self.snapshot_size, create=True)
+        self._publish()
+        handle = _OwnerHandle(self)
+        _OwnerManager.register("owner", callable=lambda: handle)
+        server = _OwnerManager(address=self.address, authkey=self.authkey).get_server()
+        os.chmod(self.address, 0o600)
+        self._spawn(server.serve_forever)
+        self._spawn(self._publish_loop)
+        logging.info("Dashboard worker %s owns shared state at %s", os.getpid(), self.address)
+        return True
+
+    def _connect(self, timeout: float = 10.0):
+        deadline = time.time() + timeout
+        while True:
+            try:
+                manager = _ClientManager(address=self.address, authkey=self.authkey)
+                manager.connect()
+                self._remote = manager.owner()
+                name, _ = self._remote.snapshot_location()
+                self._snapshot = SnapshotBuffer(name=name)
+                return
+            except (FileNotFoundError, ConnectionRefusedError):
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.1)
+
+    def _spawn(self, target):
+        t = threading.Thread(target=target, daemon=True)
+        t.start()
+        self._threads.append(t)
+
+    def start(self):
+        if not self._try_become_owner():
+            self._connect()
+            self._spawn(self._watch_loop)
+        self._spawn(self._sender_loop)
+
+    # --- failover -------------------------------------------------------------
+
+    def _owner_alive(self) -> bool:
+        try:
+            self._remote.snapshot_location()
+            return True
+        except _OWNER_GONE:
+            return False
+
+    def _owner_lost(self, generation: int):
+        """Re-run the election after the owner went away: take over, or connect to the worker that did."""
+        with self._election:
+            if self._generation != generation or self.is_owner or self._owner_alive():
+                return  # another thread already failed over, or it was a transient error
+            logging.warning("Dashboard state owner at %s is gone; re-electing", self.address)
+            old = self._snapshot
+            if not self._try_become_owner():
+                self._connect()
+            self._generation += 1
+            if old is not None:
+                old.close()
+
+    def _watch_loop(self):
+        while not self._stop.wait(self.owner_check_interval) and not self.is_owner:
+            generation = self._generation
+            if self._owner_alive():
+                continue
+            try:
+                self._owner_lost(generation)
+            except Exception as e:
+                logging.error("Dashboard state owner election failed: %s", e)
+
+    def close(self):
+        self._stop.set()
+        self._flush_outbox()
+        if self.is_owner:
+            self.local.close()
+            if self._snapshot:
+                self._snapshot.close(unlink=True)
+        elif self._snapshot:
+            self._snapshot.close()
+
+    # --- owner loops ----------------------------------------------------------
+
+    def _publish(self, published: int = -1) -> int:
+        with self.local.lock:
+            version, sections = self.local.encode_sections()
+            epoch, versions = self.local.section_stamps()
+        if version == published:
+            return version
+        if not self._snapshot.fits(sections):
+            old = self._snapshot
+            needed = SnapshotBuffer.HEADER.size + sum(len(b) for b in sections.values())
+            self._snapshot = SnapshotBuffer(size=max(needed * 2, old.size * 2), create=True)
+            old.write(version, sections, moved=True)
+            old.close(unlink=True)
+        self._snapshot.write(version, sections, epoch=epoch, versions=versions)
+        return version
+
+    def _publish_loop(self):
+        published = self._publish()
+        while not self._stop.wait(self.publish_interval):
+            try:
+                published = self._publish(published)
+            except Exception as e:
+                logging.error("Snapshot publish failed: %s", e)
+
+    # --- writes (batched towards the owner) ---------------------------------
+
+    def _sender_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self._flush_outbox()
+
+    def _flush_outbox(self):
+        batches = {"ingest": [], "event": [], "agent_events": []}
+        while True:
+            try:
+                kind, item = self._outbox.get_nowait()
+            except queue.Empty:
+                break
+            batches[kind].append(item)
+        try:
+            if batches["ingest"]:
+                self.call("ingest_many", batches["ingest"])
+            if batches["event"]:
+                self.call("log_events", batches["event"])
+            if batches["agent_events"]:
+                self.call("append_events_many", batches["agent_events"])
+        except Exception as e:
+            logging.error("Dropping %d state updates: %s", sum(len(b) for b in batches.values()), e)
+
+    def ingest(self, node_id: str, samples: List[Dict], now: Optional[float] = None):
+        self._outbox.put(("ingest", (node_id, samples, time.time() if now is None else now)))
+
+    def log_event(self, source: str, message: str, level: str = "INFO", **kwargs):
+        if kwargs:
+            return self.call("log_event", source, message, level, **kwargs)
+        self._outbox.put(("event", (source, message, level)))
+
+    def append_events(self, node_id: str, events: List[Dict]):
+        self._outbox.put(("agent_events", (node_id, events)))
+
+    # --- everything else goes to the owner --------------------------------------
+
+    def call(self, method: str, *args, **kwargs):
+        if self.is_owner:
+            return getattr(self.local, method)(*args, **kwargs)
+        generation = self._generation
+        try:
+            return self._remote.call(method, *args, **kwargs)
+        except _OWNER_GONE:
+            self._owner_lost(generation)
+            if self.is_owner:
+                return getattr(self.local, method)(*args, **kwargs)
+            return self._remote.call(method, *args, **kwargs)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+
+    def _read_stamped(self) -> Tuple[Dict[str, bytes], int, Dict[str, int]]:
+        snapshot = self._snapshot
+        stamped = snapshot.read_stamped() if snapshot else None
+        if stamped is None and snapshot is not None and not self.is_owner:
+            # Owner outgrew the segment and moved to a larger one
+            new_name, _ = self._remote.snapshot_location()
+            self._snapshot = SnapshotBuffer(name=new_name)
+            snapshot.close()
+            stamped = self._snapshot.read_stamped()
+        if stamped is None:
+            # Nothing published that this worker can map: ask the owner (stamps first, so the
+            # ETag is never newer than the body)
+            epoch, versions = self.call("section_stamps")
+            _, sections = self.call("encode_sections")
+            stamped = (sections, epoch, versions)
+        return stamped
+
+    def read_section(self, name: str) -> bytes:
+        return self._read_stamped()[0][name]
+
+    def read_snapshot(self, name: str) -> Tuple[str, bytes]:
+        """(ETag, JSON body) of a snapshot section, as last published by the owner."""
+        sections, epoch, versions = self._read_stamped()
+        return _etag(epoch, versions[name]), sections[name]
+
+
+def make_backend(state_factory: Callable[[], DashboardState], kind: Optional[str] = None):
+    kind = kind or os.environ.get("DASHBOARD_STATE_BACKEND", "local")
+    if kind == "shared":
+        return SharedStateBackend(state_factory, address=os.environ.get("DASHBOARD_STATE_ADDR"))
+    return LocalStateBackend(state_factory)
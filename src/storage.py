@@ -0,0 +1,386 @@
+"""Embedded append-only telemetry store for the dashboard.
+
+Layout under `root`::
+
+    series.tsv                  append-only "<id>\\t<node_id>\\t<container_id>" lines
+    <metric>/<start>.seg        fixed-width records for one time partition
+    <metric>/<start>.idx        sparse block index, written once a partition is compacted
+
+Each record is `<ts:f64><series_id:u32><value:f64>` (little endian, 20 bytes).
+Writes are buffered in memory and appended by `flush()` (called from a
+background thread every `flush_interval` seconds), so a crash loses at most
+the last unflushed interval; a torn trailing record is truncated on open.
+Reads map segments with `mmap` and use a sparse per-block (min_ts, max_ts)
+index to skip straight to the blocks overlapping the requested range.
+Closed partitions are compacted (sorted by time) and expired past `retention`.
+"""
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Tuple
+
+RECORD = struct.Struct('<dId')
+RECORD_SIZE = RECORD.size
+
+DEFAULT_METRICS = ("cpu_usage", "memory_bytes", "prediction")
+
+
+class SegmentIndex:
+    """Sparse index over a segment: (min_ts, max_ts) for every `block` records."""
+
+    def __init__(self, block: int):
+        self.block = block
+        self.mins = array('d')
+        self.maxs = array('d')
+        self.cummax = array('d')  # running max of `maxs`, monotone for bisect
+        self.records = 0
+        self.sorted = False
+
+    def extend(self, timestamps: Iterable[float]):
+        for ts in timestamps:
+            b = self.records // self.block
+            if b == len(self.mins):
+                self.mins.append(ts)
+                self.maxs.append(ts)
+                self.cummax.append(max(ts, self.cummax[-1]) if self.cummax else ts)
+            else:
+                if ts < self.mins[b]:
+                    self.mins[b] = ts
+                if ts > self.maxs[b]:
+                    self.maxs[b] = ts
+                if ts > self.cummax[b]:
+                    self.cummax[b] = ts
+            self.records += 1
+
+    def block_range(self, start: float, end: float) -> Iterable[int]:
+        """Blocks that may hold records in [start, end]."""
+        b = bisect_left(self.cummax, start)
+        for i in range(b, len(self.mins)):
+            if self.mins[i] > end:
+                if self.sorted:
+                    break
+                continue
+            if self.maxs[i] >= start:
+                yield i
+
+    def save(self, path: str):
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(struct.pack('<II', self.block, self.records))
+            f.write(self.mins.tobytes())
+            f.write(self.maxs.tobytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str, records: int) -> Optional["SegmentIndex"]:
+        try:
+            with open(path, 'rb') as f:
+                block, count = struct.unpack('<II', f.read(8))
+                if count != records:
+                    return None
+                idx = cls(block)
+                n = (records + block - 1) // block
+                idx.mins.frombytes(f.read(8 * n))
+                idx.maxs.frombytes(f.read(8 * n))
+        except (OSError, struct.error, ValueError):
+            return None
+        if len(idx.mins) != n or len(idx.maxs) != n:
+            return None
+        idx.cummax = array('d', accumulate(idx.maxs, max))
+        idx.records = records
+        idx.sorted = True
+        return idx
+
+
+class TelemetryStore:
+    """Append-only, time-partitioned on-disk store with mmap range reads."""
+
+    def __init__(self, root: str, metrics=DEFAULT_METRICS, partition_seconds: int = 3600,
+                 retention_seconds: int = 30 * 24 * 3600, flush_interval: float = 1.0,
+                 index_block: int = 256, fsync: bool = True):
+        self.root = root
+        self.metrics = tuple(metrics)
+        self.partition_seconds = int(partition_seconds)
+        self.retention_seconds = int(retention_seconds)
+        self.flush_interval = flush_interval
+        self.index_block = index_block
+        self.fsync = fsync
+
+        self._lock = threading.Lock()     # guards buffers and the series table
+        self._io_lock = threading.Lock()  # serialises file appends vs. compaction
+        self._buffers: Dict[Tuple[str, int], bytearray] = {}
+        self._indexes: Dict[Tuple[str, int], SegmentIndex] = {}
+        self._series_ids: Dict[Tuple[str, str], int] = {}
+        self._series_names: List[Tuple[str, str]] = []
+        self._pending_series: List[str] = []
+        self._thread = None
+        self._stop = threading.Event()
+
+        os.makedirs(root, exist_ok=True)
+        for metric in self.metrics:
+            os.makedirs(os.path.join(root, metric), exist_ok=True)
+        self._load_series()
+        self._recover_segments()
+
+    # --- paths / recovery ---------------------------------------------------
+
+    def _series_path(self) -> str:
+        return os.path.join(self.root, 'series.tsv')
+
+    def _segment_path(self, metric: str, partition: int) -> str:
+        return os.path.join(self.root, metric, f"{partition}.seg")
+
+    def _partitions(self, metric: str) -> List[int]:
+        out = []
+        for name in os.listdir(os.path.join(self.root, metric)):
+            if name.endswith('.seg'):
+                try:
+                    out.append(int(name[:-4]))
+                except ValueError:
+                    pass
+        return sorted(out)
+
+    def _load_series(self):
+        try:
+            with open(self._series_path(), 'r') as f:
+                lines = f.read().split('\n')
+        except FileNotFoundError:
+            return
+        # Last line may be torn if we crashed mid-write; it has no trailing newline.
+        for line in lines[:-1]:
+            parts = line.split('\t')
+            if len(parts) != 3 or int(parts[0]) != len(self._series_names):
+                break
+            key = (parts[1], parts[2])
+            self._series_ids[key] = len(self._series_names)
+            self._series_names.append(key)
+        if lines[-1]:
+            valid = ''.join(f"{i}\t{n}\t{c}\n" for i, (n, c) in enumerate(self._series_names))
+            with open(self._series_path(), 'w') as f:
+                f.write(valid)
+
+    def _recover_segments(self):
+        for metric in self.metrics:
+            for partition in self._partitions(metric):
+                path = self._segment_path(metric, partition)
+                size = os.path.getsize(path)
+                if size % RECORD_SIZE:
+                    logging.warning("Truncating torn record in %s", path)
+                    with open(path, 'r+b') as f:
+                        f.truncate(size - size % RECORD_SIZE)
+
+    def _index_for(self, metric: str, partition: int) -> SegmentIndex:
+        key = (metric, partition)
+        idx = self._indexes.get(key)
+        if idx is not None:
+            return idx
+        path = self._segment_path(metric, partition)
+        records = os.path.getsize(path) // RECORD_SIZE if os.path.exists(path) else 0
+        idx = SegmentIndex.load(path[:-4] + '.idx', records) if records else None
+        if idx is None:
+            idx = SegmentIndex(self.index_block)
+            if records:
+                with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    idx.extend(ts for ts, _, _ in RECORD.iter_unpack(mm[:records * RECORD_SIZE]))
+        self._indexes[key] = idx
+        return idx
+
+    # --- writes ---------------------------------------------------------------
+
+    def _series_id(self, node_id: str, container_id: str) -> int:
+        key = (node_id, container_id)
+        sid = self._series_ids.get(key)
+        if sid is None:
+            sid = len(self._series_names)
+            self._series_ids[key] = sid
+            self._series_names.append(key)
+            self._pending_series.append(f"{sid}\t{node_id}\t{container_id}\n")
+        return sid
+
+    def append(self, node_id: str, container_id: str, sample: Dict, ts: Optional[float] = None):
+        """Buffer one sample; every metric present in `sample` becomes a record."""
+        ts = time.time() if ts is None else ts
+        partition = int(ts) - int(ts) % self.partition_seconds
+        with self._lock:
+            sid = self._series_id(node_id, container_id)
+            for metric in self.metrics:
+                value = sample.get(metric)
+                if value is None:
+                    continue
+                buf = self._buffers.get((metric, partition))
+                if buf is None:
+                    buf = self._buffers[(metric, partition)] = bytearray()
+                buf += RECORD.pack(ts, sid, float(value))
+
+    def flush(self):
+        """Append buffered records to their segments (and fsync if enabled).
+
+        `_io_lock` is held across the buffer swap and the appends, so a concurrent `query`
+        sees each record either buffered or on disk, never in both or neither.
+        """
+        with self._io_lock:
+            with self._lock:
+                buffers, self._buffers = self._buffers, {}
+                pending, self._pending_series = self._pending_series, []
+            if pending:
+                with open(self._series_path(), 'a') as f:
+                    f.write(''.join(pending))
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+            for (metric, partition), buf in buffers.items():
+                path = self._segment_path(metric, partition)
+                idx = self._index_for(metric, partition)
+                with open(path, 'ab') as f:
+                    f.write(buf)
+                    f.flush()
+                    if self.fsync:
+                        os.fsync(f.fileno())
+                if idx.sorted:
+                    # A late write reopened a compacted partition.
+                    idx.sorted = False
+                    try:
+                        os.remove(path[:-4] + '.idx')
+                    except FileNotFoundError:
+                        pass
+                idx.extend(ts for ts, _, _ in RECORD.iter_unpack(bytes(buf)))
+
+    # --- reads ----------------------------------------------------------------
+
+    def query(self, node_id: str, container_id: str, metric: str = "cpu_usage",
+              start: Optional[float] = None, end: Optional[float] = None) -> List[Tuple[float, float]]:
+        """Return (ts, value) pairs for one series in [start, end], sorted by time."""
+        end = time.time() if end is None else end
+        start = end - 3600 if start is None else start
+        out: List[Tuple[float, float]] = []
+        first = int(start) - int(start) % self.partition_seconds
+        with self._io_lock:  # taken before _lock, as flush does, so no flush runs between buffers and files
+            with self._lock:
+                sid = self._series_ids.get((node_id, container_id))
+                buffered = [bytes(b) for (m, p), b in self._buffers.items()
+                            if m == metric and p <= end and p + self.partition_seconds > start]
+            if sid is None or metric not in self.metrics:
+                return []
+            for partition in self._partitions(metric):
+                if partition < first or partition > end:
+                    continue
+                path = self._segment_path(metric, partition)
+                idx = self._index_for(metric, partition)
+                if not idx.records:
+                    continue
+                with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    block_bytes = idx.block * RECORD_SIZE
+                    limit = idx.records * RECORD_SIZE
+                    for b in idx.block_range(start, end):
+                        lo = b * block_bytes
+                        chunk = mm[lo:min(lo + block_bytes, limit)]
+                        out.extend((ts, v) for ts, s, v in RECORD.iter_unpack(chunk)
+                                   if s == sid and start <= ts <= end)
+        for buf in buffered:
+            out.extend((ts, v) for ts, s, v in RECORD.iter_unpack(buf)
+                       if s == sid and start <= ts <= end)
+        out.sort()
+        return out
+
+    def query_buckets(self, node_id: str, container_id: str, metric: str = "cpu_usage",
+                      start: Optional[float] = None, end: Optional[float] = None, step: int = 60) -> List[Dict]:
+        """Range query downsampled into `step`-second min/max/avg buckets."""
+        points: List[Dict] = []
+        cur = None
+        for ts, value in self.query(node_id, container_id, metric, start, end):
+            b = ts - (ts % step)
+            if cur is None or cur["t"] != b:
+                cur = {"t": b, "count": 0, "sum": 0.0, "min": value, "max": value}
+                points.append(cur)
+            cur["count"] += 1
+            cur["sum"] += value
+            cur["min"] = min(cur["min"], value)
+            cur["max"] = max(cur["max"], value)
+        for p in points:
+            p["avg"] = p.pop("sum") / p["count"]
+        return points
+
+    def find_node(self, container_id: str) -> Optional[str]:
+        with self._lock:
+            for node_id, cid in self._series_names:
+                if cid == container_id:
+                    return node_id
+        return None
+
+    # --- maintenance --------------------------------------------------------
+
+    def compact(self, now: Optional[float] = None):
+        """Sort closed partitions by time and persist their sparse index."""
+        now = time.time() if now is None else now
+        for metric in self.metrics:
+            for partition in self._partitions(metric):
+                if partition + 2 * self.partition_seconds > now:
+                    continue  # still open (or just closed, allow stragglers)
+                with self._io_lock:
+                    idx = self._index_for(metric, partition)
+                    if idx.sorted or not idx.records:
+                        continue
+                    path = self._segment_path(metric, partition)
+                    with open(path, 'rb') as f:
+                        data = f.read(idx.records * RECORD_SIZE)
+                    records = sorted(RECORD.iter_unpack(data))
+                    tmp = path + '.tmp'
+                    with open(tmp, 'wb') as f:
+                        f.write(b''.join(RECORD.pack(*r) for r in records))
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(tmp, path)
+                    new_idx = SegmentIndex(self.index_block)
+                    new_idx.extend(r[0] for r in records)
+                    new_idx.sorted = True
+                    new_idx.save(path[:-4] + '.idx')
+                    self._indexes[(metric, partition)] = new_idx
+
+    def expire(self, now: Optional[float] = None):
+        """Delete partitions that ended before the retention window."""
+        now = time.time() if now is None else now
+        cutoff = now - self.retention_seconds
+        for metric in self.metrics:
+            for partition in self._partitions(metric):
+                if partition + self.partition_seconds > cutoff:
+                    continue
+                with self._io_lock:
+                    path = self._segment_path(metric, partition)
+                    for p in (path, path[:-4] + '.idx'):
+                        try:
+                            os.remove(p)
+                        except FileNotFoundError:
+                            pass
+                    self._indexes.pop((metric, partition), None)
+
+    def _run(self, maintenance_every: float):
+        last_maintenance = 0.0
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                if time.time() - last_maintenance >= maintenance_every:
+                    self.expire()
+                    self.compact()
+                    last_maintenance = time.time()
+            except Exception as e:
+                logging.error("Telemetry store maintenance failed: %s", e)
+
+    def start(self, maintenance_every: float = 300.0):
+        if self._thread:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(maintenance_every,), daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5.0)
+            self._thread = None
+        self.flush()
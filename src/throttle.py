@@ -0,0 +1,137 @@
+"""Closed-loop cpu.max control from observed throttling (`cpu.stat`).
+
+`cpu_quota_for` sizes a quota from the forecast alone and never learns whether
+it was enough. `ThrottleFeedback` closes the loop per container: each tick it
+reads the `nr_periods`/`nr_throttled`/`throttled_usec` deltas of `cpu.stat`
+and steers a headroom factor on top of the forecast (quota = forecast x
+factor) with a PI controller on the share of periods throttled:
+
+- the error is `throttled share - target`. A throttled tick is a large
+  positive error (up to 1 - target), so the integrator winds up quickly and
+  the proportional term (rise only) adds more for that tick;
+- an unthrottled tick is a small negative error (-target), so unused headroom
+  is handed back slowly. The integrator settles where `target` of the ticks
+  are throttled.
+
+The integrator is clamped to [`min_headroom`, `max_headroom`] (anti-windup), so
+a long throttled stretch cannot build up credit that would then take many
+ticks to unwind. Gains are per container (`configure`, with `GAIN_CLASSES`
+presets): latency-sensitive services get a low target and a fast rise, batch
+jobs tolerate throttling in exchange for tight quotas.
+"""
+from collections import deque
+from typing import Dict, Optional
+
+USEC_PER_SEC = 1000000
+
+
+class ThrottleGains:
+    """Feedback settings of one container: throttled-period target, PI gains, headroom bounds."""
+
+    def __init__(self, target: float = 0.05, kp: float = 0.5, ki: float = 0.2, min_headroom: float = 1.0, max_headroom: float = 4.0, initial_headroom: float = 1.2):
+        if not 0 <= target < 1:
+            raise ValueError(f"throttling target must be within 0..1, got {target}")
+        if not 0 < min_headroom <= initial_headroom <= max_headroom:
+            raise ValueError("expected 0 < min_headroom <= initial_headroom <= max_headroom")
+        self.target = target
+        self.kp = kp
+        self.ki = ki
+        self.min_headroom = min_headroom
+        self.max_headroom = max_headroom
+        self.initial_headroom = initial_headroom
+
+
+# Presets for `configure(path, cls)`; keyword arguments override single settings
+GAIN_CLASSES = {
+    "latency": dict(target=0.01, kp=1.0, ki=0.3, initial_headroom=1.5),
+    "standard": dict(),
+    "batch": dict(target=0.2, kp=0.2, ki=0.1, initial_headroom=1.1),
+}
+
+
+class _FeedbackState:
+    def __init__(self, gains: ThrottleGains, window: int):
+        self.gains = gains
+        self.integral = gains.initial_headroom  # headroom factor accumulated by the I term
+        self.rates = deque(maxlen=window)  # usage usec/s
+        self.last: Optional[tuple] = None  # (usage_usec, nr_periods, nr_throttled, throttled_usec, timestamp)
+        self.throttled_ratio: Optional[float] = None  # share of periods throttled since the previous sample
+
+
+class ThrottleFeedback:
+    """Per-container PI control of the cpu.max headroom; `observe` every tick, then `quota`."""
+
+    def __init__(self, period: int = 100000, window: int = 5, min_quota: int = 1000):
+        self.period = period
+        self.window = window
+        self.min_quota = min_quota
+        self.gains: Dict[str, ThrottleGains] = {}
+        self.state: Dict[str, _FeedbackState] = {}
+        self.totals: Dict[str, Dict[str, int]] = {}
+
+    def configure(self, cgroup_path: str, cls: str = "standard", **gains):
+        if cls not in GAIN_CLASSES:
+            raise ValueError(f"unknown gain class {cls!r}; expected one of {list(GAIN_CLASSES)}")
+        self.gains[cgroup_path] = ThrottleGains(**dict(GAIN_CLASSES[cls], **gains))
+        if cgroup_path in self.state:
+            self.state[cgroup_path].gains = self.gains[cgroup_path]
+
+    def _state(self, cgroup_path: str) -> _FeedbackState:
+        st = self.state.get(cgroup_path)
+        if st is None:
+            gains = self.gains.get(cgroup_path) or ThrottleGains()
+            st = self.state[cgroup_path] = _FeedbackState(gains, self.window)
+        return st
+
+    def observe(self, cgroup_path: str, sample: Dict):
+        """Record a monitor sample: usage rate and the share of periods throttled since the previous one."""
+        stat = sample.get('cpu_stat') or {}
+        now = sample.get('timestamp')
+        if 'usage_usec' not in stat or now is None:
+            return
+        st = self._state(cgroup_path)
+        current = (stat['usage_usec'], stat.get('nr_periods', 0), stat.get('nr_throttled', 0),
+                   stat.get('throttled_usec', 0), now)
+        last, st.last = st.last, current
+        if last is None or now <= last[4]:
+            return
+        deltas = [c - l for c, l in zip(current[:4], last[:4])]
+        if min(deltas) < 0:
+            return  # counters reset (cgroup recreated)
+        used, periods, throttled, throttled_usec = deltas
+        st.rates.append(used / (now - last[4]))
+        st.throttled_ratio = throttled / periods if periods else 0.0
+        totals = self.totals.setdefault(cgroup_path, {"periods": 0, "throttled": 0, "throttled_usec": 0})
+        totals["periods"] += periods
+        totals["throttled"] += throttled
+        totals["throttled_usec"] += throttled_usec
+
+    def demand(self, cgroup_path: str) -> Optional[float]:
+        """Forecast when the caller has none: moving average of the observed usage rates (usec/s)."""
+        st = self.state.get(cgroup_path)
+        if st is None or not st.rates:
+            return None
+        return sum(st.rates) / len(st.rates)
+
+    def headroom(self, cgroup_path: str) -> float:
+        return self._state(cgroup_path).integral
+
+    def quota(self, cgroup_path: str, forecast: Optional[float] = None) -> Optional[int]:
+        """Next cpu.max quota (usec per `period`) from the forecast (usec/s) and the throttling just observed."""
+        st = self._state(cgroup_path)
+        forecast = self.demand(cgroup_path) if forecast is None else forecast
+        if forecast is None:
+            return None
+        g = st.gains
+        p_term = 0.0
+        if st.throttled_ratio is not None:
+            error = st.throttled_ratio - g.target
+            # Anti-windup: the integrator never leaves the range the output is allowed to use
+            st.integral = min(g.max_headroom, max(g.min_headroom, st.integral + g.ki * error))
+            p_term = g.kp * max(0.0, error)
+            st.throttled_ratio = None  # each observation is acted on once
+        factor = min(g.max_headroom, st.integral + p_term)
+        return int(max(self.min_quota, forecast * factor * self.period / USEC_PER_SEC))
+
+    def forget(self, cgroup_path: str):
+        self.state.pop(cgroup_path, None)
@@ -0,0 +1,233 @@
+"""Bounded in-memory multi-resolution time-series history for the dashboard.
+
+Every series keeps a fixed set of retention tiers (by default raw 1s buckets
+for 15 minutes, 1 minute rollups for 24 hours and 1 hour rollups for 30 days).
+Each tier is a ring buffer of buckets holding count/sum/min/max, so a sample
+updates every tier in O(1) on ingest and a range query only touches the
+buckets of the single tier it is answered from.
+"""
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# (bucket width in seconds, retention in seconds)
+DEFAULT_TIERS = (
+    (1, 15 * 60),
+    (60, 24 * 3600),
+    (3600, 30 * 24 * 3600),
+)
+
+DEFAULT_METRICS = ("cpu_usage", "memory_bytes", "prediction")
+
+
+class RollupTier:
+    """Ring buffer of fixed-width buckets with count/sum/min/max per bucket.
+
+    Storage grows lazily up to `capacity` buckets, so short-lived series only
+    pay for the history they actually have.
+    """
+
+    def __init__(self, step: int, retention: int):
+        self.step = int(step)
+        self.retention = int(retention)
+        self.capacity = max(1, self.retention // self.step)
+        self.starts = array('d')
+        self.counts = array('L')
+        self.sums = array('d')
+        self.mins = array('d')
+        self.maxs = array('d')
+        self.head = 0  # physical index of the oldest bucket once the ring is full
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _phys(self, i: int) -> int:
+        return (self.head + i) % len(self.starts)
+
+    def _last(self) -> int:
+        return self._phys(len(self.starts) - 1)
+
+    def add(self, ts: float, value: float):
+        start = ts - (ts % self.step)
+        n = len(self.starts)
+        if n:
+            last = self._last()
+            # Late samples are folded into the newest bucket rather than
+            # searched for; ingest timestamps are assigned server-side.
+            if start <= self.starts[last]:
+                self.counts[last] += 1
+                self.sums[last] += value
+                if value < self.mins[last]:
+                    self.mins[last] = value
+                if value > self.maxs[last]:
+                    self.maxs[last] = value
+                return
+        if n < self.capacity:
+            self.starts.append(start)
+            self.counts.append(1)
+            self.sums.append(value)
+            self.mins.append(value)
+            self.maxs.append(value)
+            return
+        # Ring is full: overwrite the oldest bucket.
+        i = self.head
+        self.starts[i] = start
+        self.counts[i] = 1
+        self.sums[i] = value
+        self.mins[i] = value
+        self.maxs[i] = value
+        self.head = (self.head + 1) % n
+
+    def oldest(self) -> Optional[float]:
+        if not self.starts:
+            return None
+        return self.starts[self._phys(0)]
+
+    def _bisect(self, ts: float) -> int:
+        """Logical index of the first bucket whose start is >= ts."""
+        lo, hi = 0, len(self.starts)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.starts[self._phys(mid)] < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def covers(self, ts: float, now: float) -> bool:
+        """True if this tier can still hold data for `ts`."""
+        return ts >= now - self.retention
+
+    def iter_range(self, start: float, end: float) -> Iterable[Tuple[float, int, float, float, float]]:
+        # Include the bucket that straddles `start`.
+        i = max(0, self._bisect(start - self.step + 1))
+        n = len(self.starts)
+        while i < n:
+            p = self._phys(i)
+            s = self.starts[p]
+            if s > end:
+                break
+            yield s, self.counts[p], self.sums[p], self.mins[p], self.maxs[p]
+            i += 1
+
+
+class Series:
+    """All retention tiers for a single (node, container, metric) series."""
+
+    def __init__(self, tiers=DEFAULT_TIERS):
+        self.tiers = [RollupTier(step, retention) for step, retention in tiers]
+
+    def add(self, ts: float, value: float):
+        for tier in self.tiers:
+            tier.add(ts, value)
+
+    def pick_tier(self, start: float, step: int, now: float) -> RollupTier:
+        """Pick the cheapest tier that still has the resolution asked for.
+
+        Prefers the coarsest tier with `tier.step <= step` that covers `start`;
+        otherwise falls back to the finest tier that covers it.
+        """
+        covering = [t for t in self.tiers if t.covers(start, now)]
+        if not covering:
+            return self.tiers[-1]
+        fine_enough = [t for t in covering if t.step <= step]
+        if fine_enough:
+            return max(fine_enough, key=lambda t: t.step)
+        return min(covering, key=lambda t: t.step)
+
+    def query(self, start: float, end: float, step: Optional[int], now: float) -> Tuple[int, List[Dict]]:
+        tier = self.pick_tier(start, step or self.tiers[0].step, now)
+        step = max(tier.step, int(step or tier.step))
+        points: List[Dict] = []
+        cur = None
+        for s, count, total, lo, hi in tier.iter_range(start, end):
+            b = s - (s % step)
+            if cur is None or cur["t"] != b:
+                cur = {"t": b, "count": 0, "sum": 0.0, "min": lo, "max": hi}
+                points.append(cur)
+            cur["count"] += count
+            cur["sum"] += total
+            if lo < cur["min"]:
+                cur["min"] = lo
+            if hi > cur["max"]:
+                cur["max"] = hi
+        for p in points:
+            p["avg"] = p.pop("sum") / p["count"] if p["count"] else None
+        return tier.step, points
+
+
+class TimeSeriesStore:
+    """Thread-safe collection of `Series` keyed by (node_id, container_id, metric).
+
+    `max_series` bounds memory: when exceeded, the least recently updated
+    series is dropped.
+    """
+
+    def __init__(self, tiers=DEFAULT_TIERS, metrics=DEFAULT_METRICS, max_series: int = 30000):
+        self.tiers = tuple(tiers)
+        self.metrics = tuple(metrics)
+        self.max_series = max_series
+        self._series: "OrderedDict[Tuple[str, str, str], Series]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.dropped_series = 0
+
+    def record(self, node_id: str, container_id: str, sample: Dict, ts: Optional[float] = None):
+        """Add every known metric present in `sample` to its series."""
+        ts = time.time() if ts is None else ts
+        with self._lock:
+            for metric in self.metrics:
+                value = sample.get(metric)
+                if value is None:
+                    continue
+                key = (node_id, container_id, metric)
+                series = self._series.get(key)
+                if series is None:
+                    series = self._series[key] = Series(self.tiers)
+                    while len(self._series) > self.max_series:
+                        self._series.popitem(last=False)
+                        self.dropped_series += 1
+                else:
+                    self._series.move_to_end(key)
+                series.add(ts, float(value))
+
+    def remove(self, node_id: str, container_id: str):
+        """Drop every metric series of a container (e.g. once it is evicted)."""
+        with self._lock:
+            for metric in self.metrics:
+                self._series.pop((node_id, container_id, metric), None)
+
+    def find_node(self, container_id: str) -> Optional[str]:
+        with self._lock:
+            for node_id, cid, _ in self._series:
+                if cid == container_id:
+                    return node_id
+        return None
+
+    def query(self, container_id: str, start: Optional[float] = None, end: Optional[float] = None,
+              step: Optional[int] = None, metric: str = "cpu_usage", node_id: Optional[str] = None,
+              now: Optional[float] = None) -> Optional[Dict]:
+        now = time.time() if now is None else now
+        end = now if end is None else end
+        start = end - 300 if start is None else start
+        if node_id is None:
+            node_id = self.find_node(container_id)
+        with self._lock:
+            series = self._series.get((node_id, container_id, metric))
+            if series is None:
+                return None
+            tier_step, points = series.query(start, end, step, now)
+        return {
+            "node_id": node_id,
+            "container": container_id,
+            "metric": metric,
+            "from": start,
+            "to": end,
+            "tier": tier_step,
+            "step": max(tier_step, int(step or tier_step)),
+            "points": points,
+        }
+
+    def __len__(self):
+        return len(self._series)
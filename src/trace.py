@@ -0,0 +1,184 @@
+"""Binary telemetry traces: record what the agent's monitor saw and replay it.
+
+File layout: a 16-byte header (magic, version, record size) followed by
+fixed-width 80-byte little-endian records. Two kinds of record:
+
+- path records map a small integer id to a cgroup path (split over several
+  records for paths longer than 72 bytes), written the first time a path is
+  sampled;
+- sample records hold the timestamp, path id, the `cpu.stat` counters,
+  `memory.current` and the io byte total of one `CgroupMonitor.sample()`.
+
+Traces whose name ends in `.gz` (or written with `compress=True`) are gzip
+streams of the same bytes. Readers decode records straight out of large
+read blocks with `struct.unpack_from`, so replay is bound by the agent logic,
+not parsing, and stream the file: replay holds only the samples read ahead
+of where each path is, not the whole trace.
+"""
+import gzip
+import struct
+import time
+from collections import deque
+from typing import Dict, Iterator, List, Optional
+
+MAGIC = b"CGTRACE\0"
+VERSION = 1
+HEADER = struct.Struct("<8sHHI")  # magic, version, record size, reserved
+
+# kind, flags, path id, reserved, timestamp, usage/user/system usec, nr_periods, nr_throttled,
+# throttled_usec, memory bytes, io bytes
+SAMPLE = struct.Struct("<BBHIdQQQQQQqQ")
+PATH_CHUNK = SAMPLE.size - 8
+PATH = struct.Struct(f"<BBHI{PATH_CHUNK}s")  # kind, chunk index, path id, total length, name bytes
+
+KIND_PATH = 1
+KIND_SAMPLE = 2
+HAS_CPU = 1
+HAS_MEMORY = 2
+
+CPU_FIELDS = ("usage_usec", "user_usec", "system_usec", "nr_periods", "nr_throttled", "throttled_usec")
+
+
+def _open(filename: str, mode: str, compress: Optional[bool] = None):
+    if compress is None:
+        compress = filename.endswith(".gz")
+    if compress:
+        return gzip.open(filename, mode + "b", compresslevel=6)
+    return open(filename, mode + "b")
+
+
+class TraceWriter:
+    """Appends monitor samples to a trace file; pass to `CgroupMonitor(recorder=...)`."""
+
+    def __init__(self, filename: str, compress: Optional[bool] = None):
+        self.filename = filename
+        self._f = _open(filename, "w", compress)
+        self._f.write(HEADER.pack(MAGIC, VERSION, SAMPLE.size, 0))
+        self._ids: Dict[str, int] = {}
+        self.records = 0
+
+    def _path_id(self, path: str) -> int:
+        pid = self._ids.get(path)
+        if pid is None:
+            pid = self._ids[path] = len(self._ids)
+            name = path.encode()
+            for i in range(0, max(1, len(name)), PATH_CHUNK):
+                self._f.write(PATH.pack(KIND_PATH, i // PATH_CHUNK, pid, len(name), name[i:i + PATH_CHUNK]))
+        return pid
+
+    def write(self, sample: Dict):
+        cpu = sample.get("cpu_stat") or {}
+        mem = sample.get("memory_bytes")
+        flags = (HAS_CPU if cpu else 0) | (HAS_MEMORY if mem is not None else 0)
+        self._f.write(SAMPLE.pack(
+            KIND_SAMPLE, flags, self._path_id(sample["cgroup_path"]), 0, sample.get("timestamp") or time.time(),
+            *(cpu.get(k, 0) for k in CPU_FIELDS), -1 if mem is None else mem, sample.get("io_read_bytes") or 0))
+        self.records += 1
+
+    def flush(self):
+        self._f.flush()
+
+    def close(self):
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _sample_records(filename: str, block_records: int = 4096) -> Iterator[tuple]:
+    """(cgroup path, raw SAMPLE tuple) per sample record, in recorded order."""
+    with _open(filename, "r") as f:
+        magic, version, size, _ = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{filename} is not a cgroup trace")
+        if version != VERSION or size != SAMPLE.size:
+            raise ValueError(f"unsupported trace version {version} (record size {size})")
+        paths: Dict[int, str] = {}
+        partial: Dict[int, bytes] = {}
+        while True:
+            block = f.read(size * block_records)
+            if not block:
+                return
+            # A torn final record (recorder killed mid-write) is ignored
+            block = block[:len(block) - len(block) % size]
+            for offset in range(0, len(block), size):
+                if block[offset] == KIND_SAMPLE:
+                    rec = SAMPLE.unpack_from(block, offset)
+                    yield paths[rec[2]], rec
+                else:
+                    _, chunk, pid, length, name = PATH.unpack_from(block, offset)
+                    name = partial.pop(pid, b"") + name
+                    if len(name) >= length:
+                        paths[pid] = name[:length].decode()
+                    else:
+                        partial[pid] = name
+
+
+def read_trace(filename: str, block_records: int = 4096) -> Iterator[Dict]:
+    """Yield samples in recorded order, in the same shape as `CgroupMonitor.sample()`."""
+    for path, rec in _sample_records(filename, block_records):
+        flags = rec[1]
+        yield {
+            "timestamp": rec[4],
+            "cgroup_path": path,
+            "cpu_stat": dict(zip(CPU_FIELDS, rec[5:11])) if flags & HAS_CPU else {},
+            "memory_bytes": rec[11] if flags & HAS_MEMORY else None,
+            "io_read_bytes": rec[12],
+            "net_rx_bytes": 0,
+        }
+
+
+class ReplayMonitor:
+    """Drop-in for `CgroupMonitor` that returns recorded samples instead of reading cgroupfs.
+
+    Each `sample(path)` returns that path's next recorded sample (an empty one
+    once the path has run out); `exhausted` turns true once every path has run
+    out. A first pass only counts samples per path; the second streams them,
+    buffering the samples of other paths read on the way to the one asked for.
+    """
+
+    def __init__(self, filename: str):
+        self._left: Dict[str, int] = {}  # samples not yet returned, per path
+        self.start = self.end = 0.0
+        for path, rec in _sample_records(filename):
+            if not self._left:
+                self.start = self.end = rec[4]
+            self._left[path] = self._left.get(path, 0) + 1
+            self.start = min(self.start, rec[4])
+            self.end = max(self.end, rec[4])
+        self.paths: List[str] = list(self._left)
+        self._count = sum(self._left.values())
+        self._remaining = self._count
+        self.exhausted = not self._remaining
+        self._ahead: Dict[str, deque] = {p: deque() for p in self.paths}
+        self._stream = read_trace(filename)
+
+    def __len__(self):
+        return self._count
+
+    def sample(self, cgroup_path: str) -> Dict:
+        if not self._left.get(cgroup_path):
+            return {"timestamp": self.end, "cgroup_path": cgroup_path, "cpu_stat": {}, "memory_bytes": None,
+                    "io_read_bytes": 0, "net_rx_bytes": 0}
+        queue = self._ahead[cgroup_path]
+        while not queue:
+            s = next(self._stream)
+            self._ahead[s["cgroup_path"]].append(s)
+        self._left[cgroup_path] -= 1
+        self._remaining -= 1
+        self.exhausted = not self._remaining
+        return queue.popleft()
+
+
+class ReplayScanner:
+    """Security scores are not part of a trace; replay treats every container as `score`."""
+
+    def __init__(self, score: int = 100):
+        self.score = score
+
+    def scan_container(self, container_id: str) -> Dict:
+        return {"score": self.score, "risks": [], "details": {}}
+
@@ -0,0 +1,299 @@
+"""Profile-driven multi-resource workload generator (runs inside a test container).
+
+A profile file (JSON) is a list of phases. Each phase can combine:
+
+- `cpu`:    {"workers": N, "duty": 0.0-1.0, "jitter": 0.1} - N processes, each busy
+            for exactly `duty` of every `period` (default 100ms), +- jitter
+- `memory`: {"target_mb": M, "ramp_sec": S} - grow (or shrink, releasing memory)
+            to M MiB of touched pages over S seconds, then hold
+- `disk`:   {"read_mbps": R, "write_mbps": W, "file_mb": F} - paced reads and
+            fsync'ed writes on a scratch file, page cache dropped before reads
+- `bursts`: [{"at": T, "duration": D, "duty": 1.0}] at fixed offsets, or
+            {"count": K, "duration": D, "duty": 1.0} placed by the seed; a burst
+            sets the duty of the phase's CPU workers for its duration
+
+Everything random (jitter, burst placement) derives from the profile's `seed`,
+so the same profile and seed always produce the same load schedule. After each
+phase a JSON line reports what was actually delivered (CPU seconds and duty
+achieved, memory held, disk bytes and rates) next to the targets.
+
+Stdlib only, so it runs in a bare python image (see Dockerfile.ml):
+
+    python -m src.workload examples/workloads/ml_training.json --log delivered.jsonl
+"""
+import argparse
+import json
+import multiprocessing as mp
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+MIB = 1024 * 1024
+PAGE = 4096
+CHUNK_MB = 10  # memory is held in chunks of this size
+
+
+def log(msg):
+    print(f"[ML-WORKLOAD] {msg}", flush=True)
+
+
+def load_profile(path: str) -> Dict:
+    with open(path) as f:
+        profile = json.load(f)
+    phases = profile.get("phases")
+    if not phases:
+        raise ValueError(f"{path}: profile needs a non-empty 'phases' list")
+    for i, phase in enumerate(phases):
+        if phase.get("duration", 0) <= 0:
+            raise ValueError(f"{path}: phase {i} needs a positive 'duration'")
+        duty = phase.get("cpu", {}).get("duty", 0)
+        if not 0 <= duty <= 1:
+            raise ValueError(f"{path}: phase {i} cpu duty must be within 0..1, got {duty}")
+    return profile
+
+
+def plan_bursts(phase: Dict, rng: random.Random) -> List[Dict]:
+    """Absolute burst windows (seconds into the phase): fixed `at` offsets or `count` seeded placements."""
+    bursts = phase.get("bursts") or []
+    if isinstance(bursts, dict):
+        duration = bursts.get("duration", 1.0)
+        latest = max(0.0, phase["duration"] - duration)
+        bursts = [dict(bursts, at=round(rng.uniform(0, latest), 3)) for _ in range(bursts.get("count", 1))]
+    return sorted(({"at": b["at"], "duration": b.get("duration", 1.0), "duty": b.get("duty", 1.0)}
+                   for b in bursts), key=lambda b: b["at"])
+
+
+def plan(profile: Dict, seed: Optional[int] = None) -> List[Dict]:
+    """The deterministic schedule of a profile: per phase its targets, burst windows and worker seeds."""
+    seed = profile.get("seed", 0) if seed is None else seed
+    rng = random.Random(seed)
+    schedule = []
+    for i, phase in enumerate(profile["phases"]):
+        cpu = phase.get("cpu", {})
+        schedule.append({
+            "name": phase.get("name", f"phase-{i}"),
+            "duration": phase["duration"],
+            "cpu": {"workers": cpu.get("workers", 1 if cpu.get("duty") else 0), "duty": cpu.get("duty", 0.0),
+                    "jitter": cpu.get("jitter", 0.0), "period": cpu.get("period", 0.1)},
+            "memory": phase.get("memory"),
+            "disk": phase.get("disk"),
+            "bursts": plan_bursts(phase, rng),
+            "seed": rng.getrandbits(32),
+        })
+    return schedule
+
+
+def duty_at(t: float, base: float, bursts: List[Dict]) -> float:
+    for b in bursts:
+        if b["at"] <= t < b["at"] + b["duration"]:
+            return b["duty"]
+    return base
+
+
+def cpu_worker(duration: float, duty: float, jitter: float, period: float, bursts: List[Dict], seed: int, out):
+    """Busy-spin for `duty` of every period; reports the CPU seconds this process consumed."""
+    rng = random.Random(seed)
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    end = start + duration
+    slot = start
+    while slot < end:
+        d = duty_at(slot - start, duty, bursts)
+        if jitter:
+            d = min(1.0, max(0.0, d + rng.uniform(-jitter, jitter)))
+        busy_until = slot + period * d
+        while time.perf_counter() < busy_until:
+            pass
+        slot += period
+        remaining = min(slot, end) - time.perf_counter()
+        if remaining > 0:
+            time.sleep(remaining)
+    out.put(time.process_time() - cpu_start)
+
+
+class MemoryLoad:
+    """Touched (resident) memory grown or released in CHUNK_MB steps."""
+
+    def __init__(self):
+        self.chunks: List[bytearray] = []
+        self.peak_mb = 0
+
+    @property
+    def held_mb(self) -> int:
+        return len(self.chunks) * CHUNK_MB
+
+    def resize(self, target_mb: float):
+        target = int(target_mb // CHUNK_MB)
+        while len(self.chunks) > target:
+            self.chunks.pop()
+        while len(self.chunks) < target:
+            chunk = bytearray(CHUNK_MB * MIB)
+            chunk[::PAGE] = b"\x01" * (len(chunk) // PAGE)  # fault every page in
+            self.chunks.append(chunk)
+        self.peak_mb = max(self.peak_mb, self.held_mb)
+
+
+class DiskLoad(threading.Thread):
+    """Paced reads and writes on one scratch file until `stop` is set."""
+
+    def __init__(self, path: str, read_mbps: float = 0, write_mbps: float = 0, file_mb: int = 256):
+        super().__init__(daemon=True)
+        self.path = path
+        self.read_mbps = read_mbps
+        self.write_mbps = write_mbps
+        self.file_size = file_mb * MIB
+        self.stop = threading.Event()
+        self.read_bytes = 0
+        self.written_bytes = 0
+
+    def run(self):
+        block = os.urandom(MIB)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if self.read_mbps and os.fstat(fd).st_size < MIB:
+                os.write(fd, block)  # something to read back
+            start = time.perf_counter()
+            wpos = rpos = 0
+            while not self.stop.is_set():
+                elapsed = time.perf_counter() - start
+                behind = False
+                if self.written_bytes < self.write_mbps * MIB * elapsed:
+                    os.pwrite(fd, block, wpos)
+                    os.fsync(fd)
+                    self.written_bytes += MIB
+                    wpos = (wpos + MIB) % self.file_size
+                    behind = True
+                if self.read_bytes < self.read_mbps * MIB * elapsed:
+                    size = os.fstat(fd).st_size
+                    if rpos + MIB > size:
+                        rpos = 0
+                    if hasattr(os, "posix_fadvise"):
+                        os.posix_fadvise(fd, rpos, MIB, os.POSIX_FADV_DONTNEED)  # force a real read
+                    self.read_bytes += len(os.pread(fd, MIB, rpos))
+                    rpos += MIB
+                    behind = True
+                if not behind:
+                    self.stop.wait(0.01)
+        finally:
+            os.close(fd)
+
+
+def run_phase(phase: Dict, memory: MemoryLoad, workdir: str) -> Dict:
+    """Run one planned phase; returns the delivered load next to its targets."""
+    duration = phase["duration"]
+    cpu = phase["cpu"]
+    log(f"Starting Phase: {phase['name']} ({duration}s)")
+    start = time.perf_counter()
+
+    out = mp.Queue()
+    workers = [mp.Process(target=cpu_worker, daemon=True,
+                          args=(duration, cpu["duty"], cpu["jitter"], cpu["period"], phase["bursts"],
+                                phase["seed"] + w, out))
+               for w in range(cpu["workers"])]
+    for w in workers:
+        w.start()
+
+    disk = None
+    if phase.get("disk"):
+        d = phase["disk"]
+        disk = DiskLoad(os.path.join(workdir, "workload.dat"), d.get("read_mbps", 0), d.get("write_mbps", 0),
+                        d.get("file_mb", 256))
+        disk.start()
+
+    mem = phase.get("memory") or {}
+    if "target_mb" in mem:
+        initial = memory.held_mb
+        ramp = mem.get("ramp_sec", 0)
+        while True:
+            t = time.perf_counter() - start
+            frac = min(1.0, t / ramp) if ramp > 0 else 1.0
+            memory.resize(initial + (mem["target_mb"] - initial) * frac)
+            if frac >= 1.0 or t >= duration:
+                break
+            time.sleep(min(0.1, ramp))
+    remaining = duration - (time.perf_counter() - start)
+    if remaining > 0:
+        time.sleep(remaining)
+
+    cpu_seconds = sum(out.get() for _ in workers)
+    for w in workers:
+        w.join()
+    if disk:
+        disk.stop.set()
+        disk.join()
+    wall = time.perf_counter() - start
+    log(f"Completed Phase: {phase['name']}")
+
+    burst_extra = sum(min(b["duration"], max(0.0, duration - b["at"])) * (b["duty"] - cpu["duty"])
+                      for b in phase["bursts"])
+    target_cpu = len(workers) * (cpu["duty"] * duration + burst_extra)
+    return {
+        "phase": phase["name"], "duration": duration, "wall_sec": round(wall, 3),
+        "cpu": {"workers": len(workers), "target_cpu_sec": round(target_cpu, 3),
+                "delivered_cpu_sec": round(cpu_seconds, 3),
+                "delivered_duty": round(cpu_seconds / (duration * len(workers)), 4) if workers else 0.0},
+        "memory": {"target_mb": mem.get("target_mb"), "held_mb": memory.held_mb, "peak_mb": memory.peak_mb},
+        "disk": {"target_read_mbps": disk.read_mbps, "target_write_mbps": disk.write_mbps,
+                 "read_mb": round(disk.read_bytes / MIB, 1), "written_mb": round(disk.written_bytes / MIB, 1),
+                 "read_mbps": round(disk.read_bytes / MIB / wall, 2),
+                 "write_mbps": round(disk.written_bytes / MIB / wall, 2)} if disk else None,
+        "bursts": phase["bursts"],
+    }
+
+
+def run(profile: Dict, seed: Optional[int] = None, log_file: Optional[str] = None,
+        workdir: Optional[str] = None) -> List[Dict]:
+    """Run every phase of a profile; each phase's delivery report is returned and logged as a JSON line."""
+    schedule = plan(profile, seed)
+    memory = MemoryLoad()
+    reports = []
+    sink = open(log_file, "a") if log_file else None
+    try:
+        with tempfile.TemporaryDirectory(dir=workdir) as scratch:
+            for phase in schedule:
+                report = run_phase(phase, memory, scratch)
+                report["seed"] = profile.get("seed", 0) if seed is None else seed
+                reports.append(report)
+                line = json.dumps(report)
+                log(f"Delivered: {line}")
+                if sink:
+                    sink.write(line + "\n")
+                    sink.flush()
+    finally:
+        if sink:
+            sink.close()
+    return reports
+
+
+def parse_args(argv=None):
+    p = argparse.ArgumentParser(description="Profile-driven CPU/memory/disk workload generator")
+    p.add_argument("profile", help="Phase profile (JSON)")
+    p.add_argument("--seed", type=int, help="Override the profile's seed")
+    p.add_argument("--log", metavar="FILE", help="Append one JSON line of delivered load per phase")
+    p.add_argument("--workdir", help="Directory for the disk phases' scratch file (default: system temp)")
+    p.add_argument("--plan", action="store_true", help="Print the deterministic schedule and exit")
+    p.add_argument("--hold", action="store_true", help="Keep the process alive after the last phase")
+    return p.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    profile = load_profile(args.profile)
+    if args.plan:
+        print(json.dumps(plan(profile, args.seed), indent=2))
+        return 0
+    log("Container Started. Initializing environment...")
+    time.sleep(profile.get("startup_sec", 0))
+    run(profile, seed=args.seed, log_file=args.log, workdir=args.workdir)
+    log("Workload Complete.")
+    while args.hold:
+        time.sleep(10)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+from src.aggregates import FleetAggregates, SortedIndex
+
+
+def test_totals_and_top_k_track_updates_and_removals():
+    agg = FleetAggregates()
+    agg.update("n1", "a", {"cpu_usage": 100, "memory_bytes": 10, "prediction": 150})
+    agg.update("n1", "b", {"cpu_usage": 300, "memory_bytes": 20, "prediction": 280, "quarantined": True})
+    agg.update("n2", "c", {"cpu_usage": 200, "memory_bytes": 30, "prediction": 210})
+    agg.update("n1", "a", {"cpu_usage": 500, "memory_bytes": 10, "prediction": 450})
+
+    totals = agg.totals()
+    assert totals["fleet"]["cpu_usage"] == 1000
+    assert totals["fleet"]["containers"] == 3
+    assert totals["fleet"]["quarantined"] == 1
+    assert totals["nodes"]["n1"]["memory_bytes"] == 30
+
+    assert [c["id"] for c in agg.top("cpu_usage", 2)] == ["a", "b"]
+    # a predicted 150 and then used 500
+    assert agg.top("prediction_error", 1) == [{"node_id": "n1", "id": "a", "prediction_error": 350}]
+
+    agg.remove("n2", "c")
+    assert "n2" not in agg.totals()["nodes"]
+    assert agg.totals()["fleet"]["cpu_usage"] == 800
+    assert [c["id"] for c in agg.top("cpu_usage", 5)] == ["a", "b"]
+
+
+def test_sorted_index_above_threshold():
+    idx = SortedIndex()
+    for key, value in (("a", 5), ("b", 10), ("c", 10), ("d", 20)):
+        idx.update(key, value)
+    assert [k for _, k in idx.above(10)] == ["d"]
+    assert [k for _, k in idx.above(9)] == ["b", "c", "d"]
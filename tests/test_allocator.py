@@ -0,0 +1,60 @@
+import pytest
+
+from src.agent import run_iteration
+from src.allocator import CpuAllocator, water_fill
+from src.controller import CgroupController
+from src.fakefs import FakeCgroupFS
+from src.governance import GovernanceEngine
+from src.monitor import CgroupMonitor
+from src.predictor import MovingAveragePredictor
+from src.trace import ReplayScanner
+
+
+def test_water_fill_is_weighted_max_min_fair():
+    assert water_fill(10, [2, 10, 10], [1, 1, 1]) == [2, 4, 4]
+    assert water_fill(9, [10, 10], [2, 1]) == [6, 3]
+    assert water_fill(100, [5, 5], [1, 1]) == [5, 5]
+
+
+def test_contention_respects_priority_guarantees_and_capacity():
+    alloc = CpuAllocator(capacity=4000000, headroom=1.0)
+    alloc.configure("db", priority="critical")
+    alloc.configure("web", min_cpu=500000)
+    alloc.configure("etl", priority="batch", max_cpu=3000000)
+    result = alloc.allocate({"db": 2000000, "web": 3000000, "etl": 3000000})
+
+    assert result["db"]["cpu"] == pytest.approx(2000000)  # critical demand met in full
+    assert result["web"]["cpu"] == pytest.approx(1990000)  # min plus everything standard could take
+    assert result["etl"]["cpu"] == pytest.approx(10000)  # 1000us per 100ms period: the kernel minimum
+    assert sum(a["cpu"] for a in result.values()) == pytest.approx(4000000)
+    assert result["db"]["weight"] > result["web"]["weight"] > result["etl"]["weight"]
+    assert all(a["contended"] for a in result.values())
+
+    controller = CgroupController(dry_run=True, quiet=True)
+    alloc.apply(controller, result)
+    assert controller.last_value("etl", "cpu.max") == "1000 100000"
+
+
+def test_idle_node_spreads_slack_up_to_max():
+    alloc = CpuAllocator(capacity=4000000, headroom=1.0)
+    alloc.configure("a", max_cpu=1000000)
+    result = alloc.allocate({"a": 100000, "b": 100000})
+    assert result["a"]["cpu"] == pytest.approx(1000000)
+    assert result["b"]["cpu"] == pytest.approx(3000000)
+
+
+def test_run_iteration_writes_cpu_max_and_weight_for_the_whole_node(tmp_path):
+    fs = FakeCgroupFS(tmp_path, containers=3)
+    controller = CgroupController(dry_run=False, root=fs.root)
+    allocator = CpuAllocator(capacity=2000000)
+    allocator.configure(fs.paths[0], priority="critical")
+    args = dict(monitor=CgroupMonitor(root=fs.root), controller=controller,
+                predictors={p: MovingAveragePredictor() for p in fs.paths}, histories={p: [] for p in fs.paths},
+                scanner=ReplayScanner(), governance=GovernanceEngine(controller), reporter=None, allocator=allocator)
+    for i in range(3):
+        fs.tick(1)
+        run_iteration(fs.paths, iteration_count=i, **args)
+
+    quotas = [int(fs.read(p, "cpu.max").split()[0]) for p in fs.paths]
+    assert sum(quotas) <= 200000 + len(quotas)  # 2 cores worth of 100ms periods
+    assert fs.read(fs.paths[0], "cpu.weight") == "1000"
@@ -0,0 +1,20 @@
+from scripts.benchmark import bench_update_stats, compare, run
+from src import dashboard_app
+
+
+def test_benchmarks_run_on_fake_cgroupfs_and_flag_regressions(tmp_path):
+    report = run(sizes=[3], workdir=str(tmp_path))
+    assert set(report["results"]) == {"monitor_sample", "run_iteration", "controller_write", "update_stats",
+                                         "policy_eval"}
+    r = report["results"]["run_iteration"]["3"]
+    assert r["p50_us"] <= r["p95_us"] <= r["p99_us"]
+    assert compare(report, report) == []
+
+    faster = {"results": {"run_iteration": {"3": dict(r, p50_us=r["p50_us"] / 10)}}}
+    assert compare(report, faster)
+
+
+def test_update_stats_bench_leaves_the_dashboard_state_alone():
+    state = dashboard_app.STATE
+    bench_update_stats(3, 2)
+    assert dashboard_app.STATE is state
@@ -0,0 +1,76 @@
+from unittest.mock import MagicMock
+
+from src.events import QUARANTINE, RELEASE, EventEmitter, EventLog
+from src.governance import GovernanceEngine
+from src.state_backend import DashboardState
+
+
+def test_cursor_reads_filters_and_wraparound():
+    log = EventLog(capacity=100)
+    for i in range(250):
+        log.append({"type": "cpu_max" if i % 2 else "quarantine", "node_id": f"n{i % 3}", "message": str(i)})
+
+    page = log.read(after=0, limit=10)
+    assert [e["seq"] for e in page["events"]] == list(range(151, 161))
+    assert page["next_after"] == 160
+
+    page = log.read(after=140)
+    assert page["missed"] == 10 and page["events"][0]["seq"] == 151
+
+    page = log.read(after=240, types=["quarantine"], node="n0")
+    assert all(e["type"] == "quarantine" and e["node_id"] == "n0" for e in page["events"])
+    assert page["next_after"] == 250
+    assert log.read(after=250)["events"] == []
+    assert [e["seq"] for e in log.latest(3)] == [250, 249, 248]
+
+
+def test_agent_sequence_numbers_are_deduplicated():
+    state = DashboardState()
+    batch = [{"agent_seq": s, "type": QUARANTINE, "message": f"q{s}"} for s in (1, 2, 3)]
+    assert state.append_events("node-a", batch) == 3
+    assert state.append_events("node-a", batch[1:]) == 0  # retried batch
+    assert state.append_events("node-b", batch) == 3
+    events = state.read_events(after=0, node="node-a")["events"]
+    assert [e["message"] for e in events] == ["q1", "q2", "q3"]
+
+
+
+def test_restarted_agent_is_not_mistaken_for_a_retry():
+    state = DashboardState()
+    session = MagicMock()
+
+    def post(url, json, timeout):
+        state.append_events(json["node_id"], json["events"])
+        return MagicMock()
+
+    session.post.side_effect = post
+    first = EventEmitter("http://dash/api/events", node_id="n1", session=session)
+    for i in range(1000):  # a burst: far more events than milliseconds elapsed
+        first.emit("cpu_max", f"run1-{i}")
+    assert first.flush() == 1000
+
+    second = EventEmitter("http://dash/api/events", node_id="n1", session=session)
+    second.emit("cpu_max", "run2")
+    second.flush()
+    assert len(state.events) == 1001
+    assert state.events.latest(1)[0]["message"] == "run2"
+
+def test_emitter_batches_and_retries_until_delivered():
+    session = MagicMock()
+    session.post.side_effect = [ConnectionError("down"), MagicMock(), MagicMock(), MagicMock()]
+    emitter = EventEmitter("http://dash/api/events", node_id="n1", batch_size=2, session=session)
+    for i in range(3):
+        emitter.emit("cpu_max", f"m{i}")
+
+    assert emitter.flush() == 0  # dashboard down: nothing lost
+    assert emitter.flush() == 3
+    sizes = [len(call.kwargs["json"]["events"]) for call in session.post.call_args_list[1:]]
+    assert sizes == [2, 1]
+
+
+def test_governance_emits_quarantine_and_release():
+    events = MagicMock()
+    gov = GovernanceEngine(MagicMock(), events=events)
+    gov.evaluate("c1", cpu_usage=600000, security_score=40, risks=["Privileged"])
+    gov.evaluate("c1", cpu_usage=600000, security_score=80, risks=[])
+    assert [c.args[0] for c in events.emit.call_args_list] == [QUARANTINE, RELEASE]
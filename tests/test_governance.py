@@ -28,3 +28,12 @@ def test_governance_quarantine():
     assert action is True
     # Should set limit to None (unlimited)
     controller.set_cpu_max.assert_called_with("container3", None)
+
+
+def test_quarantine_is_held_until_released():
+    controller = MagicMock()
+    gov = GovernanceEngine(controller)
+    gov.evaluate("c", cpu_usage=600000, security_score=40, risks=[])
+    # Load dropped but the container is still insecure: scaling must not take over the limit
+    assert gov.evaluate("c", cpu_usage=1000, security_score=40, risks=[]) is True
+    assert controller.set_cpu_max.call_count == 1
@@ -0,0 +1,40 @@
+from unittest.mock import MagicMock
+
+from src.controller import CgroupController
+from src.fakefs import FakeCgroupFS
+from src.io_policy import MIB, IoPolicy
+from src.monitor import CgroupMonitor
+
+
+def test_hog_is_capped_on_its_device_and_released(tmp_path):
+    fs = FakeCgroupFS(tmp_path, containers=1)
+    path = fs.paths[0]
+    monitor = CgroupMonitor(root=fs.root)
+    events = MagicMock()
+    policy = IoPolicy(CgroupController(dry_run=False, root=fs.root), events=events, sustain=2, release_after=2)
+
+    def tick(t, nvme_mib_per_s):
+        c = fs.counters[path]
+        fs.update(path, {"259:0 wbytes": c["259:0 wbytes"] + nvme_mib_per_s * MIB, "8:0 rbytes": c["8:0 rbytes"] + MIB})
+        sample = monitor.sample(path)
+        sample["timestamp"] = float(t)
+        return policy.evaluate(path, sample)
+
+    tick(0, 0)
+    assert tick(1, 300)["259:0"]["wbps"] == 300 * MIB
+    decision = tick(2, 300)
+    assert decision["259:0"]["limits"]["wbps"] == 50 * MIB and decision["259:0"]["limits"]["riops"] is None
+    assert decision["8:0"]["limits"] is None  # the quiet device is left alone
+    assert fs.read(path, "io.max") == f"259:0 rbps={50 * MIB} wbps={50 * MIB} riops=max wiops=max"
+
+    tick(3, 1)
+    assert tick(4, 1)["259:0"]["limits"] is None
+    assert fs.read(path, "io.max") == "259:0 rbps=max wbps=max riops=max wiops=max"
+    assert [c.kwargs["level"] for c in events.emit.call_args_list] == ["WARNING", "SUCCESS"]
+
+
+def test_set_io_max_none_lifts_limit():
+    ctl = CgroupController(dry_run=True, quiet=True)
+    ctl.set_io_max("c", 50, device="259:0")
+    assert ctl.set_io_max("c", None, device="259:0")
+    assert ctl.last_value("c", "io.max") == "259:0 rbps=max wbps=max riops=max wiops=max"
@@ -0,0 +1,69 @@
+import threading
+import time
+
+from src.jobs import JobManager
+
+
+def _wait(job, timeout=5.0):
+    deadline = time.time() + timeout
+    while job.status in ("queued", "running") and time.time() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def test_jobs_run_in_background_with_limits_and_cache():
+    release = threading.Event()
+    calls = []
+
+    def slow(params, progress):
+        calls.append(params["n"])
+        progress(0.5)
+        release.wait(5)
+        return params["n"] * 2
+
+    jobs = JobManager(max_workers=4)
+    jobs.register("slow", slow, limit=1, cache_ttl=60)
+
+    first = jobs.submit("slow", {"n": 1})
+    second = jobs.submit("slow", {"n": 2})
+    assert jobs.submit("slow", {"n": 1}) is first  # de-duplicated while in flight
+    time.sleep(0.05)
+    assert first.status == "running" and first.progress == 0.5
+    assert second.status == "queued"  # concurrency limit of 1
+
+    release.set()
+    assert _wait(first).result == 2
+    assert _wait(second).result == 4
+    assert jobs.submit("slow", {"n": 1}) is first  # cached result
+    assert calls == [1, 2]
+    jobs.shutdown()
+
+
+def test_failed_job_reports_error():
+    def boom(params, progress):
+        raise ValueError("nope")
+
+    jobs = JobManager(max_workers=1)
+    jobs.register("boom", boom)
+    job = _wait(jobs.submit("boom"))
+    assert job.status == "failed" and job.error == "nope"
+    jobs.shutdown()
+
+
+def test_evaluation_params_are_validated_before_queueing(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import src.dashboard_app as dashboard_app
+    from src.state_backend import LocalStateBackend
+
+    params = dashboard_app._evaluation_params({"duration": 10 ** 9})
+    assert params["duration"] == dashboard_app.MAX_EVALUATION_DURATION
+
+    state = LocalStateBackend(dashboard_app.create_state)
+    monkeypatch.setattr(dashboard_app, "STATE", state)
+    client = TestClient(dashboard_app.app)
+    for bad in ({"duraton": 60}, {"duration": "long"}, {"modes": ["turbo"]}):
+        r = client.post("/api/jobs/evaluation", json=bad)
+        assert r.status_code == 400, bad
+    assert state.list_jobs() == []
+    state.close()
@@ -0,0 +1,43 @@
+from src.lifecycle import StateLifecycle
+
+
+def _ingest(state, life, node, cid, now):
+    node_state = state["nodes"].setdefault(node, {"containers": {}, "last_seen": 0})
+    node_state["containers"][cid] = {"id": cid}
+    node_state["last_seen"] = now
+    life.touch(node, cid, now)
+
+
+def test_stale_then_evicted_and_node_down():
+    state = {"nodes": {}, "security_scores": {"a": {"score": 90}}}
+    evicted = []
+    life = StateLifecycle(state, stale_after=10, evict_after=100, node_down_after=20,
+                          on_evict=lambda n, c: evicted.append((n, c)))
+    _ingest(state, life, "n1", "a", now=0)
+    _ingest(state, life, "n1", "b", now=50)
+
+    life.sweep(now=55)
+    assert state["nodes"]["n1"]["containers"]["a"]["status"] == "stale"
+    assert "status" not in state["nodes"]["n1"]["containers"]["b"]
+
+    life.sweep(now=120)
+    assert "a" not in state["nodes"]["n1"]["containers"]
+    assert "a" not in state["security_scores"]
+    assert state["nodes"]["n1"]["status"] == "down"
+    assert evicted == [("n1", "a")]
+
+    life.sweep(now=200)
+    assert "n1" not in state["nodes"]
+    assert life.stats()["evicted_ttl"] == 2
+    assert life.stats()["nodes_removed"] == 1
+
+
+def test_lru_cap():
+    state = {"nodes": {}, "security_scores": {}}
+    life = StateLifecycle(state, max_containers=2)
+    _ingest(state, life, "n", "a", now=1)
+    _ingest(state, life, "n", "b", now=2)
+    _ingest(state, life, "n", "a", now=3)
+    _ingest(state, life, "n", "c", now=4)
+    assert sorted(state["nodes"]["n"]["containers"]) == ["a", "c"]
+    assert life.stats()["evicted_lru"] == 1
@@ -0,0 +1,70 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+import src.dashboard_app as dashboard_app
+from src.loadgen import BASE_CPU, BASE_MEM, LoadGenerator, make_sample, shape_cpu
+from src.state_backend import DashboardState, LocalStateBackend
+
+
+@pytest.fixture
+def client(monkeypatch):
+    state = LocalStateBackend(DashboardState)
+    monkeypatch.setattr(dashboard_app, "STATE", state)
+    monkeypatch.setattr(dashboard_app, "sim_engine", dashboard_app.SimulationEngine())
+    return TestClient(dashboard_app.app)
+
+
+def test_shapes_and_samples():
+    rng = random.Random(1)
+    steady = [shape_cpu("steady", t, rng) for t in range(100)]
+    assert all(BASE_CPU - 10000 <= c <= BASE_CPU + 20000 for c in steady)
+    assert shape_cpu("attack", 0, rng) < 200000 < 1400000 < shape_cpu("attack", 120, rng)
+    # a diurnal "day" peaks at 4x the baseline and bottoms out at 1x
+    assert shape_cpu("diurnal", 150, rng) > 3.5 * BASE_CPU > 1.5 * BASE_CPU > shape_cpu("diurnal", 450, rng)
+    assert max(shape_cpu("bursty", t, rng) for t in range(200)) > 4 * BASE_CPU
+
+    sample = make_sample("n1", "c-0001", "steady", 0, random.Random(2))
+    assert sample["node_id"] == "n1" and sample["id"] == "c-0001"
+    assert sample["memory_bytes"] == BASE_MEM + sample["cpu_usage"] * 64
+    assert sample["prediction"] == int(sample["cpu_usage"] * 1.1)
+    assert make_sample("n1", "c-0001", "steady", 0, random.Random(2)) == sample  # seeded: reproducible
+
+
+def test_update_stats_batched_single_and_empty(client):
+    batch = {"node_id": "n1", "containers": [{"id": "a", "cpu_usage": 1}, {"id": "b", "cpu_usage": 2}]}
+    assert client.post("/api/update_stats", json=batch).json() == {"status": "ok"}
+    client.post("/api/update_stats", json={"node_id": "n2", "id": "c", "cpu_usage": 3})
+    client.post("/api/update_stats", json={"id": "d", "cpu_usage": 4})  # no node: "local"
+    client.post("/api/update_stats", json={"node_id": "n3", "containers": []})
+
+    nodes = client.get("/api/stats").json()
+    assert sorted(nodes["n1"]["containers"]) == ["a", "b"]
+    assert nodes["n2"]["containers"]["c"]["cpu_usage"] == 3
+    assert "d" in nodes["local"]["containers"]
+    assert nodes["n3"]["containers"] == {}  # the node checked in with nothing running
+    assert client.get("/api/system").json()["containers"] == 4
+
+
+def test_simulation_configure_validation(client):
+    r = client.post("/api/simulation/configure", params={"nodes": 0, "containers": -5, "rate": 0})
+    assert r.json()["nodes"] == 1 and r.json()["containers"] == 0 and r.json()["rate"] == 0.1
+    assert client.post("/api/simulation/configure", params={"nodes": "many"}).status_code == 422
+
+    client.post("/api/simulation/configure", params={"nodes": 2, "containers": 3, "rate": 5})
+    dashboard_app.sim_engine._generate_fleet(0)
+    system = client.get("/api/system").json()
+    assert system["nodes"] == 2 and system["containers"] == 6
+
+
+def test_load_generator_runs_in_process(client):
+    report = LoadGenerator(url="http://testserver", nodes=2, containers=3, rate=2, duration=1, processes=2,
+                           session=client).run()
+    assert report["errors"] == 0 and report["processes"] == 2
+    assert report["samples"] == 2 * 3 * 2  # nodes x containers x ticks
+    assert report["requests_per_sec"] > 0 and report["latency_ms"]["p50"] is not None
+    assert report["server_rss_bytes"]["before"] is not None
+    nodes = client.get("/api/stats").json()
+    assert sorted(nodes) == ["sim-node-01", "sim-node-02"]
+    assert all(len(n["containers"]) == 3 for n in nodes.values())
@@ -0,0 +1,67 @@
+from unittest.mock import MagicMock
+
+from src.controller import CgroupController
+from src.events import MEMORY_HIGH, MEMORY_MAX, OOM
+from src.fakefs import FakeCgroupFS
+from src.memory_policy import MIB, MemoryPolicy
+from src.monitor import CgroupMonitor
+
+
+def _setup(tmp_path, **kwargs):
+    fs = FakeCgroupFS(tmp_path, containers=1)
+    path = fs.paths[0]
+    events = MagicMock()
+    policy = MemoryPolicy(CgroupController(dry_run=False, root=fs.root), CgroupMonitor(root=fs.root),
+                          events=events, **kwargs)
+    return fs, path, policy, events
+
+
+def test_growth_sets_high_ahead_of_demand_and_raises_max(tmp_path):
+    fs, path, policy, events = _setup(tmp_path)
+    fs.write(path, "memory.max", "600000000\n")
+    for i in range(10):
+        fs.update(path, {"memory": (200 + 30 * i) * MIB})
+        decision = policy.evaluate(path, (200 + 30 * i) * MIB)
+
+    assert decision["forecast"] > 470 * MIB  # trend extrapolated, not just the last sample
+    assert int(fs.read(path, "memory.high")) >= decision["forecast"]
+    assert int(fs.read(path, "memory.max")) > 600000000
+    types = {c.args[0] for c in events.emit.call_args_list}
+    assert {MEMORY_HIGH, MEMORY_MAX} <= types
+
+
+def test_oom_kill_grows_max_and_is_reported(tmp_path):
+    fs, path, policy, events = _setup(tmp_path)
+    fs.write(path, "memory.max", f"{256 * MIB}\n")
+    fs.update(path, {"memory": 200 * MIB})
+    policy.evaluate(path, 200 * MIB)
+    fs.update(path, {"events oom_kill": 1, "events max": 5})
+    decision = policy.evaluate(path, 200 * MIB)
+
+    assert decision["events"]["oom_kill"] == 1 and policy.totals[path]["max"] == 5
+    assert int(fs.read(path, "memory.max")) >= 384 * MIB
+    assert OOM in [c.args[0] for c in events.emit.call_args_list]
+
+
+def test_idle_container_gives_back_page_cache(tmp_path):
+    fs, path, policy, _ = _setup(tmp_path, idle_ticks=3)
+    fs.update(path, {"memory": 500 * MIB})
+    for _ in range(8):
+        decision = policy.evaluate(path, 500 * MIB)
+    # Working set is anon (70%) + active_file (10%) of memory.current in the fake tree
+    assert decision["idle"]
+    assert decision["high"] < 500 * MIB
+    assert decision["high"] >= 400 * MIB
+
+
+def test_high_waits_for_a_trend_and_is_released(tmp_path):
+    fs, path, policy, _ = _setup(tmp_path, min_samples=4)
+    for i in range(3):
+        fs.update(path, {"memory": (100 + 50 * i) * MIB})
+        assert policy.evaluate(path, (100 + 50 * i) * MIB)["high"] is None
+    assert fs.read(path, "memory.high").strip() == "max"
+    policy.evaluate(path, 250 * MIB)
+    assert int(fs.read(path, "memory.high")) >= 250 * MIB
+
+    policy.release()
+    assert fs.read(path, "memory.high").strip() == "max"
@@ -7,3 +7,19 @@ def test_read_nonexistent_cgroup():
     # Should return None rather than raising
     assert mon.read_cpu_stat('this-path-does-not-exist') is None
     assert mon.read_memory_current('this-path-does-not-exist') is None
+
+
+def test_monitor_and_controller_use_configured_root(tmp_path):
+    from src.controller import CgroupController
+    from src.fakefs import FakeCgroupFS
+
+    fs = FakeCgroupFS(tmp_path, containers=2)
+    fs.tick(2)
+    path = fs.paths[0]
+    sample = CgroupMonitor(root=fs.root).sample(path)
+    assert sample['cpu_stat']['usage_usec'] == fs.counters[path]['usage_usec'] > 0
+    assert sample['memory_bytes'] == fs.counters[path]['memory']
+    assert sample['io_read_bytes'] > 0
+
+    assert CgroupController(dry_run=False, root=fs.root).set_cpu_max(path, 50000)
+    assert fs.read(path, 'cpu.max') == '50000 100000'
@@ -0,0 +1,54 @@
+import json
+
+import numpy as np
+
+from src.agent import cpu_quota_for
+from src.evaluation import EvaluationSuite
+from src.montecarlo import demand_matrix, evaluate_dynamic, evaluate_static, run_batch, write_json
+
+
+def _reference(demand, headroom, threshold):
+    """One seed through the agent policy with plain Python, as PolicySimulation steps it."""
+    limit, history = None, []
+    used_total = alloc_total = throttled = 0
+    for d in demand:
+        used = d if limit is None else min(d, limit)
+        used_total += used
+        alloc_total += used if limit is None else limit
+        throttled += used < d
+        history.append(used)
+        window = history[-5:]
+        quota = cpu_quota_for(sum(window) / len(window), threshold, headroom)
+        limit = None if quota is None else max(1, quota)
+    return used_total / alloc_total * 100, throttled
+
+
+def test_vectorized_dynamic_policy_matches_reference_loop():
+    demand = demand_matrix("bursty", [1, 2, 3], 400)
+    results = evaluate_dynamic(demand, headrooms=[1.2, 1.5], thresholds=[0, 200000])
+    for (h, th), metrics in zip([(1.2, 0), (1.5, 200000)], results):
+        for row in range(3):
+            eff, throttled = _reference(demand[row], h, th)
+            assert np.isclose(metrics["Efficiency_Percent"][row], eff)
+            assert metrics["Throttled_Events"][row] == throttled
+
+
+def test_static_limit_metrics():
+    demand = np.array([[100000.0, 300000.0, 50000.0]])
+    m = evaluate_static(demand, 200000)
+    assert m["Throttled_Events"][0] == 1 and m["Waste"][0] == 600000 - 350000
+
+
+def test_batch_is_deterministic_across_workers_and_exports(tmp_path):
+    kwargs = dict(seeds=40, duration=120, headrooms=[1.2], thresholds=[0], block_size=10)
+    serial = run_batch(["Web Server Load", "attack"], workers=1, **kwargs)
+    parallel = run_batch(["Web Server Load", "attack"], workers=2, **kwargs)
+    assert serial == parallel
+    assert len(serial) == 4
+    row = serial[1]
+    assert row["Mode"] == "dynamic"
+    assert row["Efficiency_Percent_CI95_Low"] <= row["Efficiency_Percent_Mean"] <= row["Efficiency_Percent_CI95_High"]
+
+    write_json(serial, tmp_path / "mc.json")
+    assert json.loads((tmp_path / "mc.json").read_text())[0]["Scenario"] == "Web Server Load"
+    assert EvaluationSuite(None).run_batch(["steady"], seeds=5, duration_sec=30, workers=1)[0]["Seeds"] == 5
@@ -0,0 +1,131 @@
+import subprocess
+
+from src.controller import CgroupController
+from src.fakefs import FakeCgroupFS, FakeNetwork
+from src.monitor import CgroupMonitor
+from src.network import NetworkMonitor, NetworkPolicy, read_net_dev
+
+MIB = 1024 * 1024
+
+
+def setup(tmp_path, containers=2):
+    fs = FakeCgroupFS(tmp_path / "cgroup", containers=containers)
+    net = FakeNetwork(tmp_path)
+    veths = [net.attach(fs, p) for p in fs.paths]
+    monitor = CgroupMonitor(root=fs.root, network=NetworkMonitor(fs.root, proc=net.proc, sysfs=net.sysfs, max_age=0))
+    return fs, net, veths, monitor
+
+
+def test_veth_discovery_and_container_side_counters(tmp_path):
+    fs, net, veths, monitor = setup(tmp_path)
+    fs.add("system.slice/hostnet.scope")  # no processes of its own: no veth
+    net.traffic(veths[0], rx_bytes=5000, tx_bytes=700, rx_packets=5, tx_packets=2)
+
+    assert set(read_net_dev(f"{net.proc}/net/dev")) == {"eth0", *veths}
+    sample = monitor.sample(fs.paths[0])
+    assert sample["net_rx_bytes"] == 5000
+    assert sample["net"] == {"interface": veths[0], "rx_bytes": 5000, "tx_bytes": 700, "rx_packets": 5,
+                             "tx_packets": 2}
+    assert monitor.sample(fs.paths[1])["net"]["interface"] == veths[1]
+    hostnet = monitor.sample("system.slice/hostnet.scope")
+    assert hostnet["net"] is None and hostnet["net_rx_bytes"] == 0
+
+
+def test_policy_caps_hog_in_one_dry_run_batch_and_releases(tmp_path):
+    fs, net, veths, monitor = setup(tmp_path, containers=3)
+    controller = CgroupController(dry_run=True, quiet=True, root=fs.root)
+    policy = NetworkPolicy(controller, hog_bps=10 * MIB, cap_kbps=8000, sustain=2, release_after=2)
+
+    batches = []
+    for t in range(4):
+        for veth in veths[:2]:
+            net.traffic(veth, rx_bytes=50 * MIB)  # per tick, sampled at ~1s
+        for p in fs.paths:
+            sample = monitor.sample(p)
+            sample["timestamp"] = float(t)
+            policy.evaluate(p, sample)
+        batches.append(policy.flush())
+    assert batches[0] == batches[1] == []
+    assert sorted(batches[2]) == [f"qdisc replace dev {v} root tbf rate 8000kbit burst 32kbit latency 400ms"
+                                  for v in sorted(veths[:2])]
+    assert batches[3] == []  # already shaped
+    assert controller.network_limits == {veths[0]: 8000, veths[1]: 8000}
+
+    for t in range(4, 6):
+        for p in fs.paths:
+            sample = monitor.sample(p)
+            sample["timestamp"] = float(t)
+            policy.evaluate(p, sample)
+        batches.append(policy.flush())
+    assert sorted(batches[-1]) == [f"qdisc del dev {v} root" for v in sorted(veths[:2])]
+    assert controller.network_limits == {}
+
+
+def test_flush_runs_tc_once_per_tick(monkeypatch):
+    calls = []
+
+    def fake_run(cmd, input=None, **kwargs):
+        calls.append((cmd, input))
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+    controller = CgroupController(dry_run=False, quiet=True)
+    controller.set_network_limit("veth1", 1000)
+    controller.set_network_limit("veth2", 2000)
+    controller.set_network_limit("veth3", None)  # never limited: nothing to remove
+    controller.flush_network()
+    assert calls == [(["tc", "-force", "-batch", "-"],
+                      "qdisc replace dev veth1 root tbf rate 1000kbit burst 32kbit latency 400ms\n"
+                      "qdisc replace dev veth2 root tbf rate 2000kbit burst 32kbit latency 400ms\n")]
+    controller.set_network_limit("veth1", 1000)
+    assert controller.flush_network() == [] and len(calls) == 1
+
+
+def test_failed_tc_batch_is_retried_and_policy_stays_in_sync(tmp_path, monkeypatch):
+    fs, net, veths, monitor = setup(tmp_path, containers=1)
+    tc_ok = []
+
+    def fake_run(cmd, input=None, **kwargs):
+        return subprocess.CompletedProcess(cmd, 0 if tc_ok[-1] else 2, "", "RTNETLINK answers: busy")
+
+    monkeypatch.setattr(subprocess, "run", fake_run)
+    controller = CgroupController(dry_run=False, quiet=True, root=fs.root)
+    policy = NetworkPolicy(controller, hog_bps=10 * MIB, cap_kbps=8000, sustain=1, release_after=1)
+
+    def tick(t, rx, ok):
+        net.traffic(veths[0], rx_bytes=rx)
+        sample = monitor.sample(fs.paths[0])
+        sample["timestamp"] = float(t)
+        tc_ok.append(ok)
+        policy.evaluate(fs.paths[0], sample)
+        return policy.flush()
+
+    tick(0, 0, True)
+    batch = tick(1, 50 * MIB, False)  # the cap is not applied
+    assert len(batch) == 1 and controller.network_limits == {}
+    assert policy.state[fs.paths[0]]["limit"] is None
+    batch = tick(2, 50 * MIB, True)  # so it is issued again
+    assert len(batch) == 1 and controller.network_limits == {veths[0]: 8000}
+
+    batch = tick(3, 0, False)  # the release fails: still capped on both sides
+    assert batch == [f"qdisc del dev {veths[0]} root"]
+    assert controller.network_limits == {veths[0]: 8000} and policy.state[fs.paths[0]]["limit"] == 8000
+    batch = tick(4, 0, True)
+    assert batch == [f"qdisc del dev {veths[0]} root"] and controller.network_limits == {}
+
+
+def test_only_the_failed_lines_of_a_tc_batch_are_rolled_back(monkeypatch):
+    stderr = ("RTNETLINK answers: No such device\nCommand failed -:2\n"
+              "Error: Cannot delete qdisc with handle of zero.\nCommand failed -:3\n")
+    monkeypatch.setattr(subprocess, "run", lambda cmd, **kw: subprocess.CompletedProcess(cmd, 1, "", stderr))
+    controller = CgroupController(dry_run=False, quiet=True)
+    controller.network_limits.update({"veth3": 500, "veth4": 700})
+    controller.set_network_limit("veth1", 1000)
+    controller.set_network_limit("veth2", 2000)  # line 2 fails
+    controller.set_network_limit("veth3", None)  # already gone: released anyway
+    controller.set_network_limit("veth4", None)
+    assert len(controller.flush_network()) == 4
+    assert controller.network_limits == {"veth1": 1000}
+
+    controller.set_network_limit("veth2", 2000)  # queued again; the others are settled
+    assert controller.flush_network() == ["qdisc replace dev veth2 root tbf rate 2000kbit burst 32kbit latency 400ms"]
@@ -0,0 +1,74 @@
+import os
+
+from src.controller import CgroupController
+from src.fakefs import FakeCgroupFS, FakeSysfs
+from src.placement import PlacementPlanner, Topology, format_cpulist, parse_cpulist
+
+
+def feed(planner, loads, ticks, start=0):
+    """Feed `ticks` one-second samples per container at the given load (cores)."""
+    for t in range(start, start + ticks + 1):
+        for path, cores in loads.items():
+            planner.observe(path, {"cpu_stat": {"usage_usec": int(cores * t * 1e6)}, "timestamp": float(t)})
+    return start + ticks
+
+
+def test_topology_from_fake_sysfs(tmp_path):
+    FakeSysfs(tmp_path, sockets=2, cores_per_socket=4, threads_per_core=2)
+    topo = Topology.from_sysfs(str(tmp_path))
+    assert sorted(topo.nodes) == [0, 1]
+    assert topo.nodes[0] == [(0, 8), (1, 9), (2, 10), (3, 11)]
+    assert topo.node_of[(5, 13)] == 1
+    assert parse_cpulist("0-3,8,10-11") == [0, 1, 2, 3, 8, 10, 11]
+    assert format_cpulist([11, 0, 1, 2, 3, 8, 10]) == "0-3,8,10-11"
+
+
+def test_hot_container_isolated_on_one_node_after_damping(tmp_path):
+    FakeSysfs(tmp_path)
+    planner = PlacementPlanner(Topology.from_sysfs(str(tmp_path)), hot_ticks=3)
+    loads = {"hot": 3.0, "web": 0.5, "idle": 0.0}
+
+    t = feed(planner, loads, 2)
+    assert planner.plan()["hot"]["class"] == "shared"  # two hot ticks are not enough
+
+    feed(planner, loads, 1, start=t)
+    plan = planner.plan()
+    hot = plan["hot"]
+    assert hot["class"] == "isolated"
+    cpus = parse_cpulist(hot["cpus"])
+    assert len(cpus) == 4  # 3 cores * 1.25 headroom over 2 threads -> 2 whole cores
+    assert hot["mems"] in ("0", "1")
+    node_cpus = {n: {c for core in cores for c in core} for n, cores in planner.topology.nodes.items()}
+    assert set(cpus) <= node_cpus[int(hot["mems"])]
+    assert not set(cpus) & set(parse_cpulist(plan["web"]["cpus"]))
+
+    idle = plan["idle"]
+    assert idle["class"] == "idle"
+    assert len(parse_cpulist(idle["cpus"])) == 2  # one shared core packs every idle container
+    assert not set(parse_cpulist(idle["cpus"])) & set(cpus)
+
+    # Stable load keeps the same cores
+    feed(planner, loads, 3, start=t + 1)
+    assert planner.plan()["hot"]["cpus"] == hot["cpus"]
+
+
+def test_rebalance_writes_cpusets_and_dry_run_does_not(tmp_path):
+    sysfs = tmp_path / "sys"
+    FakeSysfs(sysfs)
+    fs = FakeCgroupFS(tmp_path / "cgroup", containers=2)
+    path = fs.paths[0]
+    target = os.path.join(fs.root, path, "cpuset.cpus")
+
+    dry = PlacementPlanner(Topology.from_sysfs(str(sysfs)), hot_ticks=1)
+    feed(dry, {path: 2.0}, 2)
+    changes = dry.rebalance(CgroupController(dry_run=True, quiet=True, root=fs.root))
+    assert changes[path]["class"] == "isolated"
+    assert not os.path.exists(target)
+
+    planner = PlacementPlanner(Topology.from_sysfs(str(sysfs)), hot_ticks=1)
+    feed(planner, {path: 2.0}, 2)
+    controller = CgroupController(dry_run=False, quiet=True, root=fs.root)
+    assert planner.rebalance(controller) == changes
+    with open(target) as f:
+        assert f.read() == changes[path]["cpus"]
+    assert planner.rebalance(controller) == {}  # unchanged plan writes nothing
@@ -0,0 +1,97 @@
+import json
+import os
+import shutil
+
+from src.agent import run_iteration
+from src.controller import CgroupController
+from src.fakefs import FakeCgroupFS
+from src.governance import GovernanceEngine
+from src.monitor import CgroupMonitor
+from src.policy import PolicyEngine
+from src.predictor import MovingAveragePredictor
+from src.trace import ReplayScanner
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), "..", "examples", "policies.json")
+
+
+def test_example_policy_matches_builtin_governance(tmp_path):
+    engine = PolicyEngine(EXAMPLE)
+    paths = ["risky-hot", "risky-idle", "healed", "still-bad", "fine"]
+    rules = engine.evaluate(paths, {
+        "pred_cpu": [600000, 10000, 600000, 100000, 3000000],
+        "security_score": [40, 40, 80, 40, 100],
+        "quarantined": [False, False, True, True, False],
+    })
+    assert [r.name for r in rules] == ["quarantine-risky-hot", "predictive-scaling", "release-healed",
+                                       "hold-quarantine", "predictive-scaling"]
+    assert rules[0].params == {"quota": 10000}
+    assert engine.hits["predictive-scaling"] == 2
+
+
+def test_labels_and_hot_reload_keep_last_valid_rules(tmp_path):
+    path = tmp_path / "policies.json"
+
+    def write(spec):
+        path.write_text(json.dumps(spec))
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1000))
+
+    write({"labels": {"batch/*": {"tier": "batch"}},
+           "rules": [{"name": "pin-batch", "action": "cpu_max", "params": {"quota": 50000},
+                      "when": {"label": "tier", "op": "==", "value": "batch"}}]})
+    engine = PolicyEngine(str(path))
+    paths = ["batch/a", "web/b"]
+    assert [r and r.name for r in engine.evaluate(paths, {})] == ["pin-batch", None]
+
+    write({"rules": [{"name": "all", "action": "none"}]})
+    assert [r.name for r in engine.evaluate(paths, {})] == ["all", "all"]
+    assert engine.reloads == 2
+
+    path.write_text('{"rules": [{"action": "explode"}]}')
+    assert [r.name for r in engine.evaluate(paths, {})] == ["all", "all"]
+    assert engine.reloads == 2
+
+
+def test_label_ordering_skips_unlabelled_and_bad_rules_keep_previous(tmp_path):
+    path = tmp_path / "policies.json"
+    path.write_text(json.dumps({"labels": {"a*": {"prio": 5}},
+                                "rules": [{"name": "high", "action": "hold",
+                                           "when": {"label": "prio", "op": ">", "value": 3}}]}))
+    engine = PolicyEngine(str(path))
+    assert [r and r.name for r in engine.evaluate(["a1", "b1"], {})] == ["high", None]
+
+    # compiles, but a number column cannot be ordered against a string
+    path.write_text(json.dumps({"rules": [{"name": "bad", "action": "none",
+                                           "when": {"metric": "cpu_usage", "op": ">", "value": "lots"}}]}))
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1000))
+    assert [r and r.name for r in engine.evaluate(["a1", "b1"], {"cpu_usage": [1, 2]})] == ["high", None]
+    assert [r.name for r in engine.rules] == ["high"]
+
+    # if the restored rules fail on these metrics as well, nothing applies and the loop goes on
+    path.write_text(json.dumps({"rules": [{"name": "bad", "action": "none",
+                                           "when": {"metric": "cpu_usage", "op": ">", "value": "lots"}}]}))
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 2000))
+    engine._evaluate = lambda paths, metrics: 1 / 0
+    assert engine.evaluate(["a1", "b1"], {"cpu_usage": [1, 2]}) == [None, None]
+
+
+def test_run_iteration_applies_policy_actions(tmp_path):
+    fs = FakeCgroupFS(tmp_path / "cgroup", containers=2)
+    policy = tmp_path / "policies.json"
+    shutil.copy(EXAMPLE, policy)
+    hot, calm = fs.paths
+    monitor = CgroupMonitor(root=fs.root)
+    controller = CgroupController(dry_run=True, quiet=True, root=fs.root)
+    governance = GovernanceEngine(controller)
+    engine = PolicyEngine(str(policy))
+    predictors = {p: MovingAveragePredictor(window=5) for p in fs.paths}
+    histories = {p: [] for p in fs.paths}
+
+    for i in range(3):
+        # cumulative usage_usec is the agent's "cpu" signal: make one container's climb past 500000
+        fs.update(hot, {"usage_usec": 1000000 * (i + 1)})
+        fs.update(calm, {"usage_usec": 1000 * (i + 1)})
+        run_iteration(fs.paths, monitor, controller, predictors, histories, ReplayScanner(score=40), governance, 0,
+                      reporter=None, policy_engine=engine)
+    assert governance.quarantined_containers == {hot}
+    assert controller.last_value(hot, "cpu.max") == "10000 100000"
+    assert controller.last_value(calm, "cpu.max") == "max"
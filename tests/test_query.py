@@ -0,0 +1,61 @@
+import base64
+import json
+
+import pytest
+
+from src.state_backend import DashboardState
+
+
+def _state():
+    state = DashboardState()
+    for n in range(3):
+        node = f"node-{n}"
+        state.ingest(node, [{"id": f"web-{n}-{i}", "cpu_usage": 100 * n + i, "memory_bytes": i,
+                             "prediction": 0, "quarantined": i == 0} for i in range(10)], now=1000)
+    state.ingest("node-0", [{"id": "db-0", "cpu_usage": 5000, "memory_bytes": 1}], now=1000)
+    return state
+
+
+def _walk(state, **params):
+    ids, cursor = [], None
+    while True:
+        page = state.query_containers(cursor=cursor, **params)
+        ids += [c["id"] for c in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return ids
+
+
+def test_cursor_pages_cover_every_container_once_in_order():
+    state = _state()
+    ids = _walk(state, limit=7)
+    assert ids == sorted(ids) and len(ids) == 31
+
+    by_cpu = _walk(state, sort="-cpu_usage", limit=4)
+    assert by_cpu[0] == "db-0" and len(by_cpu) == 31
+
+
+def test_filters_and_projection():
+    state = _state()
+    assert _walk(state, prefix="web-1", limit=3) == [f"web-1-{i}" for i in range(10)]
+    assert _walk(state, prefix="web-1", sort="-name", limit=3) == [f"web-1-{i}" for i in reversed(range(10))]
+    assert _walk(state, quarantined=True) == ["web-0-0", "web-1-0", "web-2-0"]
+    assert _walk(state, sort="cpu_usage", cpu_gt=205) == ["web-2-6", "web-2-7", "web-2-8", "web-2-9", "db-0"]
+    assert _walk(state, node="node-2", cpu_gt=207, sort="-cpu_usage") == ["web-2-9", "web-2-8"]
+
+    page = state.query_containers(prefix="db", fields=["cpu_usage"])
+    assert page["items"] == [{"id": "db-0", "node_id": "node-0", "cpu_usage": 5000}]
+
+
+def test_bad_sort_or_cursor_is_rejected():
+    state = _state()
+    cursor = state.query_containers(limit=1)["next_cursor"]
+    with pytest.raises(ValueError):
+        state.query_containers(sort="-cpu_usage", cursor=cursor)
+    with pytest.raises(ValueError):
+        state.query_containers(sort="colour")
+    for forged in (["name", ["a"], "n1", "c"], ["cpu_usage", {"x": 1}, "n1", "c"], ["cpu_usage", "9", "n1", "c"],
+                   ["name", "a", ["n1"], "c"], ["cpu_usage", None, "n1", "web1"], ["-cpu_usage", None, "n1", "web1"]):
+        raw = base64.urlsafe_b64encode(json.dumps(forged).encode()).decode()
+        with pytest.raises(ValueError):
+            state.query_containers(sort=forged[0], cursor=raw)
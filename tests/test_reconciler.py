@@ -0,0 +1,69 @@
+from unittest.mock import MagicMock
+
+from src.controller import CgroupController
+from src.fakefs import FakeCgroupFS
+from src.monitor import CgroupMonitor
+from src.reconciler import DesiredState, Reconciler
+
+
+def _setup(tmp_path, controller=None, **kwargs):
+    fs = FakeCgroupFS(tmp_path, containers=2)
+    controller = controller or CgroupController(dry_run=False, root=fs.root)
+    events = MagicMock()
+    return fs, DesiredState(root=fs.root), Reconciler(controller, CgroupMonitor(root=fs.root), events=events,
+                                                      **kwargs), events
+
+
+def test_only_changed_knobs_are_written_and_priority_wins(tmp_path):
+    fs, desired, rec, _ = _setup(tmp_path)
+    a, b = fs.paths
+    policy, governance = desired.owner("policy", 10), desired.owner("governance", 100)
+    governance.set_cpu_max(a, 10000)
+    policy.set_cpu_max(a, 500000)  # loses to the quarantine clamp
+    policy.set_cpu_max(b, None)  # already "max 100000" in the file
+    policy.set_io_max(b, 50, device="259:0")
+
+    report = rec.reconcile(desired)
+    assert (report["applied"], report["skipped"]) == (2, 1)
+    assert fs.read(a, "cpu.max") == "10000 100000"
+    assert fs.read(b, "io.max").startswith("259:0 rbps=52428800")
+
+    assert rec.reconcile(desired)["applied"] == 0  # nothing changed since
+
+
+def test_drift_is_reported_and_corrected(tmp_path):
+    fs, desired, rec, events = _setup(tmp_path)
+    path = fs.paths[0]
+    desired.owner("policy").set_memory_high(path, 256 << 20)
+    rec.reconcile(desired)
+    desired.clear()
+
+    fs.write(path, "memory.high", "max\n")  # someone else lifted the limit
+    report = rec.reconcile(desired)
+    assert report["drift"][0]["observed"] == "max" and report["applied"] == 1
+    assert fs.read(path, "memory.high") == str(256 << 20)
+    assert events.emit.call_args.args[0] == "drift"
+
+
+def test_rate_limit_defers_and_failed_write_rolls_back_cgroup(tmp_path):
+    fs, desired, rec, _ = _setup(tmp_path, burst=1, writes_per_second=0)
+    a, b = fs.paths
+    staged = desired.owner("policy")
+    staged.set_cpu_max(a, 20000)
+    staged.set_cpu_max(b, 30000)
+    report = rec.reconcile(desired)
+    assert (report["applied"], report["deferred"]) == (1, 1)
+
+    class Flaky(CgroupController):
+        def write(self, cgroup_path, filename, value):
+            return filename != "memory.max" and super().write(cgroup_path, filename, value)
+
+    fs, desired, rec, _ = _setup(tmp_path / "flaky", controller=None)
+    rec.controller = Flaky(dry_run=False, root=fs.root)
+    path = fs.paths[0]
+    staged = desired.owner("policy")
+    staged.set_cpu_weight(path, 500)
+    staged.set_memory_max(path, 1 << 30)
+    report = rec.reconcile(desired)
+    assert report["failed"][0]["file"] == "memory.max" and report["rolled_back"] == 1
+    assert fs.read(path, "cpu.weight").strip() == "100"
@@ -0,0 +1,98 @@
+import time
+
+from src.agent import cpu_quota_for, run_iteration
+from src.controller import CgroupController
+from src.evaluation import EvaluationSuite
+from src.fakefs import FakeCgroupFS
+from src.governance import GovernanceEngine
+from src.monitor import CgroupMonitor
+from src.predictor import MovingAveragePredictor, QuantilePredictor, ResidualQuantiles
+from src.simulation import PolicySimulation, SimulatedController, Simulator, sweep
+from src.trace import ReplayScanner
+
+
+def test_simulator_runs_events_in_virtual_time_order():
+    sim = Simulator()
+    seen = []
+    sim.every(2.0, lambda: seen.append(("slow", sim.now)))
+    sim.every(1.0, lambda: seen.append(("fast", sim.now)), priority=1)
+    sim.run(4)
+    assert seen == [("slow", 0), ("fast", 0), ("fast", 1), ("slow", 2), ("fast", 2), ("fast", 3)]
+    assert sim.now == 4
+
+
+def test_simulated_controller_enforces_cpu_max():
+    ctl = SimulatedController()
+    ctl.set_cpu_max("a", 50000)  # 0.5 CPU with the default 100ms period
+    assert ctl.consume("a", 800000) == (500000, True)
+    ctl.set_cpu_max("a", None)
+    assert ctl.consume("a", 800000) == (800000, False)
+    assert ctl.cpu_stat["a"]["throttled_usec"] == 300000
+
+
+def test_hour_long_scenario_runs_without_sleeping():
+    start = time.time()
+    evaluator = EvaluationSuite(None)
+    static = evaluator.run_scenario("Web Server Load", 3600, "static")
+    dynamic = evaluator.run_scenario("Web Server Load", 3600, "dynamic")
+    assert time.time() - start < 5
+    assert dynamic["Efficiency_Percent"] > static["Efficiency_Percent"]
+    assert dynamic["Sim_Events"] > 3600
+
+
+def test_attack_gets_quarantined_by_governance():
+    report = PolicySimulation("attack", 300).run()
+    assert report["Quarantined_Seconds"] > 0
+
+
+def test_sweep_covers_the_grid():
+    reports = sweep("bursty", 300, {"headroom": [1.1, 2.0], "threshold": [0, 200000]})
+    assert [(r["Headroom"], r["Threshold"]) for r in reports] == [(1.1, 0), (1.1, 200000), (2.0, 0), (2.0, 200000)]
+
+
+def test_residual_quantiles_widen_for_bursty_series():
+    steady, bursty = ResidualQuantiles(), ResidualQuantiles()
+    for t in range(100):
+        steady.observe(100.0, 100.0)
+        bursty.observe(300.0 if t % 10 == 0 else 100.0, 100.0)
+    assert steady.quantile(0.99) == 100.0
+    assert bursty.quantile(0.5) == 100.0 and bursty.quantile(0.95) == 300.0
+    assert cpu_quota_for(100.0, 0, upper=bursty.quantile(0.95)) == 300
+    assert cpu_quota_for(100.0, 0) == 120
+
+
+def test_throttle_target_is_calibrated_and_cuts_waste_on_stable_load():
+    baseline = PolicySimulation("steady", 1800, containers=4).run()
+    seconds = 1800 * 4
+    for target in (0.05, 0.2):
+        report = PolicySimulation("steady", 1800, containers=4, throttle_target=target).run()
+        assert report["Throttle_Target"] == target
+        assert report["Throttled_Events"] / seconds < target * 1.5
+        assert report["Waste"] < baseline["Waste"]
+
+
+class SteppedMonitor(CgroupMonitor):
+    """Samples one second apart, whatever the wall clock says."""
+
+    now = 0.0
+
+    def sample(self, cgroup_path):
+        return dict(super().sample(cgroup_path), timestamp=self.now)
+
+
+def test_run_iteration_sizes_quantile_quota_per_period(tmp_path):
+    fs = FakeCgroupFS(tmp_path / "cgroup", containers=1)
+    [path] = fs.paths
+    monitor = SteppedMonitor(root=fs.root)
+    controller = CgroupController(dry_run=True, quiet=True, root=fs.root)
+    predictors = {path: QuantilePredictor(MovingAveragePredictor(window=5))}
+    histories = {path: []}
+    for i in range(15):
+        monitor.now = float(i)
+        # half a CPU, a quarter second of it throttled every second
+        fs.update(path, {"usage_usec": 500000 * i, "throttled_usec": 250000 * i})
+        run_iteration([path], monitor, controller, predictors, histories, ReplayScanner(),
+                      GovernanceEngine(controller), i, reporter=None, threshold=0, throttle_target=0.05)
+    quota, period = controller.last_value(path, "cpu.max").split()
+    assert period == "100000"
+    assert int(quota) == 75000  # 0.5 CPU used + 0.25 CPU unmet, per 100ms period
@@ -0,0 +1,132 @@
+import gzip
+import json
+
+from fastapi.testclient import TestClient
+
+from src.spool import Spool, SpoolingReporter
+from src.state_backend import DashboardState
+
+
+def test_spool_fifo_rotation_cap_and_reopen(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=400, max_bytes=10000)
+    seqs = [spool.append({"i": i}) for i in range(20)]
+    assert seqs == sorted(seqs) and spool.depth == 20
+    assert len(list(tmp_path.glob("seg-*.jsonl"))) > 1
+
+    records, cursor = spool.read(5)
+    assert [r["i"] for r in records] == [0, 1, 2, 3, 4]
+    spool.commit(cursor)
+    assert spool.depth == 15
+    spool.close()
+
+    # acknowledged records stay acknowledged; new seqs continue after the spooled ones
+    spool = Spool(str(tmp_path), segment_bytes=400, max_bytes=10000)
+    assert spool.depth == 15
+    assert spool.append({"i": 20}) > seqs[-1]
+    shipped = []
+    while True:
+        records, cursor = spool.read(4)
+        if not records:
+            break
+        shipped += [r["i"] for r in records]
+        spool.commit(cursor)
+    assert shipped == list(range(5, 21)) and spool.depth == 0
+
+    # over the cap, whole segments go oldest first
+    small = Spool(str(tmp_path / "small"), segment_bytes=400, max_bytes=1200)
+    for i in range(50):
+        small.append({"i": i})
+    assert small.size <= 1200 + 400 and small.dropped > 0
+    assert small.depth == 50 - small.dropped
+    assert small.read(1)[0][0]["i"] == small.dropped
+
+
+class FakeSession:
+    """Posts straight into a DashboardState; fails while `down`."""
+
+    def __init__(self, state):
+        self.state = state
+        self.down = False
+        self.batches = []
+
+    def post(self, url, data, timeout, headers):
+        if self.down:
+            raise ConnectionError("dashboard down")
+        batch = json.loads(gzip.decompress(data))
+        self.batches.append(batch)
+        self.state.ingest_spooled(batch["node_id"], batch["samples"], batch["spool_depth"])
+        return self
+
+    def raise_for_status(self):
+        pass
+
+
+def test_reporter_backfills_after_outage(tmp_path):
+    state = DashboardState()
+    session = FakeSession(state)
+    reporter = SpoolingReporter("http://dashboard/api/ingest_batch", Spool(str(tmp_path)), node_id="n1",
+                                batch_size=3, max_rate=1e6, session=session)
+    session.down = True
+    for i in range(7):
+        reporter(f"c{i % 2}", cpu=i, mem=100, prediction=i, node_id="n1")
+    assert reporter.flush() == 0 and reporter.depth == 7
+
+    session.down = False
+    assert reporter.flush() == 7 and reporter.depth == 0
+    assert [len(b["samples"]) for b in session.batches] == [3, 3, 1]
+    assert [b["spool_depth"] for b in session.batches] == [7, 4, 1]
+    node = state.state["nodes"]["n1"]
+    assert node["containers"]["c0"]["cpu_usage"] == 6 and node["containers"]["c1"]["cpu_usage"] == 5
+    assert "seq" not in node["containers"]["c0"] and "boot" not in node["containers"]["c0"]
+    reporter.close()
+
+
+def test_restart_with_a_wiped_spool_is_not_dropped(tmp_path):
+    state = DashboardState()
+    first = Spool(str(tmp_path / "a"))
+    old = [first.append({"id": "web", "cpu_usage": i, "ts": 1000.0 + i}) for i in range(5)]
+    old_batch, _ = first.read(10)
+    assert state.ingest_spooled("n1", old_batch) == 5
+
+    # the agent comes back with an empty spool (and its clock behind): seqs start over under a new boot
+    second = Spool(str(tmp_path / "b"))
+    assert second.boot_id != first.boot_id
+    new = [second.append({"id": "web", "cpu_usage": 100 + i, "ts": 900.0 + i}) for i in range(3)]
+    assert max(new) < max(old)
+    new_batch, _ = second.read(10)
+    assert state.ingest_spooled("n1", new_batch) == 3
+
+    # a retried batch spanning both boots stores nothing twice
+    assert state.ingest_spooled("n1", old_batch[3:] + new_batch) == 0
+
+
+def test_ingest_batch_endpoint_is_idempotent(monkeypatch):
+    import src.dashboard_app as dashboard_app
+    state = DashboardState()
+    monkeypatch.setattr(dashboard_app, "STATE", state)
+    client = TestClient(dashboard_app.app)
+    batch = {"node_id": "n2", "spool_depth": 40, "samples": [
+        {"seq": 1, "ts": 1000.0, "id": "web", "cpu_usage": 10},
+        {"seq": 2, "ts": 1005.0, "id": "web", "cpu_usage": 20},
+    ]}
+    body = gzip.compress(json.dumps(batch).encode())
+    headers = {"Content-Encoding": "gzip", "Content-Type": "application/json"}
+
+    r = client.post("/api/ingest_batch", content=body, headers=headers)
+    assert r.json() == {"status": "ok", "received": 2, "stored": 2}
+    assert client.post("/api/ingest_batch", content=body, headers=headers).json()["stored"] == 0
+    node = state.state["nodes"]["n2"]
+    assert node["containers"]["web"]["cpu_usage"] == 20
+    assert node["spool_depth"] == 40 and node["last_seen"] > 1005.0  # alive as of arrival, not sample time
+
+    # an old backlog is not swept away as stale, and history keeps the sample times
+    state.lifecycle.sweep()
+    assert "web" in state.state["nodes"]["n2"]["containers"]
+    assert state.series.query("web", start=0, end=2000, node_id="n2") is not None
+
+    # a late backfilled sample does not replace the live one
+    state.ingest("n2", [{"id": "web", "cpu_usage": 99}])
+    late = {"node_id": "n2", "samples": [{"seq": 3, "ts": 1010.0, "id": "web", "cpu_usage": 30}]}
+    assert client.post("/api/ingest_batch", json=late).json()["stored"] == 1
+    assert node["containers"]["web"]["cpu_usage"] == 99
+    assert client.post("/api/ingest_batch", content=b"\x1f\x8bbroken", headers=headers).status_code == 400
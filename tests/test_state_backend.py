@@ -0,0 +1,121 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+from src.state_backend import DashboardState, LocalStateBackend, SharedStateBackend, SnapshotBuffer
+
+
+def test_snapshot_buffer_roundtrip():
+    owner = SnapshotBuffer(size=4096, create=True)
+    try:
+        owner.write(1, {"nodes": b"{}", "security_scores": b"{}", "events": b"[]"})
+        reader = SnapshotBuffer(name=owner.name)
+        assert reader.read() == {"nodes": b"{}", "security_scores": b"{}", "events": b"[]"}
+        assert not owner.fits({"nodes": b"x" * 5000, "security_scores": b"", "events": b""})
+        owner.write(2, {}, moved=True)
+        assert reader.read() is None
+        reader.close()
+    finally:
+        owner.close(unlink=True)
+
+
+def test_shared_backend_owner_and_reader(tmp_path):
+    addr = str(tmp_path / "state.sock")
+    owner = SharedStateBackend(DashboardState, address=addr, publish_interval=0.02)
+    owner.start()
+    reader = SharedStateBackend(DashboardState, address=addr, publish_interval=0.02)
+    reader.start()
+    try:
+        assert owner.is_owner and not reader.is_owner
+        reader.ingest("n1", [{"id": "web", "cpu_usage": 5}])
+        reader.log_event("Test", "hello")
+        deadline = time.time() + 5
+        nodes = {}
+        while time.time() < deadline and "n1" not in nodes:
+            time.sleep(0.05)
+            nodes = json.loads(reader.read_section("nodes"))
+        assert nodes["n1"]["containers"]["web"]["cpu_usage"] == 5
+        assert json.loads(owner.read_section("nodes")) == nodes
+        assert json.loads(reader.read_section("events"))[0]["message"] == "hello"
+        assert reader.counts()["containers"] == 1  # forwarded to the owner
+        assert reader.read_snapshot("nodes") == owner.read_snapshot("nodes")
+    finally:
+        reader.close()
+        owner.close()
+
+
+OWNER = """
+import sys, time
+from src.state_backend import DashboardState, SharedStateBackend
+owner = SharedStateBackend(DashboardState, address=sys.argv[1], publish_interval=0.02)
+owner.start()
+print(owner.is_owner, flush=True)
+time.sleep(60)
+"""
+
+
+def _wait_for(predicate, timeout=10.0):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_reader_takes_over_when_the_owner_dies(tmp_path):
+    addr = str(tmp_path / "state.sock")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    proc = subprocess.Popen([sys.executable, "-c", OWNER, addr], cwd=root, stdout=subprocess.PIPE, text=True)
+    reader = SharedStateBackend(DashboardState, address=addr, owner_check_interval=0.05, publish_interval=0.02)
+    try:
+        assert proc.stdout.readline().strip() == "True"
+        reader.start()
+        assert not reader.is_owner
+        reader.ingest("n1", [{"id": "web", "cpu_usage": 5}])
+        _wait_for(lambda: "n1" in json.loads(reader.read_section("nodes")))
+
+        proc.kill()
+        proc.wait()
+        _wait_for(lambda: reader.is_owner)  # elected itself instead of serving the dead owner's snapshot
+        reader.ingest("n2", [{"id": "db", "cpu_usage": 7}])
+        _wait_for(lambda: "n2" in json.loads(reader.read_section("nodes")))
+        assert reader.counts()["containers"] == 1  # a fresh state: the old owner's is gone with it
+    finally:
+        proc.kill()
+        reader.close()
+
+def test_sections_are_encoded_once_per_version():
+    backend = LocalStateBackend(DashboardState)
+    backend.ingest("n1", [{"id": "web", "cpu_usage": 5}])
+    etag, body = backend.read_snapshot("nodes")
+    assert backend.read_snapshot("nodes")[1] is body  # not re-serialized
+    events_etag = backend.read_snapshot("events")[0]
+
+    backend.log_event("Test", "hello")
+    assert backend.read_snapshot("nodes") == (etag, body)
+    assert backend.read_snapshot("events")[0] != events_etag
+    backend.ingest("n1", [{"id": "web", "cpu_usage": 6}])
+    new_etag, new_body = backend.read_snapshot("nodes")
+    assert new_etag != etag and json.loads(new_body)["n1"]["containers"]["web"]["cpu_usage"] == 6
+
+
+def test_read_endpoints_answer_unchanged_polls_with_304(monkeypatch):
+    from fastapi.testclient import TestClient
+    import src.dashboard_app as dashboard_app
+    backend = LocalStateBackend(DashboardState)
+    monkeypatch.setattr(dashboard_app, "STATE", backend)
+    client = TestClient(dashboard_app.app)
+    backend.ingest("n1", [{"id": f"c{i}", "cpu_usage": i} for i in range(100)])
+
+    first = client.get("/api/stats", headers={"Accept-Encoding": "gzip"})
+    assert first.headers["content-encoding"] == "gzip" and len(first.json()["n1"]["containers"]) == 100
+    etag = first.headers["etag"]
+    again = client.get("/api/stats", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+
+    backend.ingest("n1", [{"id": "c0", "cpu_usage": 7}])
+    changed = client.get("/api/stats", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.json()["n1"]["containers"]["c0"]["cpu_usage"] == 7
+    events = client.get("/api/events")
+    assert client.get("/api/events", headers={"If-None-Match": events.headers["etag"]}).status_code == 304
@@ -0,0 +1,70 @@
+import pytest
+
+from src.agent import run_iteration
+from src.controller import CgroupController
+from src.fakefs import FakeCgroupFS
+from src.governance import GovernanceEngine
+from src.monitor import CgroupMonitor
+from src.predictor import MovingAveragePredictor
+from src.simulation import PolicySimulation
+from src.throttle import ThrottleFeedback
+from src.trace import ReplayScanner
+
+
+def _sample(usage, periods, throttled, t):
+    return {"cpu_stat": {"usage_usec": usage, "nr_periods": periods, "nr_throttled": throttled,
+                         "throttled_usec": throttled * 1000}, "timestamp": t}
+
+
+def test_rises_fast_decays_slowly_and_does_not_wind_up():
+    fb = ThrottleFeedback(period=100000)
+    fb.configure("web", "latency", max_headroom=3.0)
+    fb.observe("web", _sample(0, 0, 0, 0))
+    fb.observe("web", _sample(500000, 10, 0, 1))  # 0.5 CPU, never throttled
+    calm = fb.quota("web")
+    assert calm == pytest.approx(50000 * (1.5 - 0.3 * 0.01), rel=1e-6)
+
+    fb.observe("web", _sample(1000000, 20, 10, 2))  # every period throttled
+    assert fb.quota("web") > calm * 1.5  # integrator and proportional kick in the same tick
+    for t in range(3, 60):
+        fb.observe("web", _sample(500000 * t, 10 * t, 10 * t - 10, t))
+        fb.quota("web")
+    assert fb.headroom("web") == 3.0  # clamped, not wound past the ceiling
+
+    fb.observe("web", _sample(500000 * 60, 600, 580, 60))
+    fb.quota("web")
+    assert 3.0 > fb.headroom("web") > 2.99  # one calm tick hands back only a little
+    assert fb.totals["web"]["throttled"] == 580
+
+
+def test_gain_classes_track_their_throttling_targets():
+    seconds = 3600 * 4
+    baseline = PolicySimulation("Web Server Load", 3600, containers=4).run()
+    latency = PolicySimulation("Web Server Load", 3600, containers=4, feedback="latency").run()
+    assert latency["Throttled_Events"] / seconds < 0.02 < baseline["Throttled_Events"] / seconds
+    assert latency["Throttled_Usec"] < baseline["Throttled_Usec"] / 10
+
+    steady = PolicySimulation("steady", 3600, containers=4).run()
+    batch = PolicySimulation("steady", 3600, containers=4, feedback="batch").run()
+    assert batch["Throttled_Events"] / seconds == pytest.approx(0.2, abs=0.05)
+    assert batch["Waste"] < steady["Waste"]
+
+
+def test_run_iteration_raises_cpu_max_after_throttling(tmp_path):
+    fs = FakeCgroupFS(tmp_path / "cgroup", containers=1)
+    [path] = fs.paths
+    monitor = CgroupMonitor(root=fs.root)
+    controller = CgroupController(dry_run=True, quiet=True, root=fs.root)
+    governance = GovernanceEngine(controller)
+    feedback = ThrottleFeedback()
+    predictors = {path: MovingAveragePredictor()}
+    histories = {path: []}
+    quotas = []
+    for i, throttled in enumerate([0, 0, 0, 10, 20]):
+        fs.update(path, {"usage_usec": 100000 * (i + 1), "nr_periods": 10 * (i + 1), "nr_throttled": throttled})
+        run_iteration([path], monitor, controller, predictors, histories, ReplayScanner(), governance, i,
+                      reporter=None, feedback=feedback)
+        quotas.append(controller.last_value(path, "cpu.max"))
+    assert quotas[0] == "max"  # no usage rate yet
+    calm, hit = (int(q.split()[0]) / feedback.demand(path) for q in quotas[2:4])
+    assert hit > calm  # headroom over the usage rate grew after the throttled tick
@@ -0,0 +1,52 @@
+from src.timeseries import TimeSeriesStore
+
+
+def test_rollup_tiers_and_range_query():
+    store = TimeSeriesStore(tiers=((1, 60), (10, 600)))
+    for t in range(0, 120):
+        store.record("n1", "web", {"cpu_usage": t}, ts=1000 + t)
+
+    # Raw tier only keeps the last 60 buckets
+    raw = store.query("web", start=1060, end=1119, step=1, now=1119)
+    assert raw["tier"] == 1
+    assert len(raw["points"]) == 60
+    assert raw["points"][0]["avg"] == 60
+
+    # Older range falls back to the 10s rollup, with min/max/avg per bucket
+    old = store.query("web", start=1000, end=1019, step=1, now=1119)
+    assert old["tier"] == 10
+    assert [p["t"] for p in old["points"]] == [1000, 1010]
+    first = old["points"][0]
+    assert (first["min"], first["max"], first["avg"], first["count"]) == (0, 9, 4.5, 10)
+
+    # Coarse step is answered from the coarse tier and re-bucketed
+    coarse = store.query("web", start=1020, end=1079, step=30, now=1119)
+    assert coarse["tier"] == 10
+    assert [p["count"] for p in coarse["points"]] == [30, 30]
+
+
+def test_series_cap_evicts_least_recent():
+    store = TimeSeriesStore(metrics=("cpu_usage",), max_series=2)
+    store.record("n", "a", {"cpu_usage": 1}, ts=1)
+    store.record("n", "b", {"cpu_usage": 1}, ts=1)
+    store.record("n", "a", {"cpu_usage": 1}, ts=2)
+    store.record("n", "c", {"cpu_usage": 1}, ts=2)
+    assert len(store) == 2
+    assert store.query("b", now=2) is None
+    assert store.dropped_series == 1
+
+
+def test_series_endpoint_rejects_bad_range(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import src.dashboard_app as dashboard_app
+    from src.state_backend import DashboardState, LocalStateBackend
+
+    state = LocalStateBackend(DashboardState)
+    monkeypatch.setattr(dashboard_app, "STATE", state)
+    state.ingest("n1", [{"id": "web", "cpu_usage": 5}])
+    client = TestClient(dashboard_app.app)
+    assert client.get("/api/series", params={"container": "web"}).status_code == 200
+    for bad in ({"from": "yesterday"}, {"to": "nan"}, {"from": "1", "to": "x"}):
+        r = client.get("/api/series", params=dict(bad, container="web"))
+        assert r.status_code == 400 and "epoch seconds" in r.json()["error"]
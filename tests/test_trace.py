@@ -0,0 +1,64 @@
+import pytest
+
+from src.agent import replay_trace
+from src.monitor import CgroupMonitor
+from src.trace import ReplayMonitor, TraceWriter, read_trace
+
+LONG_PATH = "system.slice/docker-" + "ab" * 40 + ".scope"
+
+
+@pytest.mark.parametrize("name", ["agent.trace", "agent.trace.gz"])
+def test_round_trip(tmp_path, name):
+    fn = str(tmp_path / name)
+    with TraceWriter(fn) as w:
+        for i in range(3):
+            w.write({"timestamp": 100.0 + i, "cgroup_path": LONG_PATH, "memory_bytes": 4096,
+                     "cpu_stat": {"usage_usec": 1000 * i, "nr_throttled": i}, "io_read_bytes": 7})
+        w.write({"timestamp": 103.0, "cgroup_path": "b", "cpu_stat": {}, "memory_bytes": None})
+
+    samples = list(read_trace(fn))
+    assert [s["cgroup_path"] for s in samples] == [LONG_PATH] * 3 + ["b"]
+    assert samples[2]["cpu_stat"]["usage_usec"] == 2000 and samples[2]["cpu_stat"]["nr_throttled"] == 2
+    assert samples[3]["cpu_stat"] == {} and samples[3]["memory_bytes"] is None
+
+
+def test_monitor_records_and_agent_replays(tmp_path):
+    fn = str(tmp_path / "agent.trace")
+    with TraceWriter(fn) as w:
+        monitor = CgroupMonitor(recorder=w)
+        monitor.sample("this-path-does-not-exist")
+    assert [s["cgroup_path"] for s in read_trace(fn)] == ["this-path-does-not-exist"]
+
+    with TraceWriter(fn) as w:
+        for i in range(50):
+            w.write({"timestamp": i * 5.0, "cgroup_path": "web", "cpu_stat": {"usage_usec": 3000000},
+                     "memory_bytes": 1})
+    with open(fn, "ab") as f:
+        f.write(b"\x02torn")  # recorder killed mid-record
+
+    summary = replay_trace(fn)
+    assert summary["samples"] == 50 and summary["iterations"] == 50
+    assert summary["final_cpu_max"]["web"] == "3600000 100000"
+
+
+def test_replay_runs_until_every_path_is_done(tmp_path):
+    fn = str(tmp_path / "uneven.trace")
+    with TraceWriter(fn) as w:
+        for i in range(10):
+            w.write({"timestamp": 100 + i * 5.0, "cgroup_path": "long", "cpu_stat": {"usage_usec": 3000000 + i},
+                     "memory_bytes": 1})
+            if i < 3:
+                w.write({"timestamp": 100 + i * 5.0, "cgroup_path": "short", "cpu_stat": {"usage_usec": 1},
+                         "memory_bytes": 1})
+
+    monitor = ReplayMonitor(fn)
+    assert monitor.paths == ["long", "short"] and len(monitor) == 13
+    assert monitor.sample("short")["cpu_stat"]["usage_usec"] == 1  # read past "long" on the way
+    for _ in range(2):
+        monitor.sample("short")
+    assert monitor.sample("short")["cpu_stat"] == {} and not monitor.exhausted
+    assert [monitor.sample("long")["timestamp"] for _ in range(10)] == [100 + i * 5.0 for i in range(10)]
+    assert monitor.exhausted
+
+    summary = replay_trace(fn)
+    assert summary["samples"] == 13 and summary["iterations"] == 10
@@ -0,0 +1,48 @@
+import json
+import os
+
+import pytest
+
+from src.workload import MemoryLoad, load_profile, plan, run
+
+EXAMPLE = os.path.join(os.path.dirname(__file__), "..", "examples", "workloads", "ml_training.json")
+
+
+def test_plan_is_deterministic_per_seed():
+    profile = load_profile(EXAMPLE)
+    first, again, other = plan(profile), plan(profile), plan(profile, seed=7)
+    assert first == again
+    assert [p["name"] for p in first] == ["Initialization", "Data Loading", "Model Training", "Completion"]
+    training = first[2]
+    assert training["cpu"]["workers"] == 2 and len(training["bursts"]) == 3
+    assert all(0 <= b["at"] <= 56 for b in training["bursts"])
+    assert other[2]["bursts"] != training["bursts"]
+
+
+def test_invalid_profile_is_rejected(tmp_path):
+    path = tmp_path / "bad.json"
+    path.write_text(json.dumps({"phases": [{"duration": 5, "cpu": {"duty": 1.5}}]}))
+    with pytest.raises(ValueError):
+        load_profile(str(path))
+
+
+def test_memory_ramp_and_release():
+    memory = MemoryLoad()
+    memory.resize(35)
+    assert memory.held_mb == 30
+    memory.resize(10)
+    assert memory.held_mb == 10 and memory.peak_mb == 30
+
+
+def test_short_run_reports_delivered_load(tmp_path):
+    profile = {"seed": 1, "phases": [{"name": "mixed", "duration": 0.6,
+                                      "cpu": {"workers": 1, "duty": 0.5},
+                                      "memory": {"target_mb": 20, "ramp_sec": 0.2},
+                                      "disk": {"write_mbps": 5, "read_mbps": 5, "file_mb": 4}}]}
+    log_file = tmp_path / "delivered.jsonl"
+    [report] = run(profile, log_file=str(log_file), workdir=str(tmp_path))
+    assert json.loads(log_file.read_text()) == report
+    assert report["cpu"]["target_cpu_sec"] == pytest.approx(0.3)
+    assert 0.1 < report["cpu"]["delivered_cpu_sec"] < 0.6
+    assert report["memory"]["held_mb"] == 20
+    assert report["disk"]["written_mb"] >= 1 and report["disk"]["read_mb"] >= 1